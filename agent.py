@@ -1,9 +1,22 @@
-import importlib
+import asyncio
 import json
+import logging
 import os
+import time
+from typing import Optional
 from dotenv import load_dotenv
 import google.generativeai as genai
-import re
+
+from command_router import get_command_router
+from routing_cache import get_routing_cache
+from tool_registry import ASYNC_TOOLS, TOOL_MODULES, get_tool_registry
+from metrics import get_metrics
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+GEMINI_SECONDS = get_metrics().histogram('gemini_seconds', 'Latencia de las llamadas a Gemini', ['purpose', 'outcome'])
+ROUTING_DECISIONS = get_metrics().counter('routing_decisions_total', 'Decisiones de enrutado por origen', ['source'])
 
 # Cargar variables del archivo .env
 load_dotenv()
@@ -19,7 +32,7 @@ except Exception:
 def obtener_mapeo(nombre_mapeo: str) -> str:
     try:
         mapeo_path = os.path.join("mappings_docs", nombre_mapeo)
-        print(f"📝 Buscando archivo en: {mapeo_path}")
+        logger.debug("📝 Buscando archivo en: %s", mapeo_path)
         
         with open(mapeo_path, "r", encoding="utf-8") as file:
             data = json.load(file)
@@ -31,158 +44,46 @@ def obtener_mapeo(nombre_mapeo: str) -> str:
     except json.JSONDecodeError:
         return "❌ Error al leer el archivo de mapeo. Verifique el formato."
 
-# Herramientas disponibles
-TOOLS = {
-    "note": "tools.note",
-    "save_code": "tools.save_code",
-    "web_search": "tools.web_search",
-    "calculator": "tools.calculator",
-    "web_open": "tools.web_open",
-    "code_gen": "tools.code_gen",
-    "notifications": "tools.notifications",
-    "document_filler": "tools.document_filler",
-    "rmn_spectrum_cleaner": "tools.rmn_spectrum_cleaner",
-    "ayudas_manager": "tools.ayudas_manager"
-}
+# Herramientas disponibles (se importan en el primer uso, ver tool_registry.py)
+TOOLS = TOOL_MODULES
 
 def ask_gemini_for_tool(prompt: str) -> str:
-    prompt_lower = prompt.lower().strip()
-    
-    print(f"\n{'='*60}")
-    print(f"🔍 DEBUGGING ask_gemini_for_tool")
-    print(f"📝 Prompt original: '{prompt}'")
-    print(f"📝 Prompt lower: '{prompt_lower}'")
-    print(f"{'='*60}\n")
+    """Herramienta para el prompt: reglas de command_router y, si ninguna aplica, Gemini"""
+    route = get_command_router().route(prompt)
+    if route:
+        ROUTING_DECISIONS.inc(source='regla')
+        logger.debug("✅ MATCH: %s '%s' → %s", route.kind, route.pattern, route.tool)
+        return route.tool
+    return ask_gemini(prompt)
 
-    # ============================================================
-    # 1. DETECTAR URLs PRIMERO
-    # ============================================================
-    url_pattern = r"(https?://[^\s]+)"
-    if re.match(url_pattern, prompt.strip()):
-        print("✅ DETECTADO: URL → web_open")
-        return "web_open"
-    
-    # ============================================================
-    # 2. DETECTAR OPERACIONES MATEMÁTICAS
-    # ============================================================
-    math_pattern = r"^[0-9\s\+\-\*/\(\)\.]+$"
-    if re.match(math_pattern, prompt_lower):
-        print(f"✅ DETECTADO: operación matemática → calculator")
-        return "calculator"
-    
-    # ============================================================
-    # 3. DETECTAR CÓDIGO CON ||
-    # ============================================================
-    if "||" in prompt:
-        print(f"✅ MATCH: formato || → save_code")
-        return "save_code"
-    
-    # ============================================================
-    # 4. COMANDOS ESPECÍFICOS POR HERRAMIENTA
-    # ============================================================
-    
-    # DOCUMENT_FILLER - Los más específicos primero
-    document_commands = [
-        "analizar:",
-        "rellenar:",
-        "rellenar auto:",
-        "usar plantilla:",
-        "crear ejemplo datos:",
-        "convertir a json:",
-        "ver mapeo:",
-        "crear mapeo:",
-        "listar plantillas",
-        "listar datos",
-        "listar mapeos",
-    ]
-    
-    print(f"📄 Verificando DOCUMENT_FILLER...")
-    for cmd in document_commands:
-        if prompt_lower.startswith(cmd) or prompt_lower == cmd:
-            print(f"✅ MATCH: '{cmd}' → document_filler")
-            return "document_filler"
-    
-    # RMN_SPECTRUM_CLEANER
-    rmn_commands = [
-        "limpiar:",
-        "comparar:",
-        "exportar:",
-        "listar espectros",
-    ]
-    
-    print(f"🧪 Verificando RMN_SPECTRUM_CLEANER...")
-    for cmd in rmn_commands:
-        if prompt_lower.startswith(cmd) or prompt_lower == cmd:
-            print(f"✅ MATCH: '{cmd}' → rmn_spectrum_cleaner")
-            return "rmn_spectrum_cleaner"
-    
-    # AYUDAS_MANAGER
-    ayudas_commands = [
-        "ayudas buscar",
-        "ayudas filtrar",
-        "ayudas activar",
-    ]
-    
-    print(f"💶 Verificando AYUDAS_MANAGER...")
-    for cmd in ayudas_commands:
-        if prompt_lower.startswith(cmd) or prompt_lower == cmd:
-            print(f"✅ MATCH: '{cmd}' → ayudas_manager")
-            return "ayudas_manager"
-    
-    # NOTIFICATIONS
-    notification_commands = [
-        "status",
-        "debug",
-        "resumen",
-        "test",
-        "listar notificaciones",
-        "listar papers",
-        "listar patentes",
-        "listar emails",
-        "activar emails",
-        "activar patentes",
-        "activar papers",
-        "keywords patentes:",
-        "keywords papers:",
-        "borrar notificaciones",
-    ]
-    
-    print(f"🔔 Verificando NOTIFICATIONS...")
-    for cmd in notification_commands:
-        if prompt_lower.startswith(cmd) or prompt_lower == cmd:
-            print(f"✅ MATCH: '{cmd}' → notifications")
-            return "notifications"
-    
-    # CODE_GEN
-    codegen_keywords = ["generar", "genera", "crear codigo", "escribe codigo"]
-    if any(k in prompt_lower for k in codegen_keywords):
-        print(f"✅ MATCH: generación código → code_gen")
-        return "code_gen"
-    
-    # ============================================================
-    # 5. DETECCIÓN POR PALABRAS CLAVE (CONTEXTO)
-    # ============================================================
-    
-    # Palabras clave que sugieren document_filler
-    if any(word in prompt_lower for word in ["plantilla", "plantillas", "mapeo", "rellenar", "documento"]):
-        print(f"✅ KEYWORD: documento/plantilla → document_filler")
-        return "document_filler"
-    
-    # Palabras clave que sugieren rmn_spectrum_cleaner
-    if any(word in prompt_lower for word in ["espectro", "espectros", "rmn", "nmr", "savgol", "gaussian", "línea base", "snr", "ppm"]):
-        print(f"✅ KEYWORD: espectro/rmn → rmn_spectrum_cleaner")
-        return "rmn_spectrum_cleaner"
-    
-    # Palabras clave que sugieren ayudas_manager
-    if any(word in prompt_lower for word in ["subvención", "subvenciones", "beca", "becas", "convocatoria", "financiación", "ayuda"]):
-        print(f"✅ KEYWORD: ayudas/subvenciones → ayudas_manager")
-        return "ayudas_manager"
-    
-    # ============================================================
-    # 6. FALLBACK: Preguntamos a Gemini
-    # ============================================================
-    
-    print(f"\n⚠️ NO HAY MATCH DIRECTO → Preguntando a Gemini...")
+
+def ask_gemini(prompt: str) -> str:
+    """
+    Herramienta elegida por Gemini (sólo cuando no hay regla que aplique).
+    Las decisiones se cachean y un clasificador local responde los casos
+    claros sin llamar a la API (ver routing_cache.py).
+    """
+    cache = get_routing_cache()
+    with span('routing_cache.lookup') as current:
+        decision = cache.lookup(prompt)
+        current.set('hit', decision.source if decision else 'miss')
+    if decision:
+        ROUTING_DECISIONS.inc(source=decision.source)
+        logger.debug("💾 Enrutado desde %s (%.2f) → %s", decision.source, decision.confidence, decision.tool)
+        return decision.tool
+    
+    tool = _ask_gemini_model(prompt)
+    if tool is None:
+        ROUTING_DECISIONS.inc(source='fallback')
+        return "web_search"
+    ROUTING_DECISIONS.inc(source='gemini')
+    cache.store(prompt, tool)
+    return tool
+
+
+def _ask_gemini_model(prompt: str) -> Optional[str]:
+    """Pregunta al modelo; None si falla o responde algo que no es una herramienta"""
+    logger.debug("⚠️ NO HAY MATCH DIRECTO → Preguntando a Gemini...")
     
     tools_list = ", ".join(TOOLS.keys())
     question = f"""Analiza este comando del usuario: "{prompt}"
@@ -201,10 +102,13 @@ REGLAS ESTRICTAS:
 
 Responde SOLO con el nombre exacto de la herramienta (sin puntos, comillas ni explicaciones)."""
     
+    start = time.perf_counter()
     try:
-        response = model.generate_content(question)
+        with span('gemini.generate', purpose='routing'):
+            response = model.generate_content(question)
+        GEMINI_SECONDS.observe(time.perf_counter() - start, purpose='routing', outcome='ok')
         result = response.text.strip().lower().replace('"', '').replace("'", '').replace('.', '').replace(',', '')
-        print(f"🤖 Gemini eligió: '{result}'")
+        logger.debug("🤖 Gemini eligió: '%s'", result)
         
         if result in TOOLS:
             return result
@@ -212,15 +116,16 @@ Responde SOLO con el nombre exacto de la herramienta (sin puntos, comillas ni ex
         # Si Gemini responde algo no válido, buscar en la respuesta
         for tool in TOOLS.keys():
             if tool in result:
-                print(f"✅ Encontrado '{tool}' en respuesta de Gemini")
+                logger.debug("✅ Encontrado '%s' en respuesta de Gemini", tool)
                 return tool
         
-        print(f"⚠️ Gemini devolvió algo inválido: '{result}' → usando web_search como fallback")
-        return "web_search"
+        logger.warning("⚠️ Gemini devolvió algo inválido: '%s' → usando web_search como fallback", result)
+        return None
         
     except Exception as e:
-        print(f"❌ Error de Gemini: {e} → usando web_search como fallback")
-        return "web_search"
+        GEMINI_SECONDS.observe(time.perf_counter() - start, purpose='routing', outcome='error')
+        logger.error("❌ Error de Gemini: %s → usando web_search como fallback", e)
+        return None
 
 
 def use_tool(tool_name: str, data: str) -> str:
@@ -233,9 +138,25 @@ def use_tool(tool_name: str, data: str) -> str:
         return f"❌ No existe la herramienta '{tool_name}'"
     
     try:
-        module = importlib.import_module(TOOLS[tool_name])
-        return module.run(data)
+        with span(f'tool:{tool_name}'):
+            return get_tool_registry().get(tool_name)(data)
+    except Exception as e:
+        logger.exception("❌ Error en la herramienta %s", tool_name)
+        return f"❌ ERROR al usar la herramienta {tool_name}: {e}"
+
+
+async def use_tool_async(tool_name: str, data: str) -> str:
+    """Como use_tool, para las herramientas de ASYNC_TOOLS: se espera su run_async"""
+    if tool_name not in ASYNC_TOOLS:
+        return f"❌ La herramienta '{tool_name}' no tiene variante asíncrona"
+    
+    try:
+        with span(f'tool:{tool_name}'):
+            # La primera vez importa el módulo: fuera del event loop
+            module = await asyncio.to_thread(get_tool_registry().module, tool_name)
+            return await module.run_async(data)
     except Exception as e:
+        logger.exception("❌ Error en la herramienta %s", tool_name)
         return f"❌ ERROR al usar la herramienta {tool_name}: {e}"
 
 
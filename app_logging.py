@@ -0,0 +1,122 @@
+# app_logging.py - LOGGING ESTRUCTURADO DE LA APLICACIÓN
+"""
+Sustituye los print() del camino de cada petición por logging con niveles:
+
+  - los módulos usan ``logger = logging.getLogger(__name__)`` y el detalle de
+    cada comando va a DEBUG con argumentos %-style, así que a nivel INFO no
+    se formatea ni se escribe nada
+  - el root logger sólo tiene un QueueHandler: quien registra encola el
+    mensaje y un hilo (QueueListener) escribe en stdout, sin bloquear la
+    petición en E/S
+  - muestreo: un registro con ``extra={'sample': N}`` sólo se emite 1 de
+    cada N veces (por mensaje), para los bucles muy habladores
+  - campos estructurados: el resto de ``extra`` se añade como ``clave=valor``
+    (o como campos del objeto en formato JSON)
+
+Configuración por entorno: LOG_LEVEL (INFO por defecto) y LOG_FORMAT
+('text' o 'json').
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Optional
+
+# Atributos propios de LogRecord: lo demás viene de ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'sample'}
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRIBUTES and not k.startswith('_')}
+
+
+class StructuredFormatter(logging.Formatter):
+    """Una línea por registro: texto legible con clave=valor, o un objeto JSON"""
+
+    def __init__(self, json_format: bool = False):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s: %(message)s', '%Y-%m-%d %H:%M:%S')
+        self.json_format = json_format
+
+    def format(self, record: logging.LogRecord) -> str:
+        fields = _extra_fields(record)
+        if self.json_format:
+            entry = {
+                'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+                'level': record.levelname,
+                'logger': record.name,
+                'message': record.getMessage(),
+                **fields,
+            }
+            if record.exc_info:
+                entry['exc_info'] = self.formatException(record.exc_info)
+            return json.dumps(entry, ensure_ascii=False, default=str)
+
+        line = super().format(record)
+        if fields:
+            line += ' ' + ' '.join(f'{k}={v}' for k, v in fields.items())
+        return line
+
+
+class SamplingFilter(logging.Filter):
+    """Deja pasar 1 de cada N registros con ``extra={'sample': N}``; el resto, todos"""
+
+    def __init__(self):
+        super().__init__()
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, 'sample', None)
+        if not rate or rate <= 1:
+            return True
+        key = (record.name, record.msg)
+        with self._lock:
+            count = self._counts[key]
+            self._counts[key] = count + 1
+        return count % rate == 0
+
+
+# ========== INSTANCIA DE PROCESO ==========
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_listener_lock = threading.Lock()
+
+def configure_logging(level: Optional[str] = None, log_format: Optional[str] = None) -> logging.handlers.QueueListener:
+    """
+    Configura el root logger (una sola vez por proceso): QueueHandler con
+    muestreo → hilo QueueListener → stdout.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return _listener
+
+        level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+        json_format = (log_format or os.getenv('LOG_FORMAT', 'text')).lower() == 'json'
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(StructuredFormatter(json_format))
+
+        queue_handler = logging.handlers.QueueHandler(queue.SimpleQueue())
+        queue_handler.addFilter(SamplingFilter())
+
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(queue_handler)
+        root.setLevel(level)
+
+        # Librerías muy habladoras: sólo avisos
+        for name in ('urllib3', 'httpx', 'httpcore', 'matplotlib', 'PIL'):
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+        _listener = logging.handlers.QueueListener(queue_handler.queue, stream_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        return _listener
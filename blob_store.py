@@ -0,0 +1,298 @@
+# blob_store.py - ALMACÉN DE SUBIDAS DIRECCIONADO POR CONTENIDO
+"""
+Las plantillas y espectros subidos se guardaban por nombre: volver a subir
+un archivo lo sobrescribía sin avisar, y cada análisis, limpieza o documento
+rellenado se recalculaba desde cero aunque el contenido fuera el mismo.
+
+BlobStore guarda cada contenido distinto una sola vez, por su SHA-256:
+
+  - cache/blobs/ab/abcdef...: el contenido
+  - templates_docs/x.docx, rmn_spectra/input/y.csv...: alias del blob. En
+    los directorios que ninguna herramienta reescribe (LINKED_DIRS) son
+    enlaces duros y dos subidas iguales ocupan una vez; en el resto son
+    copias (reflink si el sistema de archivos lo permite), porque abrir un
+    enlace duro con 'w' reescribiría el blob y todos sus demás alias
+  - cache/blobs.db: alias (directorio, nombre) → sha256 y resultados
+    derivados por (tipo, sha256, parámetros)
+
+Las herramientas siguen leyendo los archivos por nombre; para reutilizar un
+resultado piden content_hash(ruta) y consultan get_derived. Como la clave
+es el contenido, el resultado sigue valiendo si se renombra el archivo.
+"""
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from metrics import get_metrics, caller_name
+
+DEFAULT_ROOT = "cache/blobs"
+DEFAULT_DB_FILE = "cache/blobs.db"
+CHUNK_SIZE = 1024 * 1024
+
+# Directorios cuyos archivos sólo se leen: sus alias pueden ser enlaces duros
+LINKED_DIRS = {"rmn_spectra/input"}
+
+# ioctl FICLONE de Linux (btrfs, xfs...): copia que comparte bloques hasta que se escribe
+FICLONE = 0x40049409
+
+SQLITE_SECONDS = get_metrics().histogram('sqlite_seconds', 'Duración de cada bloque de consultas SQLite', ['db', 'operation'])
+DERIVED_LOOKUPS = get_metrics().counter('derived_cache_total', 'Consultas a la cache de resultados derivados', ['kind', 'outcome'])
+
+
+def file_sha256(path: str, chunk_size: int = CHUNK_SIZE) -> str:
+    """SHA-256 de un archivo, leído por bloques"""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def clone_file(src: str, dst: str):
+    """Copia ``src`` en ``dst``: reflink si se puede, copia normal si no"""
+    try:
+        import fcntl
+        with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+            fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+        return
+    except (ImportError, OSError):
+        pass
+    shutil.copyfile(src, dst)
+
+
+class BlobStore:
+    """Contenidos por SHA-256, alias por nombre y resultados derivados por contenido"""
+
+    def __init__(self, root: str = DEFAULT_ROOT, db_file: str = DEFAULT_DB_FILE):
+        self.root = root
+        self.db_file = db_file
+        # Temporales dentro del almacén: mismo sistema de archivos que los blobs
+        self.tmp_dir = os.path.join(root, 'tmp')
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.init_database()
+
+    def init_database(self):
+        os.makedirs(os.path.dirname(self.db_file) or '.', exist_ok=True)
+        with self.get_db_connection() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS aliases (
+                    directory TEXT NOT NULL,
+                    filename TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (directory, filename)
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_aliases_sha ON aliases (sha256)')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS derived (
+                    kind TEXT NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    files TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (kind, sha256, params)
+                )
+            ''')
+            conn.commit()
+
+    @contextmanager
+    def get_db_connection(self):
+        operation = caller_name()
+        start = time.perf_counter()
+        conn = sqlite3.connect(self.db_file, timeout=30.0)
+        try:
+            yield conn
+        finally:
+            conn.close()
+            SQLITE_SECONDS.observe(time.perf_counter() - start, db='blobs', operation=operation)
+
+    # ---------- contenidos y alias ----------
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256)
+
+    def put_file(self, tmp_path: str, sha256: str) -> bool:
+        """
+        Mueve ``tmp_path`` al almacén como el blob ``sha256``. Si ese contenido
+        ya estaba, descarta el temporal. True si el blob es nuevo.
+        """
+        path = self.blob_path(sha256)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+        return True
+
+    def link(self, sha256: str, directory: str, filename: str) -> Optional[str]:
+        """
+        Publica el blob como ``directory/filename``: enlace duro en
+        LINKED_DIRS, copia en el resto (y si el enlace no es posible).
+        Devuelve el sha256 que tenía antes ese nombre, o None si no existía.
+        """
+        final_path = os.path.join(directory, filename)
+        previous = self._alias(directory, filename)
+        if previous is None and os.path.exists(final_path):
+            previous = {'sha256': file_sha256(final_path)}
+
+        tmp_path = os.path.join(directory, f".{filename}.{uuid.uuid4().hex[:8]}.link")
+        linked = False
+        if directory.rstrip('/') in LINKED_DIRS:
+            try:
+                os.link(self.blob_path(sha256), tmp_path)
+                linked = True
+            except OSError:
+                pass
+        if not linked:
+            clone_file(self.blob_path(sha256), tmp_path)
+        os.replace(tmp_path, final_path)
+
+        self._record_alias(directory, filename, sha256, os.stat(final_path))
+        return previous['sha256'] if previous else None
+
+    def forget(self, directory: str, filename: str):
+        """Olvida un alias (el archivo ya se ha borrado); gc() libera el blob si nadie más lo usa"""
+        with self.get_db_connection() as conn:
+            conn.execute('DELETE FROM aliases WHERE directory = ? AND filename = ?', (directory, filename))
+            conn.commit()
+
+    def content_hash(self, path: str) -> str:
+        """
+        SHA-256 del archivo ``path``. Si es un alias conocido y no ha cambiado
+        (tamaño y mtime) no se vuelve a leer; los archivos copiados a mano se
+        registran la primera vez.
+        """
+        directory, filename = os.path.split(path)
+        st = os.stat(path)
+        alias = self._alias(directory, filename)
+        if alias and alias['size'] == st.st_size and alias['mtime_ns'] == st.st_mtime_ns:
+            return alias['sha256']
+        sha256 = file_sha256(path)
+        self._record_alias(directory, filename, sha256, st)
+        return sha256
+
+    def _alias(self, directory: str, filename: str) -> Optional[Dict]:
+        with self.get_db_connection() as conn:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute(
+                'SELECT sha256, size, mtime_ns FROM aliases WHERE directory = ? AND filename = ?',
+                (directory, filename)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def _record_alias(self, directory: str, filename: str, sha256: str, st: os.stat_result):
+        with self.get_db_connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO aliases (directory, filename, sha256, size, mtime_ns, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (directory, filename, sha256, st.st_size, st.st_mtime_ns, time.time())
+            )
+            conn.commit()
+
+    # ---------- resultados derivados ----------
+
+    @staticmethod
+    def _params_key(params: Optional[Dict]) -> str:
+        return json.dumps(params or {}, sort_keys=True, ensure_ascii=False, default=str)
+
+    def get_derived(self, kind: str, sha256: str, params: Optional[Dict] = None) -> Optional[Any]:
+        """
+        Resultado guardado para (kind, contenido, parámetros), o None. Si alguno
+        de sus archivos de salida ya no existe, se descarta.
+        """
+        key = self._params_key(params)
+        with self.get_db_connection() as conn:
+            row = conn.execute(
+                'SELECT result, files FROM derived WHERE kind = ? AND sha256 = ? AND params = ?',
+                (kind, sha256, key)
+            ).fetchone()
+            if row and all(os.path.exists(path) for path in json.loads(row[1])):
+                conn.execute(
+                    'UPDATE derived SET hits = hits + 1 WHERE kind = ? AND sha256 = ? AND params = ?',
+                    (kind, sha256, key)
+                )
+                conn.commit()
+                DERIVED_LOOKUPS.inc(kind=kind, outcome='hit')
+                return json.loads(row[0])
+            if row:
+                conn.execute('DELETE FROM derived WHERE kind = ? AND sha256 = ? AND params = ?', (kind, sha256, key))
+                conn.commit()
+        DERIVED_LOOKUPS.inc(kind=kind, outcome='miss')
+        return None
+
+    def put_derived(self, kind: str, sha256: str, params: Optional[Dict], result: Any, files: List[str] = ()):
+        """Guarda un resultado (serializable a JSON) y los archivos que genera"""
+        with self.get_db_connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO derived (kind, sha256, params, result, files, created_at, hits) '
+                'VALUES (?, ?, ?, ?, ?, ?, 0)',
+                (kind, sha256, self._params_key(params),
+                 json.dumps(result, ensure_ascii=False, default=str), json.dumps(list(files)), time.time())
+            )
+            conn.commit()
+
+    # ---------- mantenimiento ----------
+
+    def gc(self, tmp_max_age: float = 3600) -> Dict[str, int]:
+        """
+        Olvida los alias cuyo archivo ya no existe, borra los blobs que no usa
+        ningún alias y los temporales abandonados.
+        """
+        with self.get_db_connection() as conn:
+            aliases = conn.execute('SELECT directory, filename, sha256 FROM aliases').fetchall()
+            missing = [(d, f) for d, f, _ in aliases if not os.path.exists(os.path.join(d, f))]
+            conn.executemany('DELETE FROM aliases WHERE directory = ? AND filename = ?', missing)
+            conn.commit()
+        in_use = {sha for d, f, sha in aliases if (d, f) not in set(missing)}
+
+        removed = freed = 0
+        for prefix in os.listdir(self.root):
+            folder = os.path.join(self.root, prefix)
+            if prefix == 'tmp' or not os.path.isdir(folder):
+                continue
+            for sha256 in os.listdir(folder):
+                if sha256 not in in_use:
+                    path = os.path.join(folder, sha256)
+                    freed += os.path.getsize(path)
+                    os.remove(path)
+                    removed += 1
+
+        now = time.time()
+        for name in os.listdir(self.tmp_dir):
+            path = os.path.join(self.tmp_dir, name)
+            if now - os.path.getmtime(path) > tmp_max_age:
+                os.remove(path)
+        return {'aliases_removed': len(missing), 'blobs_removed': removed, 'bytes_freed': freed}
+
+    def stats(self) -> Dict:
+        with self.get_db_connection() as conn:
+            aliases, distinct = conn.execute('SELECT COUNT(*), COUNT(DISTINCT sha256) FROM aliases').fetchone()
+            derived, hits = conn.execute('SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM derived').fetchone()
+        return {'aliases': aliases, 'distinct_contents': distinct, 'derived': derived, 'derived_hits': hits}
+
+
+# ========== INSTANCIA DE PROCESO ==========
+
+_store: Optional[BlobStore] = None
+_store_lock = threading.Lock()
+
+def get_blob_store() -> BlobStore:
+    """Devuelve el almacén de contenidos compartido"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BlobStore()
+        return _store
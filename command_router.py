@@ -0,0 +1,191 @@
+# command_router.py - ENRUTADO DE COMANDOS A HERRAMIENTAS
+"""
+Tabla única de reglas comando → herramienta, compilada una vez:
+
+  - las frases literales (exactas, prefijos y "contiene") en un autómata
+    Aho-Corasick que recorre la entrada UNA vez y encuentra todas las frases
+  - los patrones (URL, operación matemática) en una única regex combinada
+
+Gana la regla que aparece antes en la tabla. El orden reproduce el que
+tenían CommandHandler.process_command (main.py) y después
+ask_gemini_for_tool (agent.py), que antes mantenían listas por separado.
+Las reglas de agent.py que las de main.py ya cubrían se mantienen como
+documentación; nunca ganan.
+"""
+import re
+import threading
+from collections import deque
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+EXACT = 'exact'        # la entrada completa es la frase
+PREFIX = 'prefix'      # la entrada empieza por la frase
+CONTAINS = 'contains'  # la frase aparece en cualquier parte
+REGEX = 'regex'        # la entrada, sin pasar a minúsculas, encaja con la expresión (desde el inicio)
+
+# (herramienta, tipo, frases o patrones). El orden es la prioridad.
+ROUTING_TABLE: List[Tuple[str, str, Sequence[str]]] = [
+    # ---------- main.py: comandos exactos y específicos ----------
+    ('note', EXACT, ['leer', 'borrar', 'descargar', 'contar']),
+    ('note', PREFIX, ['guardar:', 'buscar:']),
+    ('document_filler', CONTAINS, [
+        'listar plantillas', 'listar datos', 'plantilla', 'rellenar:', 'analizar plantilla',
+        'crear ejemplo datos', 'usar plantilla:', 'convertir a json',
+    ]),
+    ('rmn_spectrum_cleaner', CONTAINS, [
+        'listar espectros', 'limpiar:', 'analizar:', 'comparar:', 'exportar:',
+        'espectro', 'espectros', 'limpiar auto:', 'métodos rmn',
+    ]),
+    ('notifications', EXACT, ['status', 'debug', 'test', 'probar', 'resumen', 'start', 'iniciar', 'stop', 'detener']),
+    ('notifications', CONTAINS, [
+        'listar notificaciones', 'listar papers', 'listar patentes', 'listar emails',
+        'activar emails', 'activar patentes', 'activar papers',
+        'desactivar emails', 'desactivar patentes', 'desactivar papers',
+    ]),
+    ('notifications', PREFIX, ['keywords', 'categories:', 'borrar notif']),
+    ('code_gen', CONTAINS, ['generar', 'genera', 'crear codigo']),
+
+    # ---------- agent.py: patrones ----------
+    ('web_open', REGEX, [r'https?://[^\s]+']),
+    ('calculator', REGEX, [r'[0-9\s\+\-\*/\(\)\.]+$']),
+    ('save_code', CONTAINS, ['||']),
+
+    # ---------- agent.py: comandos por herramienta ----------
+    ('document_filler', PREFIX, [
+        'analizar:', 'rellenar:', 'rellenar auto:', 'usar plantilla:', 'crear ejemplo datos:',
+        'convertir a json:', 'ver mapeo:', 'crear mapeo:', 'listar plantillas', 'listar datos', 'listar mapeos',
+    ]),
+    ('rmn_spectrum_cleaner', PREFIX, ['limpiar:', 'comparar:', 'exportar:', 'listar espectros']),
+    ('ayudas_manager', PREFIX, ['ayudas buscar', 'ayudas filtrar', 'ayudas activar']),
+    ('notifications', PREFIX, [
+        'status', 'debug', 'resumen', 'test',
+        'listar notificaciones', 'listar papers', 'listar patentes', 'listar emails',
+        'activar emails', 'activar patentes', 'activar papers',
+        'keywords patentes:', 'keywords papers:', 'borrar notificaciones',
+    ]),
+    ('code_gen', CONTAINS, ['escribe codigo']),
+
+    # ---------- agent.py: palabras clave de contexto ----------
+    ('document_filler', CONTAINS, ['plantilla', 'plantillas', 'mapeo', 'rellenar', 'documento']),
+    ('rmn_spectrum_cleaner', CONTAINS, ['espectro', 'espectros', 'rmn', 'nmr', 'savgol', 'gaussian', 'línea base', 'snr', 'ppm']),
+    ('ayudas_manager', CONTAINS, ['subvención', 'subvenciones', 'beca', 'becas', 'convocatoria', 'financiación', 'ayuda']),
+]
+
+
+class Route(NamedTuple):
+    tool: str
+    kind: str
+    pattern: str
+    priority: int
+
+    @property
+    def reason(self) -> str:
+        return f"{self.kind} '{self.pattern}'"
+
+
+def normalize_command(text: str) -> str:
+    return (text or '').strip().lower()
+
+
+class CommandRouter:
+    """
+    Resuelve un comando en una pasada: el autómata devuelve todas las frases
+    presentes con su posición y se queda la regla de mayor prioridad cuyo
+    tipo (exacta, prefijo, contiene) se cumple.
+    """
+
+    def __init__(self, table: Sequence[Tuple[str, str, Sequence[str]]] = ROUTING_TABLE):
+        self.rules: List[Route] = []
+        regex_parts = []
+        literals: Dict[str, List[Route]] = {}
+
+        for tool, kind, patterns in table:
+            for pattern in patterns:
+                route = Route(tool, kind, pattern, len(self.rules))
+                self.rules.append(route)
+                if kind == REGEX:
+                    regex_parts.append(f"(?P<r{route.priority}>{pattern})")
+                else:
+                    literals.setdefault(pattern, []).append(route)
+
+        # Alternativas en orden de prioridad: re.match devuelve la primera que encaja
+        self.regex = re.compile('|'.join(regex_parts)) if regex_parts else None
+        self._build_automaton(literals)
+
+    def _build_automaton(self, literals: Dict[str, List[Route]]):
+        # Trie: transiciones por nodo, salidas (frase, reglas) por nodo
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output: List[List[Tuple[int, List[Route]]]] = [[]]
+        for phrase, routes in literals.items():
+            node = 0
+            for char in phrase:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._output.append([])
+                node = next_node
+            self._output[node].append((len(phrase), routes))
+
+        # Enlaces de fallo (BFS): el sufijo más largo que también es prefijo de alguna frase
+        self._fail = [0] * len(self._goto)
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def route(self, text: str) -> Optional[Route]:
+        """Herramienta para el comando, o None si ninguna regla aplica (→ Gemini)"""
+        stripped = (text or '').strip()
+        text = normalize_command(stripped)
+        if not text:
+            return None
+
+        best: Optional[Route] = None
+        goto, fail, output = self._goto, self._fail, self._output
+        length = len(text)
+        node = 0
+        for end, char in enumerate(text, 1):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            for phrase_length, routes in output[node]:
+                start = end - phrase_length
+                for route in routes:
+                    if best is not None and route.priority >= best.priority:
+                        break
+                    if (route.kind == CONTAINS
+                            or (route.kind == PREFIX and start == 0)
+                            or (route.kind == EXACT and start == 0 and end == length)):
+                        best = route
+                        break
+
+        if self.regex is not None:
+            # Como en agent.py: 'HTTP://...' no es una URL para web_open
+            match = self.regex.match(stripped)
+            if match:
+                route = self.rules[int(match.lastgroup[1:])]
+                if best is None or route.priority < best.priority:
+                    best = route
+
+        return best
+
+
+# ========== INSTANCIA DE PROCESO ==========
+
+_router: Optional[CommandRouter] = None
+_router_lock = threading.Lock()
+
+def get_command_router() -> CommandRouter:
+    """Devuelve el router compilado (se compila en el primer uso)"""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = CommandRouter()
+        return _router
@@ -0,0 +1,398 @@
+# downloads.py - DESCARGAS Y ARCHIVOS ESTÁTICOS CON CACHÉ HTTP
+"""
+Las descargas salían como application/octet-stream, sin ETag ni
+Cache-Control y sin peticiones parciales: cada recarga de la interfaz o de
+un espectro grande volvía a transferir el archivo entero.
+
+  - file_response: tipo MIME según la extensión, ETag y Last-Modified (304
+    si el cliente ya lo tiene), Range de un solo tramo (206/416) para
+    reanudar descargas grandes y, si el cliente lo acepta, la variante
+    gzip/brotli del archivo ya comprimida (PrecompressedCache)
+  - CachedStaticFiles: /static con lo mismo; las URLs con huella
+    (?v=<hash>, ver StaticAssets.url) se cachean como inmutables
+"""
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import shutil
+import stat
+import threading
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import BinaryIO, Dict, Optional, Set, Tuple
+from urllib.parse import parse_qs, quote
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response, StreamingResponse
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:  # opcional: sin brotli se sirve sólo gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 256 * 1024
+DEFAULT_CACHE_DIR = "cache/compressed"
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+MEDIA_TYPES = {
+    '.csv': 'text/csv; charset=utf-8',
+    '.txt': 'text/plain; charset=utf-8',
+    '.dat': 'text/plain; charset=utf-8',
+    '.asc': 'text/plain; charset=utf-8',
+    '.py': 'text/x-python; charset=utf-8',
+    '.json': 'application/json',
+    '.js': 'application/javascript; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.html': 'text/html; charset=utf-8',
+    '.png': 'image/png',
+    '.ico': 'image/x-icon',
+    '.pdf': 'application/pdf',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+# Texto: merece la pena comprimirlo (PNG, DOCX, PDF ya van comprimidos)
+COMPRESSIBLE = {'.csv', '.txt', '.dat', '.asc', '.py', '.json', '.js', '.css', '.html', '.svg', '.md'}
+MIN_COMPRESS_BYTES = 1024
+# Por encima se sirve sin comprimir: comprimirlo bloquearía un hilo demasiado
+# tiempo y la variante se llevaría media cache por delante
+MAX_COMPRESS_BYTES = 32 * 1024 * 1024
+
+
+def media_type_for(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    return MEDIA_TYPES.get(extension) or mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+
+def make_etag(stat_result: os.stat_result, encoding: Optional[str] = None) -> str:
+    """ETag por tamaño y mtime (cada codificación es una representación distinta)"""
+    suffix = f"-{encoding}" if encoding else ""
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}{suffix}"'
+
+
+def content_disposition(filename: str, attachment: bool = True) -> str:
+    kind = "attachment" if attachment else "inline"
+    if filename.isascii() and '"' not in filename:
+        return f'{kind}; filename="{filename}"'
+    return f"{kind}; filename*=utf-8''{quote(filename)}"
+
+
+def _not_modified(headers: Headers, etags: Set[str], stat_result: os.stat_result) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or bool(tags & etags)
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return int(stat_result.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    (inicio, fin exclusivo) de una cabecera ``Range: bytes=...`` de un solo
+    tramo; None si no se entiende o pide varios tramos (se sirve entero).
+
+    Raises:
+        ValueError: si el tramo no es satisfacible (416).
+    """
+    unit, _, spec = value.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = (part.strip() for part in spec.partition("-"))
+    if not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if not first:
+        # bytes=-N: los últimos N bytes (en un archivo vacío no hay ninguno)
+        if int(last) == 0 or size == 0:
+            raise ValueError("tramo vacío")
+        return max(size - int(last), 0), size
+    start = int(first)
+    end = min(int(last) + 1, size) if last else size
+    if start >= size or start >= end:
+        raise ValueError(f"tramo {value} fuera de {size} bytes")
+    return start, end
+
+
+def _read_range(path: str, start: int, end: int, chunk_size: int = CHUNK_SIZE):
+    # Generador síncrono: StreamingResponse lo recorre en el threadpool
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _read_open_file(f: BinaryIO, chunk_size: int = CHUNK_SIZE):
+    with f:
+        yield from iter(lambda: f.read(chunk_size), b'')
+
+
+def negotiate_encoding(headers: Headers, path: str, size: int) -> Optional[str]:
+    """'br' o 'gzip' si el cliente lo acepta y el archivo es texto de tamaño razonable"""
+    if not MIN_COMPRESS_BYTES <= size <= MAX_COMPRESS_BYTES or os.path.splitext(path)[1].lower() not in COMPRESSIBLE:
+        return None
+    accepted = {
+        part.split(";")[0].strip().lower()
+        for part in headers.get("accept-encoding", "").split(",")
+        if not part.strip().endswith("q=0")
+    }
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class WholeFileResponse(FileResponse):
+    """
+    FileResponse sin su propio manejo de Range: file_response ya ha decidido
+    servir el archivo entero (varios tramos, unidad desconocida o If-Range
+    que no coincide) y Starlette respondería 206 multipart o 400.
+    """
+
+    async def __call__(self, scope, receive, send):
+        headers = [(name, value) for name, value in scope.get("headers", []) if name != b"range"]
+        await super().__call__({**scope, "headers": headers}, receive, send)
+
+
+class PrecompressedCache:
+    """
+    Variantes comprimidas de los archivos, por (ruta, ETag, codificación):
+    se comprimen una vez (en streaming) y el resto de peticiones sirven el
+    resultado desde disco.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_bytes: int = 256 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def open_variant(self, path: str, stat_result: os.stat_result, encoding: str) -> Optional[BinaryIO]:
+        """
+        Variante comprimida ya abierta (la crea si falta); None si no reduce
+        el tamaño o si _prune la borró antes de abrirla (se sirve el original).
+        Abierta, otra petición puede podar la cache mientras se envía.
+        """
+        key = hashlib.sha256(f"{os.path.abspath(path)}|{make_etag(stat_result)}".encode()).hexdigest()[:32]
+        variant_path = os.path.join(self.cache_dir, f"{key}.{'br' if encoding == 'br' else 'gz'}")
+        if not os.path.exists(variant_path):
+            self._build(path, variant_path, encoding)
+        try:
+            f = open(variant_path, 'rb')
+        except FileNotFoundError:
+            return None
+        # Si apenas comprime, mejor el original (admite Range)
+        if os.fstat(f.fileno()).st_size >= stat_result.st_size * 0.9:
+            f.close()
+            return None
+        return f
+
+    def _build(self, path: str, variant_path: str, encoding: str):
+        start = time.perf_counter()
+        tmp_path = f"{variant_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                if encoding == 'br':
+                    compressor = brotli.Compressor(quality=5)
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                        dst.write(compressor.process(chunk))
+                    dst.write(compressor.finish())
+                else:
+                    with gzip.GzipFile(fileobj=dst, mode='wb', compresslevel=6, mtime=0) as gz:
+                        shutil.copyfileobj(src, gz, CHUNK_SIZE)
+            os.replace(tmp_path, variant_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.debug("🗜️ %s comprimido (%s) en %.0f ms", path, encoding, (time.perf_counter() - start) * 1000)
+        self._prune()
+
+    def _prune(self):
+        """Borra las variantes más antiguas si la cache supera max_bytes"""
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                full_path = os.path.join(self.cache_dir, name)
+                try:
+                    st = os.stat(full_path)
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, full_path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, full_path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(full_path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+async def file_response(request_headers: Headers,
+                        path: str,
+                        filename: Optional[str] = None,
+                        attachment: bool = True,
+                        cache_control: str = REVALIDATE,
+                        media_type: Optional[str] = None,
+                        headers: Optional[Dict[str, str]] = None,
+                        stat_result: Optional[os.stat_result] = None) -> Response:
+    """
+    Respuesta para el archivo ``path`` según las cabeceras de la petición:
+    304, 206/416 (Range), variante comprimida o el archivo completo.
+    """
+    if stat_result is None:
+        stat_result = await asyncio.to_thread(os.stat, path)
+    media_type = media_type or media_type_for(path)
+    size = stat_result.st_size
+
+    http_range = request_headers.get("range")
+    encoding = None if http_range else negotiate_encoding(request_headers, path, size)
+    etag = make_etag(stat_result, encoding)
+
+    response_headers = {
+        "etag": etag,
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+        "cache-control": cache_control,
+        "accept-ranges": "bytes",
+        "vary": "Accept-Encoding",
+        **(headers or {}),
+    }
+    if filename:
+        response_headers["content-disposition"] = content_disposition(filename, attachment)
+
+    # También vale el ETag sin comprimir: es el que se envió si la variante no compensaba
+    if _not_modified(request_headers, {etag, make_etag(stat_result)}, stat_result):
+        return Response(status_code=304, headers=response_headers)
+
+    # If-Range: si el archivo cambió desde la primera parte, se envía entero
+    if_range = request_headers.get("if-range")
+    if http_range and (if_range is None or if_range in (etag, response_headers["last-modified"])):
+        try:
+            byte_range = parse_range(http_range, size)
+        except ValueError:
+            return Response(status_code=416, headers={**response_headers, "content-range": f"bytes */{size}"})
+        if byte_range:
+            start, end = byte_range
+            response_headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+            response_headers["content-length"] = str(end - start)
+            return StreamingResponse(_read_range(path, start, end), status_code=206,
+                                     media_type=media_type, headers=response_headers)
+
+    if encoding:
+        variant = await asyncio.to_thread(get_precompressed_cache().open_variant, path, stat_result, encoding)
+        if variant:
+            response_headers["content-encoding"] = encoding
+            response_headers["content-length"] = str(os.fstat(variant.fileno()).st_size)
+            # Con Content-Encoding los tramos se referirían a los bytes comprimidos
+            del response_headers["accept-ranges"]
+            return StreamingResponse(_read_open_file(variant), media_type=media_type, headers=response_headers)
+        # Sin variante se sirve el original: su ETag es el de la representación sin comprimir
+        response_headers["etag"] = make_etag(stat_result)
+
+    return WholeFileResponse(path, media_type=media_type, headers=response_headers, stat_result=stat_result)
+
+
+# ========== ESTÁTICOS ==========
+
+class StaticAssets:
+    """Huellas (hash del contenido) de los archivos de /static para URLs cacheables para siempre"""
+
+    def __init__(self, directory: str = "static", url_prefix: str = "/static"):
+        self.directory = directory
+        self.url_prefix = url_prefix
+        self._fingerprints: Dict[str, Tuple[int, int, str]] = {}
+        self._lock = threading.Lock()
+
+    def fingerprint(self, relative_path: str) -> Optional[str]:
+        """Primeros 10 hex del SHA-256 del archivo (se recalcula si cambia), o None si no existe"""
+        full_path = os.path.join(self.directory, relative_path.lstrip("/"))
+        try:
+            st = os.stat(full_path)
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._fingerprints.get(relative_path)
+        if cached and cached[:2] == (st.st_size, st.st_mtime_ns):
+            return cached[2]
+        with open(full_path, 'rb') as f:
+            fingerprint = hashlib.sha256(f.read()).hexdigest()[:10]
+        with self._lock:
+            self._fingerprints[relative_path] = (st.st_size, st.st_mtime_ns, fingerprint)
+        return fingerprint
+
+    def url(self, relative_path: str) -> str:
+        """URL con huella, para las plantillas: {{ static_url('js/main.js') }}"""
+        relative_path = relative_path.lstrip("/")
+        fingerprint = self.fingerprint(relative_path)
+        url = f"{self.url_prefix}/{relative_path}"
+        return f"{url}?v={fingerprint}" if fingerprint else url
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles con file_response: 304/Range/gzip y, si la URL lleva la
+    huella vigente (?v=...), Cache-Control inmutable. Sin huella (p.ej. los
+    import de los módulos JS) el navegador revalida con el ETag.
+    """
+
+    def __init__(self, *args, assets: StaticAssets, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.assets = assets
+
+    async def get_response(self, path: str, scope) -> Response:
+        if scope["method"] in ("GET", "HEAD"):
+            try:
+                full_path, stat_result = await asyncio.to_thread(self.lookup_path, path)
+            except (OSError, ValueError):
+                # Los errores de ruta los resuelve StaticFiles (401/404)
+                return await super().get_response(path, scope)
+            if stat_result and stat.S_ISREG(stat_result.st_mode):
+                version = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("v", [None])[0]
+                immutable = version is not None and version == self.assets.fingerprint(path)
+                return await file_response(Headers(scope=scope), full_path, attachment=False,
+                                           cache_control=IMMUTABLE if immutable else REVALIDATE,
+                                           stat_result=stat_result)
+        return await super().get_response(path, scope)
+
+
+# ========== INSTANCIA DE PROCESO ==========
+
+_cache: Optional[PrecompressedCache] = None
+_assets: Optional[StaticAssets] = None
+_instances_lock = threading.Lock()
+
+def get_precompressed_cache() -> PrecompressedCache:
+    """Devuelve la cache de variantes comprimidas compartida"""
+    global _cache
+    with _instances_lock:
+        if _cache is None:
+            _cache = PrecompressedCache()
+        return _cache
+
+
+def get_static_assets() -> StaticAssets:
+    """Devuelve las huellas de /static compartidas"""
+    global _assets
+    with _instances_lock:
+        if _assets is None:
+            _assets = StaticAssets()
+        return _assets
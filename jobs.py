@@ -0,0 +1,302 @@
+# jobs.py - TRABAJOS EN SEGUNDO PLANO PARA COMANDOS LARGOS
+"""
+Comandos como "limpiar auto:", "rellenar auto:", "ayudas buscar" o las
+búsquedas de patentes pueden tardar decenas de segundos. En lugar de tener
+abierta la petición /ask (y arriesgarse al timeout del proxy), se crea un
+trabajo: POST /jobs devuelve su id al momento, el comando se ejecuta en
+segundo plano y el cliente consulta GET /jobs/{id} o se suscribe al stream
+GET /jobs/{id}/events.
+
+Los trabajos y sus resultados se guardan en SQLite, así que un cliente que se
+reconecta (o recarga la página) puede recuperarlos.
+
+El progreso: 0.1-0.2 lo marca main.py (enrutado) y el tramo TOOL_PROGRESS_START
+a TOOL_PROGRESS_END lo reparten las herramientas largas con report_step (RMN,
+ayudas, patentes). En el pool de procesos el ContextVar del trabajo no existe:
+tool_executor instala un progress_sink que reenvía el avance al proceso padre.
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from metrics import get_metrics, caller_name
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_FILE = "cache/jobs.db"
+
+SQLITE_SECONDS = get_metrics().histogram('sqlite_seconds', 'Duración de cada bloque de consultas SQLite', ['db', 'operation'])
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+ERROR = 'error'
+FINISHED_STATES = (DONE, ERROR)
+
+# Trabajo que se está ejecutando en el contexto actual (ver report_progress)
+_current_job: ContextVar[Optional[str]] = ContextVar('current_job', default=None)
+
+# Destino alternativo del progreso (p.ej. la cola hacia el proceso padre)
+_progress_sink: ContextVar[Optional[Callable[[float, str], None]]] = ContextVar('progress_sink', default=None)
+
+# Tramo del progreso que corresponde a la herramienta
+TOOL_PROGRESS_START = 0.2
+TOOL_PROGRESS_END = 0.95
+
+
+class JobStore:
+    """Tabla de trabajos: estado, progreso y resultado (JSON)"""
+
+    def __init__(self, db_file: str = DEFAULT_DB_FILE, max_age_days: int = 7):
+        self.db_file = db_file
+        self.max_age = max_age_days * 86400
+        self.init_database()
+
+    def init_database(self):
+        os.makedirs(os.path.dirname(self.db_file) or '.', exist_ok=True)
+        with self.get_db_connection() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    command TEXT NOT NULL,
+                    tool TEXT,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    message TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id, created_at)')
+            conn.commit()
+
+    @contextmanager
+    def get_db_connection(self):
+        operation = caller_name()
+        start = time.perf_counter()
+        conn = sqlite3.connect(self.db_file, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+            SQLITE_SECONDS.observe(time.perf_counter() - start, db='jobs', operation=operation)
+
+    def create(self, user_id: str, command: str) -> str:
+        job_id = uuid.uuid4().hex
+        with self.get_db_connection() as conn:
+            conn.execute(
+                'INSERT INTO jobs (job_id, user_id, command, status, message, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, user_id, command, QUEUED, 'En cola', time.time())
+            )
+            conn.commit()
+        return job_id
+
+    def update(self, job_id: str, **fields):
+        if 'result' in fields:
+            fields['result'] = json.dumps(fields['result'], ensure_ascii=False, default=str)
+        assignments = ', '.join(f'{column} = ?' for column in fields)
+        with self.get_db_connection() as conn:
+            conn.execute(f'UPDATE jobs SET {assignments} WHERE job_id = ?', (*fields.values(), job_id))
+            conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self.get_db_connection() as conn:
+            row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def list_for_user(self, user_id: str, limit: int = 20) -> List[Dict]:
+        with self.get_db_connection() as conn:
+            rows = conn.execute(
+                'SELECT * FROM jobs WHERE user_id = ? ORDER BY created_at DESC LIMIT ?',
+                (user_id, limit)
+            ).fetchall()
+        # Sin el resultado: la lista es para ver el estado
+        return [{k: v for k, v in self._to_dict(row).items() if k != 'result'} for row in rows]
+
+    def fail_interrupted(self) -> int:
+        """Marca como fallidos los trabajos que quedaron a medias (reinicio del servidor)"""
+        with self.get_db_connection() as conn:
+            cursor = conn.execute(
+                'UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE status IN (?, ?)',
+                (ERROR, 'Interrumpido por un reinicio del servidor', time.time(), QUEUED, RUNNING)
+            )
+            conn.commit()
+            return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        with self.get_db_connection() as conn:
+            cursor = conn.execute('DELETE FROM jobs WHERE created_at < ?', (time.time() - self.max_age,))
+            conn.commit()
+            return cursor.rowcount
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict:
+        job = dict(row)
+        if job.get('result') is not None:
+            job['result'] = json.loads(job['result'])
+        return job
+
+
+class JobManager:
+    """
+    Lanza los trabajos como tareas del event loop (el trabajo pesado lo hace el
+    ToolExecutor) y avisa a los suscriptores del stream de cada cambio.
+
+    Lo que escribe en SQLite desde el event loop va a un único hilo escritor:
+    no bloquea el loop y las escrituras de un trabajo se aplican en orden (un
+    progreso tardío no pisa el resultado).
+    """
+
+    def __init__(self, store: JobStore, max_running: int = 8):
+        self.store = store
+        self.max_running = max_running
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tasks = set()
+        self._changed: Dict[str, asyncio.Event] = {}
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='jobs-db')
+
+    async def submit(self, user_id: str, command: str,
+                     handler: Callable[[str, str], Awaitable[Dict[str, Any]]]) -> str:
+        """Crea el trabajo y lo programa; ``handler(command, user_id)`` produce el resultado"""
+        self._loop = asyncio.get_running_loop()
+        job_id = await self._loop.run_in_executor(self._writer, self.store.create, user_id, command)
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_running)
+
+        task = asyncio.create_task(self._run(job_id, user_id, command, handler))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job_id
+
+    async def _run(self, job_id: str, user_id: str, command: str, handler):
+        _current_job.set(job_id)
+        async with self._semaphore:
+            await self._update_async(job_id, status=RUNNING, started_at=time.time(), progress=0.05, message='Ejecutando')
+            try:
+                result = await handler(command, user_id)
+                await self._update_async(job_id, status=DONE, progress=1.0, message='Completado',
+                                         tool=result.get('tool'), result=result, finished_at=time.time())
+            except Exception as e:
+                logger.exception("❌ Error en trabajo %.8s: %s", job_id, e)
+                await self._update_async(job_id, status=ERROR, message='Error', error=str(e), finished_at=time.time())
+
+    def _update(self, job_id: str, **fields):
+        self.store.update(job_id, **fields)
+        self._notify(job_id)
+
+    async def _update_async(self, job_id: str, **fields):
+        await asyncio.get_running_loop().run_in_executor(self._writer, functools.partial(self._update, job_id, **fields))
+
+    def _on_loop(self) -> bool:
+        try:
+            return self._loop is not None and asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        """store.get fuera del event loop"""
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def _notify(self, job_id: str):
+        """Despierta a los streams del trabajo (se puede llamar desde cualquier hilo)"""
+        def wake():
+            event = self._changed.pop(job_id, None)
+            if event:
+                event.set()
+
+        if self._loop is None:
+            return
+        if self._on_loop():
+            wake()
+            return
+        self._loop.call_soon_threadsafe(wake)
+
+    def report_progress(self, job_id: str, progress: float, message: str):
+        fields = {'progress': max(0.0, min(progress, 0.99)), 'message': message}
+        if self._on_loop():
+            # Herramienta asíncrona: sin esperar a SQLite, en orden con el resto de escrituras
+            self._writer.submit(self._update, job_id, **fields)
+        else:
+            self._update(job_id, **fields)
+
+    def watch(self, job_id: str) -> asyncio.Event:
+        """
+        Evento que se activa en el próximo cambio del trabajo. Hay que pedirlo
+        ANTES de leer el estado para no perder un cambio entre medias.
+        """
+        return self._changed.setdefault(job_id, asyncio.Event())
+
+    @staticmethod
+    async def wait_for_change(event: asyncio.Event, timeout: float) -> bool:
+        """Espera al evento de watch(); False si pasa el timeout"""
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+def current_job_id() -> Optional[str]:
+    """Id del trabajo que se ejecuta en el contexto actual, o None"""
+    return _current_job.get()
+
+
+@contextmanager
+def progress_sink(sink: Optional[Callable[[float, str], None]]):
+    """Dentro del bloque, report_progress llama a ``sink`` en lugar de actualizar el trabajo"""
+    token = _progress_sink.set(sink)
+    try:
+        yield
+    finally:
+        _progress_sink.reset(token)
+
+
+def report_progress(progress: float, message: str):
+    """
+    Informa del avance del trabajo en curso (0..1). No hace nada fuera de un
+    trabajo, así que las herramientas pueden llamarla siempre.
+    """
+    sink = _progress_sink.get()
+    if sink:
+        sink(progress, message)
+        return
+    job_id = _current_job.get()
+    if job_id:
+        get_job_manager().report_progress(job_id, progress, message)
+
+
+def report_step(step: int, total: int, message: str):
+    """Avance de una herramienta por pasos (``step`` de ``total`` hechos)"""
+    fraction = min(step / total, 1.0) if total else 0.0
+    report_progress(TOOL_PROGRESS_START + (TOOL_PROGRESS_END - TOOL_PROGRESS_START) * fraction, message)
+
+
+# ========== INSTANCIA DE PROCESO ==========
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+def get_job_manager() -> JobManager:
+    """Devuelve el gestor de trabajos compartido"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = JobManager(JobStore())
+        return _manager
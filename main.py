@@ -1,16 +1,21 @@
 # main.py - VERSIÓN OPTIMIZADA PARA RENDER
+import asyncio
 import math
 import os
+import sys
 import threading
 import time
 from datetime import datetime
 from pathlib import Path
 
+if __name__ == "__main__" and "--profile-startup" in sys.argv:
+    # Antes de importar nada más: el perfil se toma en un proceso limpio
+    from startup import profile_startup
+    sys.exit(profile_startup("main"))
+
 import io
 import json
-from docx import Document
-from requests import request
-from tools.document_filler import document_filler
+import logging
 
 from pydantic import BaseModel
 from typing import Optional
@@ -19,17 +24,53 @@ import schedule
 import uvicorn
 from dotenv import load_dotenv
 from fastapi import FastAPI, Form, Request, UploadFile, File, HTTPException
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
 
-# Imports locales
-from agent import use_tool, ask_gemini_for_tool
-from multi_user_notification_system import multi_user_system
-from tools.rmn_spectrum_cleaner import rmn_cleaner
+# Logging antes de importar los módulos que registran al cargarse
+from app_logging import configure_logging
 
 load_dotenv()
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Imports locales (ligeros; los pesados, en load_subsystems)
+from command_router import get_command_router
+from routing_cache import get_routing_cache
+from sources.source_health import get_source_health
+from tool_executor import get_tool_executor, ToolTimeoutError
+from jobs import get_job_manager, report_progress, FINISHED_STATES, TOOL_PROGRESS_START
+from tool_registry import ASYNC_TOOLS, USER_TOOL_MODULES, get_tool_registry
+from startup import BootState
+from metrics import get_metrics
+from tracing import get_tracer, is_trace_id, render_trace_html, span, span_attributes
+from uploads import UploadLimitMiddleware, UploadTooLargeError, max_upload_bytes, save_upload
+from blob_store import get_blob_store
+from sources.ayudas_store import get_seen_store, LEGACY_CACHE_FILE
+from downloads import CachedStaticFiles, file_response, get_static_assets
+
+# ============= ARRANQUE RÁPIDO =============
+
+# FAST_BOOT=1 (o --fast-boot): /health y /static responden en cuanto arranca
+# uvicorn y los subsistemas pesados se cargan en segundo plano
+FAST_BOOT = os.getenv("FAST_BOOT", "0") == "1" or "--fast-boot" in sys.argv
+BOOT_WAIT_TIMEOUT = float(os.getenv("BOOT_WAIT_TIMEOUT", 60))
+BOOT_EXEMPT_PATHS = ("/health", "/metrics", "/static/", "/sw.js")
+
+boot = BootState()
+
+# Subsistemas pesados: agent.py (genai) y el sistema de notificaciones (todas las fuentes)
+use_tool = use_tool_async = ask_gemini = multi_user_system = None
+
+def load_subsystems():
+    """Importa los subsistemas pesados (al importar main o, con FAST_BOOT, en segundo plano)"""
+    global use_tool, use_tool_async, ask_gemini, multi_user_system
+    from agent import use_tool, use_tool_async, ask_gemini
+    from multi_user_notification_system import multi_user_system
+
+if not FAST_BOOT:
+    load_subsystems()
 
 # ============= CONFIGURACIÓN DE LA APLICACIÓN =============
 
@@ -44,6 +85,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Con FAST_BOOT, las peticiones que necesitan los subsistemas esperan a que carguen
+@app.middleware("http")
+async def wait_for_boot(request: Request, call_next):
+    if not boot.ready and not request.url.path.startswith(BOOT_EXEMPT_PATHS):
+        if not await boot.wait(BOOT_WAIT_TIMEOUT):
+            return JSONResponse(
+                {"status": "starting" if boot.error is None else "error", "boot": boot.snapshot()},
+                status_code=503,
+                headers={"Retry-After": "5"}
+            )
+    return await call_next(request)
+
 # Headers de seguridad
 @app.middleware("http")
 async def add_security_headers(request: Request, call_next):
@@ -54,11 +107,12 @@ async def add_security_headers(request: Request, call_next):
     response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
     return response
 
-# Montar archivos estáticos
-app.mount("/static", StaticFiles(directory="static"), name="static")
+# Montar archivos estáticos (ETag, gzip y caché inmutable con ?v=<huella>, ver downloads.py)
+app.mount("/static", CachedStaticFiles(directory="static", assets=get_static_assets()), name="static")
 
 # Templates
 templates = Jinja2Templates(directory="templates")
+templates.env.globals["static_url"] = get_static_assets().url
 
 # ============= CONFIGURACIÓN DE DIRECTORIOS =============
 
@@ -74,6 +128,12 @@ DIRECTORIES = {
     "CACHE_DIR": "cache"
 }
 
+# Límite de las subidas antes de que Starlette lea el cuerpo (ver uploads.py)
+app.add_middleware(UploadLimitMiddleware, limits={
+    "/upload/template": max_upload_bytes(DIRECTORIES["TEMPLATES_DIR"]),
+    "/upload/spectrum": max_upload_bytes(DIRECTORIES["RMN_INPUT_DIR"]),
+})
+
 # Crear todos los directorios necesarios
 for dir_path in DIRECTORIES.values():
     Path(dir_path).mkdir(parents=True, exist_ok=True)
@@ -144,146 +204,116 @@ class Utils:
             }
         except:
             return None
+    
+    @staticmethod
+    def document_filler():
+        """Instancia de DocumentFiller (genai, docx, pandas... se importan en el primer uso)"""
+        return get_tool_registry().module("document_filler").document_filler
 
 # ============= MANEJADORES DE COMANDOS =============
 
+ROUTING_DECISIONS = get_metrics().counter('routing_decisions_total', 'Decisiones de enrutado por origen', ['source'])
+
 class CommandHandler:
     """Centraliza el manejo de comandos para evitar duplicación"""
     
     @staticmethod
     async def process_command(user_input: str, user_id: str) -> dict:
-        """Procesa un comando y retorna respuesta estructurada"""
-        user_input_strip = user_input.strip().lower()
-        
-        # ============================================================
-        # COMANDOS EXACTOS Y ESPECÍFICOS (MÁXIMA PRIORIDAD)
-        # ============================================================
-        
-        # Comandos de notas (exactos)
-        if user_input_strip in ["leer", "borrar", "descargar", "contar"]:
-            tool = "note"
-            result = use_tool(tool, user_input)
-            return {"tool": tool, "result": result}
-        
-        # Comandos de notas con prefijo
-        if user_input_strip.startswith("guardar:") or user_input_strip.startswith("buscar:"):
-            tool = "note"
-            result = use_tool(tool, user_input)
-            return {"tool": tool, "result": result}
-        
-        # ============================================================
-        # COMANDOS DE DOCUMENTOS (ANTES QUE NOTIFICACIONES)
-        # ============================================================
-        
-        if any(phrase in user_input_strip for phrase in [
-            "listar plantillas",
-            "listar datos", 
-            "plantilla",
-            "rellenar:",
-            "analizar plantilla",
-            "crear ejemplo datos",
-            "usar plantilla:",
-            "convertir a json"
-        ]):
-            tool = "document_filler"
-            result = use_tool(tool, user_input)
-            return {"tool": tool, "result": result}
-        
-        # ============================================================
-        # COMANDOS DE RMN (ANTES QUE NOTIFICACIONES)
-        # ============================================================
-        
-        if any(phrase in user_input_strip for phrase in [
-            "listar espectros",
-            "limpiar:", "analizar:", "comparar:", "exportar:",
-            "espectro", "espectros",
-            "limpiar auto:",
-            "métodos rmn"
-        ]):
-            tool = "rmn_spectrum_cleaner"
-            from tools.rmn_spectrum_cleaner import rmn_cleaner
-            result = rmn_cleaner.run(user_input)
-            return {"tool": tool, "result": result}
-        
-        # ============================================================
-        # COMANDOS DE NOTIFICACIONES (SOLO MUY ESPECÍFICOS)
-        # ============================================================
-        
-        # Solo comandos exactos o muy específicos de notificaciones
-        if (user_input_strip in ["status", "debug", "test", "probar", "resumen", "start", "iniciar", "stop", "detener"]) or \
-        any(phrase in user_input_strip for phrase in [
-            "listar notificaciones",
-            "listar papers",
-            "listar patentes", 
-            "listar emails",
-            "activar emails",
-            "activar patentes",
-            "activar papers",
-            "desactivar emails",
-            "desactivar patentes",
-            "desactivar papers"
-        ]) or \
-        user_input_strip.startswith("keywords") or \
-        user_input_strip.startswith("categories:") or \
-        user_input_strip.startswith("borrar notif"):
+        """
+        Procesa un comando y retorna respuesta estructurada.
+        El enrutado lo resuelve command_router en una pasada; Gemini sólo se
+        consulta si ninguna regla aplica. Las herramientas se ejecutan en el
+        ToolExecutor; en el event loop sólo se esperan las de ASYNC_TOOLS.
+        """
+        executor = get_tool_executor()
+        
+        # Traza de la petición: los spans de use_tool, herramientas y fuentes cuelgan de ésta
+        with get_tracer().start_trace("process_command", command=user_input[:200],
+                                      **{"user.id": user_id}) as root:
+            with span("route") as route_span:
+                route = get_command_router().route(user_input)
+                if route:
+                    tool = route.tool
+                    ROUTING_DECISIONS.inc(source='regla')
+                    logger.debug("🧭 Herramienta: %s (%s '%s')", tool, route.kind, route.pattern)
+                else:
+                    report_progress(0.1, "Eligiendo herramienta")
+                    tool = (await executor.run("gemini", ask_gemini, user_input)).lower().strip()  # normalizar a minúsculas
+                    logger.debug("🔧 Gemini eligió herramienta: %s", tool)
+                route_span.set("tool", tool)
+                route_span.set("rule", bool(route))
             
-            tool = "notifications"
-            import tools.notifications as notif_tool
-            notif_tool.set_current_user_id(user_id)
-            result = notif_tool.run(user_input)
-            return {"tool": tool, "result": result}
-        
-        # ============================================================
-        # COMANDOS DE GENERACIÓN DE CÓDIGO
-        # ============================================================
-        
-        if any(keyword in user_input_strip for keyword in ["generar", "genera", "crear codigo"]):
-            tool = "code_gen"
-            result = use_tool(tool, user_input)
-            return {"tool": tool, "result": result}
-        
-        # ============================================================
-        # FALLBACK: Usar ask_gemini_for_tool
-        # ============================================================
-
-        # Si no coincide con ningún comando específico, usar el sistema de detección
-        tool = ask_gemini_for_tool(user_input).lower().strip()  # normalizar a minúsculas
-        print(f"🔧 Gemini eligió herramienta: {tool}")
-
-        # Diccionario de herramientas que necesitan user_id
-        tool_mapping = {
-            "notifications": "notifications",
-            "ayudas_manager": "ayudas_manager",
-            "patents": "patents_manager",
-            "papers": "papers_manager"
+            root.set("tool", tool)
+            report_progress(TOOL_PROGRESS_START, f"Ejecutando {tool}")
+            result = await CommandHandler.run_tool(tool, user_input, user_id)
+            return {"tool": tool, "result": result, "trace_id": root.trace_id}
+    
+    @staticmethod
+    async def run_tool(tool: str, user_input: str, user_id: str):
+        executor = get_tool_executor()
+        
+        # notifications y ayudas_manager leen el user_id del contexto de la petición
+        get_tool_registry().module("notifications").set_current_user_id(user_id)
+        
+        if tool == "rmn_spectrum_cleaner":
+            # Cálculo numérico: en el pool de procesos
+            return await executor.run_cpu(tool, "tools.rmn_spectrum_cleaner", "rmn_cleaner.run", user_input)
+        
+        if tool in USER_TOOL_MODULES:
+            return await executor.run(tool, get_tool_registry().get(tool), user_input, user_id)
+        
+        if tool in ASYNC_TOOLS:
+            # Esperan a las fuentes en el event loop, sin ocupar un hilo del pool
+            return await executor.run_async(tool, use_tool_async, tool, user_input)
+        
+        return await executor.run(tool, use_tool, tool, user_input)
+    
+    @staticmethod
+    def build_response(user_input: str, command_result: dict) -> dict:
+        """Respuesta JSON de /ask (y resultado de los trabajos) a partir del resultado del comando"""
+        # Limpiar resultado de NaN
+        result = command_result["result"]
+        if isinstance(result, dict):
+            result = Utils.clean_nan_for_json(result)
+        
+        # Determinar tipo de respuesta
+        if isinstance(result, dict) and "type" in result:
+            result_type = result["type"]
+        elif isinstance(result, list):
+            result_type = "list"
+        elif isinstance(result, dict) and "url" in result:
+            result_type = "open_url"
+        else:
+            result_type = "text"
+        
+        return {
+            "result_type": result_type,
+            "result_data": result,
+            "input": user_input,
+            "tool": command_result["tool"],
+            "trace_id": command_result.get("trace_id")
         }
-
-        if tool in tool_mapping:
-            mod_name = tool_mapping[tool]
-            mod = __import__(f"tools.{mod_name}", fromlist=["run"])
-            if tool == "notifications":
-                mod.set_current_user_id(user_id)
-            
-            result = mod.run(user_input, user_id)
-            return {"tool": tool, "result": result}
-
-
-        # Si no está en la lista de herramientas especiales, usar use_tool genérico
-        result = use_tool(tool, user_input)
-        return {"tool": tool, "result": result}
+    
+    @staticmethod
+    async def run_job(user_input: str, user_id: str) -> dict:
+        """Ejecuta un comando como trabajo en segundo plano"""
+        command_result = await CommandHandler.process_command(user_input, user_id)
+        return CommandHandler.build_response(user_input, command_result)
                 
 # ============= SERVICE WORKER =============
 
 @app.get("/sw.js")
-async def service_worker():
-    """Sirve el Service Worker desde la raíz para registro correcto"""
-    return FileResponse(
-        "static/sw.js", 
+async def service_worker(request: Request):
+    """
+    Sirve el Service Worker desde la raíz para registro correcto. Siempre se
+    revalida (no-cache), pero con ETag: si no ha cambiado la respuesta es un 304.
+    """
+    return await file_response(
+        request.headers,
+        "static/sw.js",
+        attachment=False,
         media_type="application/javascript",
-        headers={
-            "Service-Worker-Allowed": "/",
-            "Cache-Control": "no-cache"
-        }
+        headers={"Service-Worker-Allowed": "/"}
     )
 
 # ============= GESTORES DE ARCHIVOS =============
@@ -293,29 +323,36 @@ class FileManager:
     
     @staticmethod
     async def upload_file(file: UploadFile, directory: str, allowed_extensions: list) -> dict:
-        """Maneja upload genérico de archivos"""
+        """Maneja upload genérico de archivos (en streaming, ver uploads.py)"""
         try:
-            file_extension = '.' + file.filename.split('.')[-1].lower()
+            # Sin rutas: sólo el nombre del archivo
+            filename = os.path.basename(file.filename or "")
+            file_extension = '.' + filename.split('.')[-1].lower()
             
-            if file_extension not in allowed_extensions:
+            if not filename or file_extension not in allowed_extensions:
                 return {
                     "success": False,
                     "error": f"Formato no soportado. Use: {', '.join(allowed_extensions)}"
                 }
             
-            file_path = os.path.join(directory, file.filename)
-            
-            with open(file_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
+            saved = await save_upload(file, directory, filename)
+            replaced = saved["previous_sha256"] not in (None, saved["sha256"])
             
             return {
                 "success": True,
-                "message": f"Archivo {file.filename} subido correctamente",
-                "filename": file.filename,
-                "location": f"{directory}/{file.filename}"
+                "message": f"Archivo {filename} subido correctamente"
+                           + (" (reemplaza la versión anterior)" if replaced else ""),
+                "filename": filename,
+                "location": f"{directory}/{filename}",
+                "size": saved["size"],
+                "sha256": saved["sha256"],
+                "deduplicated": saved["deduplicated"],
+                "replaced": replaced
             }
             
+        except UploadTooLargeError as e:
+            logger.warning("📤 Subida rechazada (%s): %s", directory, e)
+            return {"success": False, "error": str(e)}
         except Exception as e:
             return {"success": False, "error": str(e)}
     
@@ -342,6 +379,7 @@ class FileManager:
             file_path = os.path.join(directory, filename)
             if os.path.exists(file_path):
                 os.remove(file_path)
+                get_blob_store().forget(directory, filename)
                 return {"success": True, "message": f"{filename} eliminado correctamente"}
             else:
                 return {"success": False, "error": f"No se encontró {filename}"}
@@ -366,10 +404,10 @@ async def home(request: Request):
             device_info
         )
         
-        print(f"📱 Usuario registrado: {user_id[:12]}... desde {client_info['ip']}")
+        logger.debug("📱 Usuario registrado: %.12s... desde %s", user_id, client_info['ip'])
         
     except Exception as e:
-        print(f"⚠️ Error registrando usuario: {e}")
+        logger.warning("⚠️ Error registrando usuario: %s", e)
     
     return templates.TemplateResponse("index.html", {"request": request})
 
@@ -377,36 +415,25 @@ async def home(request: Request):
 async def ask(request: Request, user_input: str = Form(...)):
     """Endpoint principal para procesar comandos del usuario"""
     user_id = Utils.get_current_user_id(request)
-    print(f"🔄 Procesando comando '{user_input}' para usuario {user_id[:12]}...")
+    logger.debug("🔄 Procesando comando '%s' para usuario %.12s...", user_input, user_id)
     
     try:
         # Procesar comando
         command_result = await CommandHandler.process_command(user_input, user_id)
+        headers = {"X-Trace-Id": command_result["trace_id"]} if command_result.get("trace_id") else None
+        return JSONResponse(CommandHandler.build_response(user_input, command_result), headers=headers)
         
-        # Limpiar resultado de NaN
-        result = command_result["result"]
-        if isinstance(result, dict):
-            result = Utils.clean_nan_for_json(result)
-        
-        # Determinar tipo de respuesta
-        if isinstance(result, dict) and "type" in result:
-            result_type = result["type"]
-        elif isinstance(result, list):
-            result_type = "list"
-        elif isinstance(result, dict) and "url" in result:
-            result_type = "open_url"
-        else:
-            result_type = "text"
-        
+    except ToolTimeoutError as e:
+        logger.warning("⏱️ %s", e)
         return JSONResponse({
-            "result_type": result_type,
-            "result_data": result,
+            "result_type": "error",
+            "result_data": f"⏱️ {e}. Inténtalo de nuevo en unos minutos.",
             "input": user_input,
-            "tool": command_result["tool"]
-        })
+            "tool": "error"
+        }, status_code=504)
         
     except Exception as e:
-        print(f"❌ Error procesando comando: {e}")
+        logger.exception("❌ Error procesando comando: %s", e)
         return JSONResponse({
             "result_type": "error",
             "result_data": f"Error: {str(e)}",
@@ -414,6 +441,71 @@ async def ask(request: Request, user_input: str = Form(...)):
             "tool": "error"
         }, status_code=500)
 
+# ============= TRABAJOS EN SEGUNDO PLANO =============
+
+@app.post("/jobs")
+async def create_job(request: Request, user_input: str = Form(...)):
+    """Lanza un comando largo en segundo plano y devuelve su id al momento"""
+    user_id = Utils.get_current_user_id(request)
+    job_id = await get_job_manager().submit(user_id, user_input, CommandHandler.run_job)
+    logger.debug("🧵 Trabajo %.8s creado para '%s' (%.12s...)", job_id, user_input, user_id)
+    return JSONResponse({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/jobs/{job_id}",
+        "events_url": f"/jobs/{job_id}/events"
+    }, status_code=202)
+
+async def _get_user_job(request: Request, job_id: str) -> dict:
+    """Trabajo del usuario actual (404 si no existe o es de otro usuario)"""
+    job = await get_job_manager().get(job_id)
+    if not job or job["user_id"] != Utils.get_current_user_id(request):
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job
+
+@app.get("/jobs")
+async def list_jobs(request: Request, limit: int = 20):
+    """Últimos trabajos del usuario (sin resultados)"""
+    user_id = Utils.get_current_user_id(request)
+    jobs = await asyncio.to_thread(get_job_manager().store.list_for_user, user_id, min(limit, 100))
+    return JSONResponse({"jobs": jobs})
+
+@app.get("/jobs/{job_id}")
+async def get_job(request: Request, job_id: str):
+    """Estado, progreso y (si ha terminado) resultado de un trabajo"""
+    return JSONResponse(await _get_user_job(request, job_id))
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(request: Request, job_id: str):
+    """Stream (Server-Sent Events) del progreso de un trabajo hasta que termina"""
+    await _get_user_job(request, job_id)
+    manager = get_job_manager()
+    
+    async def stream():
+        last_sent = None
+        while True:
+            changed = manager.watch(job_id)
+            job = await manager.get(job_id)
+            if job is None:
+                return
+            
+            state = (job["status"], job["progress"], job["message"])
+            if state != last_sent:
+                last_sent = state
+                event = "result" if job["status"] in FINISHED_STATES else "progress"
+                yield f"event: {event}\ndata: {json.dumps(job, ensure_ascii=False, default=str)}\n\n"
+            if job["status"] in FINISHED_STATES or await request.is_disconnected():
+                return
+            
+            if not await manager.wait_for_change(changed, timeout=15):
+                # Comentario SSE para que el proxy no cierre la conexión
+                yield ": keep-alive\n\n"
+    
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
 # ============= ENDPOINTS DE ARCHIVOS =============
 
 @app.get("/files")
@@ -462,7 +554,7 @@ async def upload_template(file: UploadFile = File(...)):
         )
         
         if result["success"]:
-            result["next_step"] = f"Analiza la plantilla con: 'analizar: {file.filename}'"
+            result["next_step"] = f"Analiza la plantilla con: 'analizar: {result['filename']}'"
         
         return JSONResponse(result)
     except Exception as e:
@@ -513,7 +605,7 @@ async def fill_template(template_filename: str = Form(...)):
     """
     try:
         # Usar el sistema completo de document_filler
-        result = document_filler.auto_fill_with_database(template_filename)
+        result = Utils.document_filler().auto_fill_with_database(template_filename)
         
         # Si el resultado es un string (error o mensaje)
         if isinstance(result, str):
@@ -567,9 +659,7 @@ async def fill_template(template_filename: str = Form(...)):
         }, status_code=500)
         
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"❌ Error en fill_template: {e}\n{error_trace}")
+        logger.exception("❌ Error en fill_template: %s", e)
         
         return JSONResponse({
             "success": False,
@@ -590,7 +680,7 @@ async def handle_auto_fill(request_data: FillRequest):
     """
     try:
         # 1. Llama a tu función de DocumentFiller como antes
-        result = document_filler.auto_fill_with_database(
+        result = Utils.document_filler().auto_fill_with_database(
             request_data.template_filename, 
             request_data.doc_type
         )
@@ -617,7 +707,7 @@ async def handle_auto_fill(request_data: FillRequest):
         return result
 
     except Exception as e:
-        print(f"Error en /fill/auto: {e}")
+        logger.exception("❌ Error en /fill/auto: %s", e)
         raise HTTPException(
             status_code=500, 
             detail={"success": False, "error": str(e)}
@@ -628,7 +718,7 @@ async def get_master_data():
     try:
         return JSONResponse({
             "success": True,
-            "data": document_filler.user_database
+            "data": Utils.document_filler().user_database
         })
     except Exception as e:
         return JSONResponse({
@@ -640,7 +730,7 @@ async def get_master_data():
 async def update_master_data(data: dict):
     """Actualiza los datos maestros del usuario"""
     try:
-        result = document_filler.update_master_database(data)
+        result = Utils.document_filler().update_master_database(data)
         
         return JSONResponse({
             "success": "✅" in result,
@@ -656,7 +746,7 @@ async def update_master_data(data: dict):
 async def analyze_template(template_filename: str):
     """Analiza qué campos necesita una plantilla"""
     try:
-        result = document_filler.analyze_template(template_filename)
+        result = Utils.document_filler().analyze_template(template_filename)
         
         return JSONResponse({
             "success": True,
@@ -730,7 +820,7 @@ async def upload_spectrum(file: UploadFile = File(...)):
     )
     
     if result["success"]:
-        result["next_step"] = f"Analiza el espectro con: 'analizar: {file.filename}'"
+        result["next_step"] = f"Analiza el espectro con: 'analizar: {result['filename']}'"
     
     return JSONResponse(result)
 
@@ -796,83 +886,85 @@ class DownloadHandler:
     """Maneja todas las descargas de manera unificada"""
     
     @staticmethod
-    async def download_file(directory: str, filename: str, category: str):
-        """Descarga genérica de archivos"""
+    async def download_file(request: Request, directory: str, filename: str, category: str):
+        """Descarga genérica de archivos (tipo MIME, ETag/304 y Range, ver downloads.py)"""
         file_path = os.path.join(directory, filename)
-        if os.path.exists(file_path):
-            return FileResponse(
-                file_path,
-                filename=filename,
-                media_type="application/octet-stream",
-                headers={"Content-Disposition": f"attachment; filename={filename}"}
-            )
+        if os.path.isfile(file_path):
+            return await file_response(request.headers, file_path, filename=filename)
         raise HTTPException(status_code=404, detail=f"No se encontró {category}: {filename}")
 
 @app.get("/download/notes")
-async def download_notes():
+async def download_notes(request: Request):
     """Descarga archivo de notas"""
     return await DownloadHandler.download_file(
+        request,
         DIRECTORIES["NOTES_DIR"], 
         "notas.txt", 
         "las notas"
     )
 
 @app.get("/download/code/{filename}")
-async def download_code(filename: str):
+async def download_code(request: Request, filename: str):
     """Descarga archivo de código"""
     return await DownloadHandler.download_file(
+        request,
         DIRECTORIES["CODE_DIR"],
         filename,
         "el archivo"
     )
 
 @app.get("/download/template/{filename}")
-async def download_template(filename: str):
+async def download_template(request: Request, filename: str):
     """Descarga plantilla"""
     return await DownloadHandler.download_file(
+        request,
         DIRECTORIES["TEMPLATES_DIR"],
         filename,
         "la plantilla"
     )
 
 @app.get("/download/data/{filename}")
-async def download_data_file(filename: str):
+async def download_data_file(request: Request, filename: str):
     """Descarga archivo de datos"""
     return await DownloadHandler.download_file(
+        request,
         DIRECTORIES["DATA_DIR"],
         filename,
         "el archivo de datos"
     )
 
 @app.get("/download/output/{filename}")
-async def download_output_file(filename: str):
+async def download_output_file(request: Request, filename: str):
     """Descarga documento generado"""
     return await DownloadHandler.download_file(
+        request,
         DIRECTORIES["OUTPUT_DIR"],
         filename,
         "el documento"
     )
 
 @app.get("/download/spectrum/{filename}")
-async def download_spectrum(filename: str):
+async def download_spectrum(request: Request, filename: str):
     """Descarga espectro original"""
     return await DownloadHandler.download_file(
+        request,
         DIRECTORIES["RMN_INPUT_DIR"],
         filename,
         "el espectro"
     )
 
 @app.get("/download/cleaned/{filename}")
-async def download_cleaned_spectrum(filename: str):
+async def download_cleaned_spectrum(request: Request, filename: str):
     """Descarga espectro limpio"""
     return await DownloadHandler.download_file(
+        request,
         DIRECTORIES["RMN_OUTPUT_DIR"],
         filename,
         "el espectro limpio"
     )
 
 @app.get("/download/plot/{filename}")
-async def download_plot(filename: str):
+async def download_plot(request: Request, filename: str):
     """Descarga gráfico"""
 
     possible_filenames = [
@@ -882,13 +974,8 @@ async def download_plot(filename: str):
 
     for possible_filename in possible_filenames:
         file_path = os.path.join(DIRECTORIES["RMN_PLOTS_DIR"], possible_filename)
-        if os.path.exists(file_path):
-            return FileResponse(
-                file_path,
-                filename=possible_filename,
-                media_type="image/png",
-                headers={"Content-Disposition": f"attachment; filename={possible_filename}"}
-            )
+        if os.path.isfile(file_path):
+            return await file_response(request.headers, file_path, filename=possible_filename)
 
     raise HTTPException(status_code=404, detail=f"No se encontró el gráfico: {filename}")
 # ============= ENDPOINTS DE NOTIFICACIONES =============
@@ -914,7 +1001,7 @@ async def register_user(request: Request):
             device_info
         )
         
-        print(f"📱 Usuario registrado exitosamente: {user_id[:12]}...")
+        logger.info("📱 Usuario registrado exitosamente: %.12s...", user_id)
         
         return JSONResponse({
             "success": True,
@@ -924,7 +1011,7 @@ async def register_user(request: Request):
             "device_name": device_info.get('device_name', 'Dispositivo Desconocido')
         })
     except Exception as e:
-        print(f"❌ Error registrando usuario: {e}")
+        logger.error("❌ Error registrando usuario: %s", e)
         return JSONResponse({"success": False, "error": str(e)}, status_code=500)
 
 @app.get("/notifications/user/{user_id}")
@@ -946,7 +1033,7 @@ async def get_user_notifications(request: Request, user_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error obteniendo notificaciones: {e}")
+        logger.error("❌ Error obteniendo notificaciones: %s", e)
         return JSONResponse({
             "success": False,
             "notifications": [],
@@ -978,7 +1065,7 @@ async def send_test_notification(request: Request, user_id: str):
             }
         )
         
-        print(f"🧪 Notificación de prueba enviada a {user_id[:12]}...")
+        logger.info("🧪 Notificación de prueba enviada a %.12s...", user_id)
         
         return JSONResponse({
             "success": True,
@@ -987,7 +1074,7 @@ async def send_test_notification(request: Request, user_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error enviando notificación de prueba: {e}")
+        logger.error("❌ Error enviando notificación de prueba: %s", e)
         return JSONResponse({
             "success": False,
             "message": f"Error: {str(e)}"
@@ -1018,7 +1105,7 @@ async def get_notification_history(request: Request, user_id: str):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error obteniendo historial: {e}")
+        logger.error("❌ Error obteniendo historial: %s", e)
         return JSONResponse({
             "success": False,
             "notifications": [],
@@ -1067,7 +1154,7 @@ async def mark_notification_read(request: Request, notification_id: int):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error marcando como leída: {e}")
+        logger.error("❌ Error marcando como leída: %s", e)
         return JSONResponse({
             "success": False,
             "error": str(e)
@@ -1103,7 +1190,7 @@ async def mark_all_notifications_read(request: Request):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error marcando todas como leídas: {e}")
+        logger.error("❌ Error marcando todas como leídas: %s", e)
         return JSONResponse({
             "success": False,
             "error": str(e)
@@ -1133,7 +1220,7 @@ async def clear_notification_history(request: Request):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Error limpiando historial: {e}")
+        logger.error("❌ Error limpiando historial: %s", e)
         return JSONResponse({
             "success": False,
             "error": str(e)
@@ -1203,7 +1290,7 @@ async def check_notes():
             })
             
     except Exception as e:
-        print(f"❌ Error verificando notas: {e}")
+        logger.error("❌ Error verificando notas: %s", e)
         return JSONResponse({
             'error': str(e),
             'exists': False,
@@ -1213,11 +1300,26 @@ async def check_notes():
 @app.get("/health")
 async def health_check():
     """Health check del sistema"""
+    if not boot.ready:
+        # FAST_BOOT: el servidor ya responde, los subsistemas siguen cargando
+        return JSONResponse({
+            "status": "starting" if boot.error is None else "error",
+            "boot": boot.snapshot(),
+            "timestamp": datetime.now().isoformat(),
+            "version": "2.0.0"
+        }, status_code=200 if boot.error is None else 500)
+    
     try:
         return JSONResponse({
             "status": "healthy",
             "notifications_system": "active" if multi_user_system.running else "inactive",
             "active_users": len(multi_user_system.get_active_users(hours=24)),
+            "sources": get_source_health().snapshot(),
+            "tool_executor": get_tool_executor().stats(),
+            "routing_cache": dict(get_routing_cache().stats),
+            "tool_registry": get_tool_registry().stats(),
+            "blob_store": get_blob_store().stats(),
+            "boot": boot.snapshot(),
             "timestamp": datetime.now().isoformat(),
             "version": "2.0.0"
         })
@@ -1228,6 +1330,37 @@ async def health_check():
             "timestamp": datetime.now().isoformat()
         }, status_code=500)
 
+@app.get("/metrics")
+async def metrics():
+    """Métricas de latencia y volumen en formato de texto de Prometheus"""
+    return PlainTextResponse(
+        get_metrics().render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+@app.get("/debug/traces")
+async def debug_traces(request: Request):
+    """Debug: últimas trazas del usuario actual (las más recientes primero)"""
+    user_id = Utils.get_current_user_id(request)
+    traces = [t for t in get_tracer().recent() if t["attributes"].get("user.id") == user_id]
+    return JSONResponse({"traces": traces, "count": len(traces)})
+
+@app.get("/debug/trace/{trace_id}")
+async def debug_trace(request: Request, trace_id: str, format: str = "html"):
+    """Debug: cascada de spans de una traza (?format=json para la forma OTLP)"""
+    if not is_trace_id(trace_id):
+        raise HTTPException(status_code=404, detail="Traza no encontrada")
+    # Si ya no está en memoria, get() recorre cache/traces.jsonl: fuera del event loop
+    spans = await asyncio.to_thread(get_tracer().get, trace_id)
+    root = next((s for s in spans or [] if not s["parentSpanId"]), None)
+    # Sólo el usuario que lanzó el comando puede ver su traza
+    if root is None or span_attributes(root).get("user.id") != Utils.get_current_user_id(request):
+        raise HTTPException(status_code=404, detail="Traza no encontrada")
+    
+    if format == "json":
+        return JSONResponse({"trace_id": trace_id, "spans": spans})
+    return HTMLResponse(render_trace_html(trace_id, spans))
+
 @app.get("/debug/user")
 async def debug_user_info(request: Request):
     """Debug: Ver información del usuario detectado - Útil para troubleshooting en Render"""
@@ -1261,74 +1394,102 @@ async def debug_user_info(request: Request):
 
 # ============= EVENTOS DE CICLO DE VIDA =============
 
-@app.on_event("startup")
-async def startup_event():
-    """Inicializar el sistema al arrancar"""
+def start_subsystems():
+    """Inicialización síncrona (la base de datos ya la crea multi_user_system al importarse)"""
     try:
-        print("=" * 60)
-        print("🚀 INICIANDO AGENTE GEMINI")
-        print("=" * 60)
-        
-        # Inicializar base de datos
-        multi_user_system.init_database()
-        print("✅ Base de datos inicializada")
+        # Compilar la tabla de enrutado de comandos
+        router = get_command_router()
+        logger.info("🧭 Router de comandos: %d reglas", len(router.rules))
+        
+        # Precargar las herramientas en segundo plano (TOOL_WARMUP=0 lo desactiva)
+        if os.getenv("TOOL_WARMUP", "1") != "0":
+            get_tool_registry().start_warm_up()
+        
+        # Trabajos que quedaron a medias en el proceso anterior
+        job_store = get_job_manager().store
+        interrupted = job_store.fail_interrupted()
+        expired = job_store.purge_expired()
+        if interrupted or expired:
+            logger.info("🧵 Trabajos: %d interrumpidos, %d expirados eliminados", interrupted, expired)
+        
+        # IDs de ayudas vistos: importar el antiguo JSON (una vez) y purgar caducados
+        seen_store = get_seen_store()
+        seen_store.migrate_json(LEGACY_CACHE_FILE)
+        seen_store.purge_expired()
+        
+        # Blobs de subidas que ya no usa ningún archivo
+        collected = get_blob_store().gc()
+        if collected["blobs_removed"]:
+            logger.info("🗑️ Almacén de subidas: %d blobs sin uso eliminados (%d bytes)",
+                        collected["blobs_removed"], collected["bytes_freed"])
         
         # Verificar directorios
         for name, path in DIRECTORIES.items():
             if os.path.exists(path):
-                print(f"✅ {name}: {path}")
+                logger.debug("✅ %s: %s", name, path)
             else:
                 os.makedirs(path, exist_ok=True)
-                print(f"📁 {name} creado: {path}")
+                logger.info("📁 %s creado: %s", name, path)
         
         # Iniciar monitoreo de notificaciones en background
         success = multi_user_system.start_background_monitoring()
         if success:
-            print("🔔 Sistema de notificaciones multi-usuario iniciado")
+            logger.info("🔔 Sistema de notificaciones multi-usuario iniciado")
         else:
-            print("⚠️ Sistema de notificaciones ya estaba ejecutándose")
+            logger.warning("⚠️ Sistema de notificaciones ya estaba ejecutándose")
         
         # Información del entorno
         port = int(os.environ.get("PORT", 8000))
         is_render = os.environ.get("RENDER", False)
         
-        print("=" * 60)
-        print(f"📦 Versión: 2.0.0")
-        print(f"🌍 Entorno: {'Render' if is_render else 'Local'}")
-        print(f"🔌 Puerto: {port}")
-        print(f"📁 Directorios: {len(DIRECTORIES)}")
-        print(f"🔧 Herramientas: 10+")
-        print("=" * 60)
-        print("✅ APLICACIÓN LISTA")
-        print("=" * 60)
+        logger.info("✅ APLICACIÓN LISTA", extra={
+            'version': app.version,
+            'entorno': 'Render' if is_render else 'Local',
+            'puerto': port,
+            'directorios': len(DIRECTORIES),
+        })
         
     except Exception as e:
-        print(f"❌ Error iniciando sistema: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Error iniciando sistema: %s", e)
+
+@app.on_event("startup")
+async def startup_event():
+    """Inicializar el sistema al arrancar"""
+    logger.info("🚀 INICIANDO AGENTE GEMINI")
+    
+    if FAST_BOOT:
+        # No se espera: uvicorn empieza a aceptar conexiones ya
+        app.state.boot_task = asyncio.create_task(boot.run([
+            ("imports", load_subsystems),
+            ("init", start_subsystems),
+        ]))
+        return
+    
+    start_subsystems()
+    boot.mark_ready()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Detener el sistema al cerrar"""
     try:
-        print("\n" + "=" * 60)
-        print("⏹️ DETENIENDO AGENTE GEMINI")
-        print("=" * 60)
+        logger.info("⏹️ DETENIENDO AGENTE GEMINI")
         
-        # Detener monitoreo de notificaciones
-        multi_user_system.stop_background_monitoring()
-        print("🔔 Sistema de notificaciones detenido")
+        get_tool_executor().shutdown()
         
-        # Guardar estadísticas finales
-        active_users = len(multi_user_system.get_active_users(hours=24))
-        print(f"📊 Usuarios activos últimas 24h: {active_users}")
+        # Con FAST_BOOT puede que los subsistemas no llegaran a cargarse
+        if multi_user_system is not None:
+            # Detener monitoreo de notificaciones
+            multi_user_system.stop_background_monitoring()
+            logger.info("🔔 Sistema de notificaciones detenido")
+            
+            # Guardar estadísticas finales
+            active_users = len(multi_user_system.get_active_users(hours=24))
+            logger.info("📊 Usuarios activos últimas 24h: %d", active_users)
         
-        print("=" * 60)
-        print("👋 APLICACIÓN CERRADA CORRECTAMENTE")
-        print("=" * 60)
+        logger.info("👋 APLICACIÓN CERRADA CORRECTAMENTE")
         
     except Exception as e:
-        print(f"⚠️ Error deteniendo sistema: {e}")
+        logger.warning("⚠️ Error deteniendo sistema: %s", e)
 
 # ============= PUNTO DE ENTRADA PRINCIPAL =============
 
@@ -1352,6 +1513,7 @@ if __name__ == "__main__":
     print(f"📍 Puerto: {port}")
     print(f"📍 URL local: http://localhost:{port}")
     print(f"🔔 Notificaciones: Habilitadas")
+    print(f"⚡ Arranque rápido: {'Sí' if FAST_BOOT else 'No'}")
     print(f"📁 Directorios: {', '.join(DIRECTORIES.keys())}")
     print("=" * 60 + "\n")
     
@@ -1,11 +1,25 @@
 import sqlite3, hashlib, uuid, json, time, threading
+import asyncio
+import logging
 from datetime import datetime, timedelta
 from contextlib import contextmanager
 
-from sources.papers import check_papers
-from sources.patents import check_patents
-from sources.ayudas_real import check_ayudas
+from sources.papers import check_papers_async
+from sources.patents import check_patents_async
+from sources.ayudas_real import check_ayudas_async
+from sources.async_http import get_async_http_client
 from sources.emails import check_emails
+from metrics import get_metrics, caller_name
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+SQLITE_SECONDS = get_metrics().histogram('sqlite_seconds', 'Duración de cada bloque de consultas SQLite', ['db', 'operation'])
+MONITOR_CYCLE_SECONDS = get_metrics().histogram('monitor_cycle_seconds', 'Duración de cada vuelta del monitor de notificaciones')
+MONITOR_USERS = get_metrics().gauge('monitor_users', 'Usuarios activos en la última vuelta del monitor')
+
+# Usuarios comprobados a la vez en cada vuelta del monitor
+MONITOR_CONCURRENCY = 8
 
 class MultiUserNotificationSystem:
     def __init__(self):
@@ -57,18 +71,22 @@ class MultiUserNotificationSystem:
                         FOREIGN KEY (user_id) REFERENCES users (user_id)
                     );
                 ''')
-                print("✅ Base de datos inicializada correctamente")
+                logger.info("✅ Base de datos inicializada correctamente")
         except Exception as e:
-            print(f"❌ Error inicializando base de datos: {e}")
+            logger.error("❌ Error inicializando base de datos: %s", e)
 
     @contextmanager
     def get_db_connection(self):
+        operation = caller_name()
+        start = time.perf_counter()
         conn = sqlite3.connect(self.db_file, timeout=30.0)
         conn.row_factory = sqlite3.Row
         try:
-            yield conn
+            with span('sqlite', db='notifications', operation=operation):
+                yield conn
         finally:
             conn.close()
+            SQLITE_SECONDS.observe(time.perf_counter() - start, db='notifications', operation=operation)
 
     # ----------------------------
     # Usuarios
@@ -134,7 +152,7 @@ class MultiUserNotificationSystem:
                 conn.commit()
                 return True
         except Exception as e:
-            print(f"❌ Error updating user config: {e}")
+            logger.error("❌ Error updating user config: %s", e)
             return False
 
     def get_user_config(self, user_id: str) -> dict:
@@ -143,7 +161,7 @@ class MultiUserNotificationSystem:
                 result = conn.execute("SELECT config FROM users WHERE user_id=?", (user_id,)).fetchone()
                 return json.loads(result["config"]) if result else {}
         except Exception as e:
-            print(f"❌ Error getting user config: {e}")
+            logger.error("❌ Error getting user config: %s", e)
             return {}
 
     # ----------------------------
@@ -158,7 +176,7 @@ class MultiUserNotificationSystem:
                 )
                 conn.commit()
         except Exception as e:
-            print(f"❌ Error saving notification: {e}")
+            logger.error("❌ Error saving notification: %s", e)
 
     def get_pending_notifications(self, user_id: str) -> list:
         """Obtener notificaciones pendientes para un usuario"""
@@ -192,7 +210,7 @@ class MultiUserNotificationSystem:
                 
                 return result
         except Exception as e:
-            print(f"❌ Error getting pending notifications: {e}")
+            logger.error("❌ Error getting pending notifications: %s", e)
             return []
 
     def add_notification(self, user_id: str, notif_type: str, title: str, message: str, data: dict = None):
@@ -204,9 +222,9 @@ class MultiUserNotificationSystem:
                     VALUES (?, ?, ?, ?, ?)
                 """, (user_id, notif_type, title, message, json.dumps(data) if data else "{}"))
                 conn.commit()
-                print(f"✅ Notification added for user {user_id[:8]}: {title}")
+                logger.debug("✅ Notification added for user %.8s: %s", user_id, title)
         except Exception as e:
-            print(f"❌ Error adding notification: {e}")
+            logger.error("❌ Error adding notification: %s", e)
 
     def get_active_users(self, hours: int = 24) -> list:
         """Obtener usuarios activos en las últimas X horas"""
@@ -221,7 +239,7 @@ class MultiUserNotificationSystem:
                 
                 return [u["user_id"] for u in users]
         except Exception as e:
-            print(f"❌ Error getting active users: {e}")
+            logger.error("❌ Error getting active users: %s", e)
             return []
 
     def get_user_stats(self, user_id: str) -> dict:
@@ -248,7 +266,7 @@ class MultiUserNotificationSystem:
                     "total_notifications": total_notifications
                 }
         except Exception as e:
-            print(f"❌ Error getting user stats: {e}")
+            logger.error("❌ Error getting user stats: %s", e)
             return {"config": {}, "state": {}, "total_notifications": 0}
 
     def get_all_notifications(self, user_id: str, limit: int = 50, include_delivered: bool = True) -> list:
@@ -290,7 +308,7 @@ class MultiUserNotificationSystem:
                 
                 return result
         except Exception as e:
-            print(f"❌ Error getting all notifications: {e}")
+            logger.error("❌ Error getting all notifications: %s", e)
             return []
 
     def delete_notification(self, user_id: str, notification_id: int) -> bool:
@@ -311,7 +329,7 @@ class MultiUserNotificationSystem:
                 conn.commit()
                 return True
         except Exception as e:
-            print(f"❌ Error deleting notification: {e}")
+            logger.error("❌ Error deleting notification: %s", e)
             return False
 
     def delete_all_notifications(self, user_id: str, notification_type: str = None) -> int:
@@ -329,7 +347,7 @@ class MultiUserNotificationSystem:
                 conn.commit()
                 return result.rowcount
         except Exception as e:
-            print(f"❌ Error deleting all notifications: {e}")
+            logger.error("❌ Error deleting all notifications: %s", e)
             return 0
 
     def get_notifications_by_type(self, user_id: str, notification_type: str, limit: int = 20) -> list:
@@ -358,7 +376,7 @@ class MultiUserNotificationSystem:
                 
                 return result
         except Exception as e:
-            print(f"❌ Error getting notifications by type: {e}")
+            logger.error("❌ Error getting notifications by type: %s", e)
             return []
 
     def get_notification_summary(self, user_id: str) -> dict:
@@ -394,33 +412,60 @@ class MultiUserNotificationSystem:
                 
                 return result
         except Exception as e:
-            print(f"❌ Error getting notification summary: {e}")
+            logger.error("❌ Error getting notification summary: %s", e)
             return {"total": 0, "by_type": {}}
 
-    def run_checks(self, user_id: str):
-        config = self.get_user_config(user_id)
+    async def run_checks(self, user_id: str):
+        """
+        Papers, patentes, ayudas y emails de un usuario, consultados a la vez
+        (variantes *_async de sources/). SQLite y emails van en hilos.
+        """
+        config = await asyncio.to_thread(self.get_user_config, user_id)
         since_date = datetime.now() - timedelta(hours=24)
 
+        checks = {}
         if config.get("papers_notifications"):
-            papers = check_papers(config.get("papers_keywords", []), config.get("papers_categories", []), since_date)
-            for n in papers:
-                self.save_notification(user_id, n)
-
+            checks["papers"] = check_papers_async(config.get("papers_keywords", []), config.get("papers_categories", []), since_date)
         if config.get("patent_notifications"):
-            patents = check_patents(config.get("patent_keywords", []), since_date)
-            for n in patents:
-                self.save_notification(user_id, n)
+            checks["patents"] = check_patents_async(config.get("patent_keywords", []), since_date)
         if config.get("ayudas_notifications"):
-                # CAMBIO: Importar el scraper real en lugar del simulado
-                from sources.ayudas_real import check_ayudas
-                ayudas = check_ayudas(config.get("region", "Euskadi"), since_date)
-                for n in ayudas:
-                    self.save_notification(user_id, n)
-
+            checks["ayudas"] = check_ayudas_async(config.get("region", "Euskadi"), since_date, user_id)
         if config.get("email_notifications"):
-            emails = check_emails(user_id, since_date)
-            for n in emails:
-                self.save_notification(user_id, n)
+            checks["emails"] = asyncio.to_thread(check_emails, user_id, since_date)
+        if not checks:
+            return
+        logger.debug("📬 Verificando notificaciones para %.8s...", user_id)
+
+        # Un fallo en una fuente no impide guardar lo de las demás
+        results = await asyncio.gather(*checks.values(), return_exceptions=True)
+        notifications = []
+        for name, result in zip(checks, results):
+            if isinstance(result, Exception):
+                logger.error("❌ Error comprobando %s para %.8s...: %s", name, user_id, result)
+                continue
+            notifications.extend(result)
+        await asyncio.to_thread(self._save_notifications, user_id, notifications)
+
+    async def run_cycle(self, user_ids: list):
+        """
+        Una vuelta del monitor: los usuarios se comprueban a la vez en el mismo
+        event loop (como mucho MONITOR_CONCURRENCY), así que las descargas de
+        fuentes compartidas se hacen una vez para todos.
+        """
+        semaphore = asyncio.Semaphore(MONITOR_CONCURRENCY)
+
+        async def check(user_id: str):
+            async with semaphore:
+                try:
+                    await self.run_checks(user_id)
+                except Exception as e:
+                    logger.exception("❌ Error comprobando notificaciones de %.8s...: %s", user_id, e)
+
+        await asyncio.gather(*(check(user_id) for user_id in user_ids))
+
+    def _save_notifications(self, user_id: str, notifications: list):
+        for n in notifications:
+            self.save_notification(user_id, n)
 
     # ----------------------------
     # Monitoreo en background
@@ -428,47 +473,47 @@ class MultiUserNotificationSystem:
     def start_background_monitoring(self) -> bool:
         """Iniciar monitoreo en background - versión mejorada"""
         if self.running:
-            print("⚠️ Sistema de monitoreo ya está ejecutándose")
+            logger.warning("⚠️ Sistema de monitoreo ya está ejecutándose")
             return False
             
         self.running = True
 
         def monitor():
-            print("🔄 Iniciando loop de monitoreo...")
+            logger.info("🔄 Iniciando loop de monitoreo...")
+            # Un event loop propio del hilo: los pools del cliente asíncrono se reutilizan entre vueltas
+            loop = asyncio.new_event_loop()
             while self.running:
+                cycle_start = time.perf_counter()
                 try:
                     # Obtener usuarios activos
                     active_users = self.get_active_users(hours=24)
-                    print(f"🔍 Monitoreando {len(active_users)} usuarios activos")
+                    MONITOR_USERS.set(len(active_users))
+                    # Cada monitor_interval: sólo se registra una de cada 10 vueltas
+                    logger.info("🔍 Monitoreando %d usuarios activos", len(active_users), extra={'sample': 10})
                     
-                    for user_id in active_users:
-                        # Solo procesar usuarios con notificaciones activadas
-                        config = self.get_user_config(user_id)
-                        if any([
-                            config.get('email_notifications'),
-                            config.get('patent_notifications'), 
-                            config.get('papers_notifications'),
-                            config.get('ayudas_notifications')
-                        ]):
-                            print(f"📬 Verificando notificaciones para {user_id[:8]}...")
-                            self.run_checks(user_id)
+                    # run_checks no hace nada para quien no tiene notificaciones activadas
+                    loop.run_until_complete(self.run_cycle(active_users))
                     
                 except Exception as e:
-                    print(f"❌ Error en monitor loop: {e}")
+                    logger.exception("❌ Error en monitor loop: %s", e)
+                MONITOR_CYCLE_SECONDS.observe(time.perf_counter() - cycle_start)
                 
                 # Esperar antes del siguiente ciclo
                 time.sleep(self.monitor_interval)
 
+            loop.run_until_complete(get_async_http_client().aclose())
+            loop.close()
+
         self.monitor_thread = threading.Thread(target=monitor, daemon=True)
         self.monitor_thread.start()
-        print("🚀 Sistema de monitoreo iniciado correctamente")
+        logger.info("🚀 Sistema de monitoreo iniciado correctamente")
         return True
 
     def stop_background_monitoring(self):
         self.running = False
         if self.monitor_thread:
             self.monitor_thread.join()
-        print("⏹️ Monitoreo de notificaciones detenido")
+        logger.info("⏹️ Monitoreo de notificaciones detenido")
 
     def _get_current_timestamp(self) -> str:
         """Obtener timestamp actual en formato ISO"""
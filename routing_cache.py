@@ -0,0 +1,253 @@
+# routing_cache.py - CACHE DE DECISIONES DE ENRUTADO DE GEMINI
+"""
+Cuando ninguna regla de command_router aplica se pregunta a Gemini qué
+herramienta usar: cientos de milisegundos (o segundos) y coste de API por
+cada comando, aunque se repita.
+
+RoutingCache guarda cada decisión de Gemini por prompt normalizado:
+  1. LRU en memoria
+  2. SQLite (cache/routing.db) con TTL, compartido entre reinicios
+  3. clasificador local: vecinos más cercanos por TF-IDF de n-gramas de
+     caracteres sobre las decisiones anteriores. Sólo responde si el vecino
+     más parecido es muy similar y los k vecinos coinciden; si no, se
+     pregunta a Gemini.
+"""
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from metrics import get_metrics, caller_name
+
+DEFAULT_DB_FILE = "cache/routing.db"
+
+SQLITE_SECONDS = get_metrics().histogram('sqlite_seconds', 'Duración de cada bloque de consultas SQLite', ['db', 'operation'])
+
+_PUNCTUATION_RE = re.compile(r'[^\w\s+\-*/.:|]')
+_SPACES_RE = re.compile(r'\s+')
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Clave de cache: minúsculas, sin tildes, sin signos sueltos ni espacios repetidos"""
+    text = unicodedata.normalize('NFKD', (prompt or '').lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    text = _PUNCTUATION_RE.sub(' ', text)
+    return _SPACES_RE.sub(' ', text).strip()
+
+
+def char_ngrams(text: str, sizes: Tuple[int, ...] = (3, 4, 5)) -> Counter:
+    """n-gramas de caracteres por palabra (con bordes), robustos a erratas y plurales"""
+    grams = Counter()
+    for word in text.split():
+        padded = f" {word} "
+        for n in sizes:
+            for i in range(max(len(padded) - n + 1, 1)):
+                grams[padded[i:i + n]] += 1
+    return grams
+
+
+class Decision(NamedTuple):
+    tool: str
+    source: str        # 'memoria', 'sqlite' o 'knn'
+    confidence: float
+
+
+class NearestNeighbourRouter:
+    """
+    kNN con similitud coseno sobre vectores TF-IDF. Índice invertido
+    n-grama → [(ejemplo, peso)] para no comparar con todos los ejemplos.
+    """
+
+    def __init__(self, k: int = 5, min_similarity: float = 0.75, min_agreement: float = 0.8):
+        self.k = k
+        self.min_similarity = min_similarity
+        self.min_agreement = min_agreement
+        self.labels: List[str] = []
+        self.idf: Dict[str, float] = {}
+        self.index: Dict[str, List[Tuple[int, float]]] = {}
+
+    def fit(self, examples: List[Tuple[str, str]]):
+        """examples: [(prompt normalizado, herramienta)]"""
+        grams = [char_ngrams(text) for text, _ in examples]
+        self.labels = [tool for _, tool in examples]
+
+        document_frequency = Counter()
+        for counts in grams:
+            document_frequency.update(counts.keys())
+        total = len(examples)
+        self.idf = {gram: math.log((1 + total) / (1 + df)) + 1 for gram, df in document_frequency.items()}
+
+        self.index = {}
+        for doc_id, counts in enumerate(grams):
+            for gram, weight in self._vector(counts).items():
+                self.index.setdefault(gram, []).append((doc_id, weight))
+
+    def _vector(self, counts: Counter) -> Dict[str, float]:
+        vector = {gram: (1 + math.log(tf)) * self.idf[gram] for gram, tf in counts.items() if gram in self.idf}
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        return {gram: w / norm for gram, w in vector.items()} if norm else {}
+
+    def predict(self, text: str) -> Optional[Tuple[str, float]]:
+        """(herramienta, similitud) si la predicción es fiable; None si hay dudas"""
+        if not self.labels:
+            return None
+
+        scores: Dict[int, float] = {}
+        for gram, weight in self._vector(char_ngrams(text)).items():
+            for doc_id, doc_weight in self.index.get(gram, ()):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight * doc_weight
+        if not scores:
+            return None
+
+        neighbours = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:self.k]
+        best_similarity = neighbours[0][1]
+        if best_similarity < self.min_similarity:
+            return None
+
+        # Votos ponderados por similitud, sólo de vecinos razonablemente parecidos
+        votes = Counter()
+        for doc_id, similarity in neighbours:
+            if similarity >= self.min_similarity / 2:
+                votes[self.labels[doc_id]] += similarity
+        tool, weight = votes.most_common(1)[0]
+        if weight / sum(votes.values()) < self.min_agreement:
+            return None
+        return tool, best_similarity
+
+
+class RoutingCache:
+    """Decisiones de enrutado de Gemini: LRU + SQLite con TTL + kNN local"""
+
+    def __init__(self,
+                 db_file: str = DEFAULT_DB_FILE,
+                 ttl_days: int = 30,
+                 memory_size: int = 512,
+                 max_examples: int = 2000):
+        self.db_file = db_file
+        self.ttl = ttl_days * 86400
+        self.memory_size = memory_size
+        self.max_examples = max_examples
+        self._memory: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._knn = NearestNeighbourRouter()
+        self._knn_dirty = True
+        self.stats = Counter()
+        self.init_database()
+
+    def init_database(self):
+        os.makedirs(os.path.dirname(self.db_file) or '.', exist_ok=True)
+        with self.get_db_connection() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS routing_decisions (
+                    prompt_key TEXT PRIMARY KEY,
+                    tool TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+            conn.execute('DELETE FROM routing_decisions WHERE created_at < ?', (time.time() - self.ttl,))
+            conn.commit()
+
+    @contextmanager
+    def get_db_connection(self):
+        operation = caller_name()
+        start = time.perf_counter()
+        conn = sqlite3.connect(self.db_file, timeout=30.0)
+        try:
+            yield conn
+        finally:
+            conn.close()
+            SQLITE_SECONDS.observe(time.perf_counter() - start, db='routing', operation=operation)
+
+    def _remember(self, key: str, tool: str):
+        with self._lock:
+            self._memory[key] = tool
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def lookup(self, prompt: str) -> Optional[Decision]:
+        """Decisión sin llamar a Gemini, o None si hay que preguntarle"""
+        key = normalize_prompt(prompt)
+        if not key:
+            return None
+
+        with self._lock:
+            tool = self._memory.get(key)
+            if tool:
+                self._memory.move_to_end(key)
+        if tool:
+            self.stats['memoria'] += 1
+            return Decision(tool, 'memoria', 1.0)
+
+        with self.get_db_connection() as conn:
+            row = conn.execute(
+                'SELECT tool FROM routing_decisions WHERE prompt_key = ? AND created_at >= ?',
+                (key, time.time() - self.ttl)
+            ).fetchone()
+            if row:
+                conn.execute('UPDATE routing_decisions SET hits = hits + 1 WHERE prompt_key = ?', (key,))
+                conn.commit()
+        if row:
+            self._remember(key, row[0])
+            self.stats['sqlite'] += 1
+            return Decision(row[0], 'sqlite', 1.0)
+
+        prediction = self._predict(key)
+        if prediction:
+            tool, similarity = prediction
+            self._remember(key, tool)
+            self.stats['knn'] += 1
+            return Decision(tool, 'knn', similarity)
+
+        self.stats['miss'] += 1
+        return None
+
+    def _predict(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            if self._knn_dirty:
+                with self.get_db_connection() as conn:
+                    examples = conn.execute(
+                        'SELECT prompt_key, tool FROM routing_decisions WHERE created_at >= ? '
+                        'ORDER BY created_at DESC LIMIT ?',
+                        (time.time() - self.ttl, self.max_examples)
+                    ).fetchall()
+                self._knn.fit(examples)
+                self._knn_dirty = False
+            return self._knn.predict(key)
+
+    def store(self, prompt: str, tool: str):
+        """Guarda una decisión de Gemini (sólo las válidas: los fallos no se cachean)"""
+        key = normalize_prompt(prompt)
+        if not key:
+            return
+        self._remember(key, tool)
+        with self.get_db_connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO routing_decisions (prompt_key, tool, created_at, hits) VALUES (?, ?, ?, 0)',
+                (key, tool, time.time())
+            )
+            conn.commit()
+        with self._lock:
+            self._knn_dirty = True
+
+
+# ========== INSTANCIA DE PROCESO ==========
+
+_cache: Optional[RoutingCache] = None
+_cache_lock = threading.Lock()
+
+def get_routing_cache() -> RoutingCache:
+    """Devuelve la cache de decisiones de enrutado compartida"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = RoutingCache()
+        return _cache
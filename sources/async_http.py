@@ -0,0 +1,186 @@
+# sources/async_http.py - CLIENTE HTTP ASÍNCRONO PARA LOS SCRAPERS
+"""
+Variante asíncrona del cliente compartido (sources/http_client.py).
+
+Usa httpx.AsyncClient con pools keep-alive, reintentos con backoff ante
+429/5xx y el MISMO límite de frecuencia por host que el cliente síncrono:
+los huecos se reservan en HttpClient, así que llamadas síncronas y
+asíncronas al mismo host no se pisan.
+
+Las respuestas se devuelven como ``requests.Response`` para que los parsers
+y los validadores HTTP (ETag / Last-Modified) sirvan sin cambios.
+
+Si httpx no está instalado, o el cliente síncrono tiene un adaptador propio
+montado (fixtures de record/replay, tests), las peticiones se ejecutan con el
+cliente síncrono en un hilo (asyncio.to_thread).
+"""
+import asyncio
+import ssl
+import threading
+import logging
+import weakref
+from typing import Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from sources.http_client import HttpClient, ACCEPT_ENCODING, get_http_client
+
+logger = logging.getLogger(__name__)
+
+try:
+    import httpx
+    _HTTPX_AVAILABLE = True
+except ImportError:
+    _HTTPX_AVAILABLE = False
+
+RETRY_STATUS = (429, 500, 502, 503, 504)
+MAX_RETRY_AFTER = 60.0
+
+
+def _to_requests_response(response) -> requests.Response:
+    """Copia una respuesta de httpx en un requests.Response equivalente"""
+    converted = requests.Response()
+    converted.status_code = response.status_code
+    converted.headers = CaseInsensitiveDict(response.headers.items())
+    converted._content = response.content
+    converted.url = str(response.url)
+    converted.encoding = response.encoding
+    converted.reason = response.reason_phrase
+    return converted
+
+
+def _retry_after(response) -> Optional[float]:
+    value = response.headers.get('Retry-After')
+    try:
+        return min(float(value), MAX_RETRY_AFTER) if value else None
+    except ValueError:
+        return None
+
+
+class AsyncHttpClient:
+    """
+    Cliente asíncrono de proceso. httpx ata cada AsyncClient al event loop en
+    el que se usa, así que se mantiene uno por loop (y por configuración SSL).
+    """
+
+    def __init__(self,
+                 sync_client: HttpClient,
+                 max_connections: int = 20,
+                 max_keepalive_connections: int = 10,
+                 retries: int = 2,
+                 backoff_factor: float = 1.0):
+        self.sync_client = sync_client
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._clients = weakref.WeakKeyDictionary()
+        self._clients_lock = threading.Lock()
+
+    @property
+    def uses_thread_fallback(self) -> bool:
+        return not _HTTPX_AVAILABLE or self.sync_client.transport_overridden
+
+    def _client_for(self, verify) -> 'httpx.AsyncClient':
+        loop = asyncio.get_running_loop()
+        key = verify if isinstance(verify, (bool, str)) else id(verify)
+        with self._clients_lock:
+            clients = self._clients.setdefault(loop, {})
+            client = clients.get(key)
+            if client is None:
+                if isinstance(verify, str):
+                    # Ruta a un bundle de CAs (p.ej. certifi.where())
+                    verify = ssl.create_default_context(cafile=verify)
+                client = httpx.AsyncClient(
+                    headers={'Accept-Encoding': ACCEPT_ENCODING},
+                    limits=httpx.Limits(
+                        max_connections=self.max_connections,
+                        max_keepalive_connections=self.max_keepalive_connections,
+                    ),
+                    follow_redirects=True,
+                    verify=verify,
+                )
+                clients[key] = client
+            return client
+
+    async def request(self,
+                      method: str,
+                      url: str,
+                      params: Optional[Dict] = None,
+                      headers: Optional[Dict[str, str]] = None,
+                      timeout: Optional[float] = None,
+                      verify=True) -> requests.Response:
+        if self.uses_thread_fallback:
+            return await asyncio.to_thread(
+                self.sync_client.request, method, url,
+                params=params, headers=headers, timeout=timeout, verify=verify
+            )
+
+        client = self._client_for(verify)
+        attempt = 0
+        while True:
+            delay = self.sync_client.reserve_slot(url)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            try:
+                response = await client.request(method, url, params=params, headers=headers, timeout=timeout)
+            except httpx.TransportError as e:
+                if attempt >= self.retries:
+                    raise requests.ConnectionError(f"{type(e).__name__}: {e}") from e
+                wait = self.backoff_factor * (2 ** attempt)
+                logger.warning(f"🔁 {url}: {type(e).__name__}, reintento en {wait:.0f}s")
+            else:
+                if response.status_code not in RETRY_STATUS or attempt >= self.retries:
+                    return _to_requests_response(response)
+                wait = _retry_after(response) or self.backoff_factor * (2 ** attempt)
+                logger.warning(f"🔁 {url}: HTTP {response.status_code}, reintento en {wait:.0f}s")
+
+            attempt += 1
+            await asyncio.sleep(wait)
+
+    async def get(self, url: str, **kwargs) -> requests.Response:
+        return await self.request('GET', url, **kwargs)
+
+    def session(self, headers: Optional[Dict[str, str]] = None, verify=True) -> 'AsyncClientSession':
+        """Vista con cabeceras propias de un scraper sobre los pools compartidos"""
+        return AsyncClientSession(self, headers, verify)
+
+    async def aclose(self):
+        """Cierra los pools del event loop actual"""
+        loop = asyncio.get_running_loop()
+        with self._clients_lock:
+            clients = self._clients.pop(loop, {})
+        for client in clients.values():
+            await client.aclose()
+
+
+class AsyncClientSession:
+    """Equivalente asíncrono de ClientSession (``await session.get(...)``)"""
+
+    def __init__(self, client: AsyncHttpClient, headers: Optional[Dict[str, str]] = None, verify=True):
+        self.client = client
+        self.headers = dict(headers or {})
+        self.verify = verify
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> requests.Response:
+        merged_headers = {**self.headers, **(headers or {})}
+        kwargs.setdefault('verify', self.verify)
+        return await self.client.get(url, headers=merged_headers, **kwargs)
+
+
+# ========== INSTANCIA DE PROCESO ==========
+
+_async_client: Optional[AsyncHttpClient] = None
+_async_client_lock = threading.Lock()
+
+def get_async_http_client() -> AsyncHttpClient:
+    """Devuelve el cliente HTTP asíncrono compartido (se crea en el primer uso)"""
+    global _async_client
+    with _async_client_lock:
+        if _async_client is None:
+            if not _HTTPX_AVAILABLE:
+                logger.warning("⚠️ httpx no instalado: las peticiones asíncronas usarán hilos")
+            _async_client = AsyncHttpClient(get_http_client())
+        return _async_client
@@ -0,0 +1,136 @@
+# sources/ayudas_classifier.py - CLASIFICACIÓN POR LOTES DE AYUDAS
+"""
+Extracción de tipo, categorías, importe y fecha límite para un lote completo
+de ayudas.
+
+Las tablas de palabras clave se aplanan y las expresiones regulares se
+compilan una sola vez al importar el módulo; cada texto se pasa a minúsculas
+una vez y se reutiliza para todas las columnas. Las regex de importe y fecha
+sólo se ejecutan si el texto tiene cifras.
+
+Nota: con las ~40 palabras clave actuales, `kw in texto` (búsqueda en C) es
+más rápido en CPython que una alternancia o un trie en `re`; si las tablas
+crecen a cientos de palabras, conviene cambiar find() por un autómata.
+"""
+import re
+from typing import Dict, Iterable, List, Optional
+
+# El orden importa: el tipo es el primero de la tabla que aparece en el título
+TYPE_KEYWORDS = {
+    'I+D+i': ['i+d', 'investigación', 'desarrollo', 'innovación'],
+    'Empleo': ['empleo', 'contratación', 'laboral', 'trabajador'],
+    'Digitalización': ['digitalización', 'digital', 'tic', 'tecnología'],
+    'Sostenibilidad': ['sostenible', 'verde', 'ambiental', 'energía'],
+    'Formación': ['formación', 'educación', 'beca', 'estudio'],
+    'Emprendimiento': ['emprendimiento', 'startup', 'pyme', 'autónomo'],
+    'Industria': ['industria', 'industrial', 'fabricación'],
+    'Comercio': ['comercio', 'comercial', 'venta'],
+    'Turismo': ['turismo', 'turístico', 'hostelería']
+}
+
+CATEGORY_KEYWORDS = {
+    'Tecnología': ['tecnología', 'digital', 'software', 'tic'],
+    'Innovación': ['innovación', 'i+d', 'investigación'],
+    'Sostenibilidad': ['sostenible', 'verde', 'ecológico', 'ambiental'],
+    'Empleo': ['empleo', 'trabajo', 'contratación'],
+    'Industria': ['industria', 'industrial', 'fabricación'],
+    'Empresa': ['empresa', 'pyme', 'autónomo', 'emprendimiento']
+}
+
+# Un único patrón de importe: "hasta 50.000 €" también lo cubre
+AMOUNT_RE = re.compile(r'(\d{1,3}(?:\.\d{3})*(?:,\d+)?)\s*(?:€|euros?)', re.IGNORECASE)
+
+# Patrones de fecha límite, por prioridad (gana el primero que encuentre algo)
+DEADLINE_PATTERNS = [
+    re.compile(r'hasta\s+(?:el\s+)?(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})', re.IGNORECASE),
+    re.compile(r'plazo[:\s]+.*?(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})', re.IGNORECASE),
+    re.compile(r'(\d{1,2}\s+de\s+\w+\s+de\s+\d{4})', re.IGNORECASE),
+    re.compile(r'antes\s+del\s+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})', re.IGNORECASE),
+]
+
+# Sin cifras no puede haber ni importe ni fecha
+_DIGIT_RE = re.compile(r'\d')
+
+
+class KeywordMatcher:
+    """
+    Tabla etiqueta → palabras clave aplanada a una tupla de pares
+    (palabra, etiqueta) en el orden de la tabla.
+    """
+
+    def __init__(self, table: Dict[str, List[str]]):
+        self.labels = list(table)
+        self.pairs = tuple((kw, label) for label, keywords in table.items() for kw in keywords)
+
+    def first(self, text: str, default: str) -> str:
+        """Primera etiqueta de la tabla con alguna palabra en el texto (ya en minúsculas)"""
+        for kw, label in self.pairs:
+            if kw in text:
+                return label
+        return default
+
+    def find(self, text: str, default: List[str]) -> List[str]:
+        """Todas las etiquetas con alguna palabra en el texto, en el orden de la tabla"""
+        found = []
+        for kw, label in self.pairs:
+            if kw in text and (not found or found[-1] != label):
+                found.append(label)
+        return found or list(default)
+
+
+TYPE_MATCHER = KeywordMatcher(TYPE_KEYWORDS)
+CATEGORY_MATCHER = KeywordMatcher(CATEGORY_KEYWORDS)
+
+
+def classify_type(title: str) -> str:
+    return TYPE_MATCHER.first((title or '').lower(), 'General')
+
+
+def extract_categories(text: str) -> List[str]:
+    if not text:
+        return ['General']
+    return CATEGORY_MATCHER.find(text.lower(), ['General'])
+
+
+def extract_amount(text: str) -> str:
+    if not text or not _DIGIT_RE.search(text):
+        return "Consultar bases"
+    match = AMOUNT_RE.search(text)
+    return f"{match.group(1)} €" if match else "Consultar bases"
+
+
+def extract_deadline(text: str) -> Optional[str]:
+    if not text or not _DIGIT_RE.search(text):
+        return None
+    for pattern in DEADLINE_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return match.group(1)
+    return None
+
+
+def classify_batch(titles: Iterable[str], descriptions: Iterable[str]) -> Dict[str, List]:
+    """
+    Clasifica un lote completo de ayudas.
+
+    El tipo se obtiene del título; categorías del título + descripción;
+    importe y fecha límite de la descripción.
+
+    Returns:
+        Columnas alineadas con la entrada: tipo, categorias, importe, fecha_limite.
+    """
+    columns = {'tipo': [], 'categorias': [], 'importe': [], 'fecha_limite': []}
+    type_first = TYPE_MATCHER.first
+    category_find = CATEGORY_MATCHER.find
+
+    for title, description in zip(titles, descriptions):
+        title_lower = (title or '').lower()
+        description = description or ''
+        text_lower = f"{title_lower} {description.lower()}" if description else title_lower
+
+        columns['tipo'].append(type_first(title_lower, 'General'))
+        columns['categorias'].append(category_find(text_lower, ['General']) if text_lower else ['General'])
+        columns['importe'].append(extract_amount(description))
+        columns['fecha_limite'].append(extract_deadline(description))
+
+    return columns
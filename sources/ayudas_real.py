@@ -1,23 +1,29 @@
 # sources/ayudas_real.py - VERSIÓN CORREGIDA CON URLs FUNCIONALES
-import requests
+import asyncio
 from datetime import datetime, timedelta
 import feedparser
-import re
-import json
 import time
-from typing import List, Dict, Optional
+import threading
+from typing import Callable, List, Dict, Optional
 import hashlib
 import logging
-from bs4 import BeautifulSoup
 import ssl
 import certifi
 import urllib3
 
+from sources.http_client import get_http_client
+from sources.async_http import get_async_http_client
+from sources.http_validators import fetch_conditional, fetch_conditional_async, get_validator_store
+from sources.ayudas_store import get_seen_store, get_ayudas_catalog
+from sources import ayudas_classifier
+from sources.source_health import get_source_health
+from sources.html_parsing import make_soup, LINKS, RESULT_BLOCKS, AYUDA_LINK_RE, BIZKAIA_LINK_RE, AYUDA_TITLE_RE
+from sources.instrumentation import traced
+
 # Deshabilitar warnings de SSL temporalmente
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 # Configurar logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class AyudasScraper:
@@ -25,23 +31,54 @@ class AyudasScraper:
     Scraper CORREGIDO con URLs funcionales y métodos alternativos
     """
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1'
-        })
-        
-        # Configurar SSL con certificados actualizados
-        self.session.verify = certifi.where()
+    # Fuentes a consultar según región (muchas se solapan: spri_web está en casi todas)
+    SOURCES_BY_REGION = {
+        'bizkaia': ['bizkaia_api', 'spri_web'],
+        'gipuzkoa': ['gipuzkoa_web', 'spri_web'],
+        'euskadi': ['euskadi_web', 'spri_web', 'bizkaia_api', 'gipuzkoa_web'],
+        'araba': ['euskadi_web', 'spri_web'],
+        'nacional': ['mincotur', 'enisa'],
+        'europa': ['europa_funding'],
+        'todas': ['spri_web', 'euskadi_web', 'gipuzkoa_web', 'bizkaia_api']
+    }
+    
+    # Segundos durante los que se reutiliza lo descargado de una fuente
+    DEFAULT_REFRESH_INTERVAL = 15 * 60
+    
+    # Máximo de ayudas nuevas por fuente y fuente alternativa si la principal falla
+    SOURCE_LIMITS = {'spri_web': 10, 'euskadi_web': 15, 'gipuzkoa_web': 10, 'bizkaia_api': 10, 'bizkaia_web': 5}
+    SOURCE_FALLBACKS = {'bizkaia_api': 'bizkaia_web'}
+    
+    def __init__(self, refresh_interval: int = DEFAULT_REFRESH_INTERVAL,
+                 seen_store=None, catalog=None, validators=None, health=None):
+        """
+        Los almacenes son por defecto los compartidos del proceso; las pruebas
+        pasan los suyos para no tocar los de cache/.
+        """
+        # Sesión sobre el cliente HTTP compartido (pools keep-alive, reintentos,
+        # límite por host). Accept-Encoding lo negocia el cliente.
+        self.session = get_http_client().session(
+            headers={
+                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
+                'DNT': '1',
+                'Upgrade-Insecure-Requests': '1'
+            },
+            # Configurar SSL con certificados actualizados
+            verify=certifi.where()
+        )
+        # Misma vista sobre el cliente asíncrono (variantes *_async)
+        self.async_session = get_async_http_client().session(
+            headers=self.session.headers,
+            verify=self.session.verify
+        )
         
         self.timeout = 30
         
+        # Validadores HTTP (ETag / Last-Modified / hash) compartidos por el proceso
+        self.validators = validators if validators is not None else get_validator_store()
+        
         # 🔥 URLs ACTUALIZADAS Y FUNCIONALES
         self.apis = {
             # ========== EUSKADI - FUENTES ALTERNATIVAS ==========
@@ -138,9 +175,30 @@ class AyudasScraper:
             }
         }
         
-        # Cache
-        self.cache_file = "cache/ayudas_cache.json"
-        self.seen_aids = self.load_cache()
+        # IDs ya notificados (SQLite compartido entre instancias y procesos)
+        self.seen_aids = seen_store if seen_store is not None else get_seen_store()
+        # Catálogo persistente con todo lo extraído (para búsquedas y filtros)
+        self.catalog = catalog if catalog is not None else get_ayudas_catalog()
+        
+        # Resultados por fuente compartidos entre regiones y usuarios: una sola
+        # descarga por fuente y por intervalo aunque la pidan muchos usuarios
+        self.refresh_interval = refresh_interval
+        # fuente -> (URL, nombre del método de parsing)
+        self.source_pages = {
+            'spri_web': (self.apis['spri_web']['endpoints']['main'], '_parse_spri_web'),
+            'euskadi_web': ("https://www.euskadi.eus/buscador/?q=ayudas+subvenciones+2024+2025&lang=es",
+                            '_parse_euskadi_web'),
+            'gipuzkoa_web': (self.apis['gipuzkoa_web']['endpoints']['main'], '_parse_gipuzkoa_web'),
+            'bizkaia_api': ("https://api.bizkaia.eus/apps/subvenciones/convocatorias", '_parse_bizkaia_api'),
+            'bizkaia_web': ("https://web.bizkaia.eus/es/subvenciones", '_parse_bizkaia_web'),
+        }
+        self._source_results: Dict[str, tuple] = {}
+        # Latencia/errores por fuente: una fuente caída deja de consultarse
+        # (circuito abierto) y se vuelve a probar con backoff exponencial
+        self.health = health if health is not None else get_source_health()
+        self._source_locks = {source: threading.Lock() for source in self.source_pages}
+        # Descargas asíncronas en curso: (event loop, fuente) -> tarea
+        self._source_tasks: Dict[tuple, asyncio.Task] = {}
         
         # Estadísticas
         self.stats = {
@@ -150,34 +208,160 @@ class AyudasScraper:
             'ayudas_encontradas': 0
         }
     
-    def load_cache(self) -> set:
-        """Carga cache de ayudas procesadas"""
-        try:
-            import os
-            os.makedirs("cache", exist_ok=True)
-            if os.path.exists(self.cache_file):
-                with open(self.cache_file, 'r') as f:
-                    return set(json.load(f))
-            return set()
-        except Exception as e:
-            logger.error(f"Error cargando cache: {e}")
-            return set()
+    @traced()
+    def get_candidates(self, source: str, force_refresh: bool = False) -> Optional[List[Dict]]:
+        """
+        Items de una fuente, reutilizando la última descarga si tiene menos de
+        refresh_interval segundos. Si varios hilos piden la misma fuente a la
+        vez, sólo uno descarga y el resto espera su resultado. Con
+        force_refresh=True se consulta la fuente aunque haya resultados recientes.
+        
+        Raises:
+            CircuitOpenError: la fuente ha fallado repetidamente y está en backoff.
+        """
+        with self._source_locks[source]:
+            cached = self._source_results.get(source)
+            if cached and not force_refresh and time.time() - cached[0] < self.refresh_interval:
+                logger.info(f"♻️ {source}: reutilizando resultados de hace {int(time.time() - cached[0])}s")
+                return cached[1]
+            
+            url, parse_name = self.source_pages[source]
+            candidates = self.health.call(source, lambda: self._fetch_items(url, getattr(self, parse_name)))
+            if candidates is not None:
+                # Fuera de health.call: si falla SQLite el error sube, pero no cuenta contra la fuente
+                self.catalog.upsert(candidates)
+                self._source_results[source] = (time.time(), candidates)
+            return candidates
     
-    def save_cache(self):
-        """Guarda cache"""
-        try:
-            with open(self.cache_file, 'w') as f:
-                json.dump(list(self.seen_aids), f)
-        except Exception as e:
-            logger.error(f"Error guardando cache: {e}")
+    @traced()
+    async def get_candidates_async(self, source: str, force_refresh: bool = False) -> Optional[List[Dict]]:
+        """
+        Variante asíncrona de get_candidates: las corrutinas que piden la misma
+        fuente a la vez esperan una única descarga. Cancelar una de ellas no
+        cancela la descarga de las demás. force_refresh como en get_candidates
+        (si ya hay una descarga en curso, se espera esa).
+        
+        Raises:
+            CircuitOpenError: la fuente ha fallado repetidamente y está en backoff.
+        """
+        cached = self._source_results.get(source)
+        if cached and not force_refresh and time.time() - cached[0] < self.refresh_interval:
+            logger.info(f"♻️ {source}: reutilizando resultados de hace {int(time.time() - cached[0])}s")
+            return cached[1]
+        
+        key = (asyncio.get_running_loop(), source)
+        task = self._source_tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._download_source_async(source))
+            self._source_tasks[key] = task
+            task.add_done_callback(lambda _, key=key: self._source_tasks.pop(key, None))
+        return await asyncio.shield(task)
+    
+    async def _download_source_async(self, source: str) -> Optional[List[Dict]]:
+        url, parse_name = self.source_pages[source]
+        candidates = await self.health.call_async(
+            source, lambda: self._fetch_items_async(url, getattr(self, parse_name))
+        )
+        if candidates is not None:
+            await asyncio.to_thread(self.catalog.upsert, candidates)
+            self._source_results[source] = (time.time(), candidates)
+        return candidates
+    
+    def clear_source_results(self):
+        """Olvida los resultados compartidos (fuerza la descarga en la siguiente consulta)"""
+        self._source_results.clear()
     
     def generate_id(self, title: str, url: str) -> str:
         """Genera ID único"""
         return hashlib.md5(f"{title}_{url}".encode()).hexdigest()
     
+    def _select_new(self, candidates: List[Dict], limit: int, mark_seen: bool = True,
+                    consumer: Optional[str] = None) -> List[Dict]:
+        """
+        Filtra los items ya vistos por `consumer` y los marca como vistos.
+        Con mark_seen=False sólo se actualiza el catálogo (ya hecho en get_candidates).
+        """
+        if not mark_seen:
+            return candidates[:limit]
+        
+        seen = self.seen_aids.for_consumer(consumer) if consumer else self.seen_aids
+        unseen = seen.filter_unseen(ayuda['id'] for ayuda in candidates)
+        ayudas = []
+        selected = set()
+        for ayuda in candidates:
+            if ayuda['id'] in selected or ayuda['id'] not in unseen:
+                continue
+            ayudas.append(ayuda)
+            selected.add(ayuda['id'])
+            if len(ayudas) >= limit:
+                break
+        seen.update(selected)
+        return ayudas
+    
+    def _fetch_items(self, url: str, parse) -> Optional[List[Dict]]:
+        """
+        Descarga condicional de una página: si no ha cambiado (304 o mismo hash
+        del cuerpo) se reutilizan los items extraídos la última vez sin parsear.
+        Devuelve None si la respuesta no es válida.
+        """
+        items, response = fetch_conditional(
+            self.session,
+            self.validators,
+            url,
+            parse,
+            timeout=self.timeout,
+            verify=False
+        )
+        return items
+    
+    async def _fetch_items_async(self, url: str, parse) -> Optional[List[Dict]]:
+        """Variante asíncrona de _fetch_items"""
+        items, response = await fetch_conditional_async(
+            self.async_session,
+            self.validators,
+            url,
+            parse,
+            timeout=self.timeout,
+            verify=False
+        )
+        return items
+    
+    @traced()
+    async def scrape_source_async(self, source: str, mark_seen: bool = True,
+                                  consumer: Optional[str] = None) -> List[Dict]:
+        """
+        Variante asíncrona de los scrape_* (mismo límite por fuente y misma
+        fuente alternativa si la principal falla).
+        """
+        ayudas = []
+        self.stats['total_intentos'] += 1
+        
+        try:
+            logger.info(f"🔍 Scraping {source} (async)...")
+            candidates = await self.get_candidates_async(source)
+            
+            if candidates is not None:
+                # IDs vistos en SQLite: fuera del event loop
+                ayudas = await asyncio.to_thread(self._select_new, candidates, self.SOURCE_LIMITS[source],
+                                                 mark_seen, consumer)
+                
+                self.stats['exitos'] += 1
+                self.stats['ayudas_encontradas'] += len(ayudas)
+                logger.info(f"✅ {source}: {len(ayudas)} ayudas encontradas")
+        
+        except Exception as e:
+            fallback = self.SOURCE_FALLBACKS.get(source)
+            if fallback:
+                logger.warning(f"⚠️ {source} no disponible, intentando {fallback}: {e}")
+                return await self.scrape_source_async(fallback, mark_seen=mark_seen, consumer=consumer)
+            logger.error(f"❌ Error en {source}: {e}")
+            self.stats['errores'] += 1
+        
+        return ayudas
+    
     # ========== MÉTODO PRINCIPAL: SCRAPING WEB ==========
     
-    def scrape_spri_web(self) -> List[Dict]:
+    def scrape_spri_web(self, mark_seen: bool = True, consumer: Optional[str] = None) -> List[Dict]:
         """Scraping de SPRI - FUNCIONA"""
         ayudas = []
         self.stats['total_intentos'] += 1
@@ -185,60 +369,11 @@ class AyudasScraper:
         try:
             logger.info("🔍 Scraping SPRI Web...")
             
-            url = self.apis['spri_web']['endpoints']['main']
+            # Los reintentos con backoff los aplica el cliente HTTP compartido
+            candidates = self.get_candidates('spri_web')
             
-            # Hacer request con reintentos
-            for attempt in range(3):
-                try:
-                    response = self.session.get(url, timeout=self.timeout, verify=False)
-                    if response.status_code == 200:
-                        break
-                except:
-                    if attempt == 2:
-                        raise
-                    time.sleep(2)
-            
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Buscar elementos de ayudas
-                ayuda_elements = soup.find_all('article', class_='ayuda') or \
-                                soup.find_all('div', class_='subvencion') or \
-                                soup.find_all('div', class_='ayuda-item')
-                
-                # Si no encuentra con clases específicas, buscar por texto
-                if not ayuda_elements:
-                    for link in soup.find_all('a', href=True):
-                        texto = link.get_text().lower()
-                        if any(palabra in texto for palabra in ['ayuda', 'subvención', 'programa', 'convocatoria']):
-                            href = link['href']
-                            if not href.startswith('http'):
-                                href = 'https://www.spri.eus' + href
-                            
-                            titulo = link.get_text().strip()
-                            aid_id = self.generate_id(titulo, href)
-                            
-                            if aid_id not in self.seen_aids and titulo:
-                                ayuda = {
-                                    'id': aid_id,
-                                    'titulo': titulo[:200],
-                                    'descripcion': 'Consultar enlace para más información',
-                                    'url': href,
-                                    'fecha_publicacion': datetime.now().isoformat(),
-                                    'entidad': 'SPRI',
-                                    'tipo': 'Desarrollo Empresarial',
-                                    'ambito': 'Euskadi',
-                                    'categorias': ['Empresa', 'Innovación'],
-                                    'importe': 'Consultar bases',
-                                    'fuente': 'SPRI Web Scraping',
-                                    'nuevo': True
-                                }
-                                
-                                ayudas.append(ayuda)
-                                self.seen_aids.add(aid_id)
-                                
-                                if len(ayudas) >= 10:
-                                    break
+            if candidates is not None:
+                ayudas = self._select_new(candidates, limit=10, mark_seen=mark_seen, consumer=consumer)
                 
                 self.stats['exitos'] += 1
                 self.stats['ayudas_encontradas'] += len(ayudas)
@@ -250,7 +385,39 @@ class AyudasScraper:
         
         return ayudas
     
-    def scrape_euskadi_web(self) -> List[Dict]:
+    def _parse_spri_web(self, response) -> List[Dict]:
+        """Extrae las ayudas de la página de SPRI"""
+        candidates = []
+        # Sólo se construyen los enlaces: las ayudas de SPRI se detectan por el texto
+        soup = make_soup(response.content, parse_only=LINKS)
+        
+        for link in soup.find_all('a', href=True):
+            titulo = link.get_text().strip()
+            if not titulo or not AYUDA_LINK_RE.search(titulo.lower()):
+                continue
+            
+            href = link['href']
+            if not href.startswith('http'):
+                href = 'https://www.spri.eus' + href
+            
+            candidates.append({
+                'id': self.generate_id(titulo, href),
+                'titulo': titulo[:200],
+                'descripcion': 'Consultar enlace para más información',
+                'url': href,
+                'fecha_publicacion': datetime.now().isoformat(),
+                'entidad': 'SPRI',
+                'tipo': 'Desarrollo Empresarial',
+                'ambito': 'Euskadi',
+                'categorias': ['Empresa', 'Innovación'],
+                'importe': 'Consultar bases',
+                'fuente': 'SPRI Web Scraping',
+                'nuevo': True
+            })
+        
+        return candidates
+    
+    def scrape_euskadi_web(self, mark_seen: bool = True, consumer: Optional[str] = None) -> List[Dict]:
         """Scraping web de Euskadi.eus"""
         ayudas = []
         self.stats['total_intentos'] += 1
@@ -258,67 +425,11 @@ class AyudasScraper:
         try:
             logger.info("🔍 Scraping Euskadi Web...")
             
-            # Intentar búsqueda directa
-            search_url = "https://www.euskadi.eus/buscador/?q=ayudas+subvenciones+2024+2025&lang=es"
-            
-            response = self.session.get(search_url, timeout=self.timeout, verify=False)
+            # Búsqueda directa en el buscador de Euskadi.eus
+            candidates = self.get_candidates('euskadi_web')
             
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Buscar resultados de búsqueda
-                results = soup.find_all('div', class_='result') or \
-                         soup.find_all('article') or \
-                         soup.find_all('div', class_='item')
-                
-                for result in results[:15]:
-                    try:
-                        # Extraer título y enlace
-                        title_elem = result.find('h2') or result.find('h3') or result.find('a')
-                        if not title_elem:
-                            continue
-                        
-                        titulo = title_elem.get_text().strip()
-                        
-                        # Filtrar solo ayudas
-                        if not any(word in titulo.lower() for word in ['ayuda', 'subvención', 'beca', 'programa']):
-                            continue
-                        
-                        link_elem = result.find('a', href=True)
-                        if link_elem:
-                            url = link_elem['href']
-                            if not url.startswith('http'):
-                                url = 'https://www.euskadi.eus' + url
-                        else:
-                            url = search_url
-                        
-                        aid_id = self.generate_id(titulo, url)
-                        
-                        if aid_id not in self.seen_aids:
-                            # Extraer descripción
-                            desc_elem = result.find('p') or result.find('div', class_='description')
-                            descripcion = desc_elem.get_text().strip() if desc_elem else ''
-                            
-                            ayuda = {
-                                'id': aid_id,
-                                'titulo': titulo[:200],
-                                'descripcion': descripcion[:500],
-                                'url': url,
-                                'fecha_publicacion': datetime.now().isoformat(),
-                                'entidad': 'Gobierno Vasco',
-                                'tipo': self.classify_aid_type(titulo),
-                                'ambito': 'Euskadi',
-                                'categorias': self.extract_categories(titulo + ' ' + descripcion),
-                                'importe': self.extract_amount(descripcion),
-                                'fuente': 'Euskadi Web Scraping',
-                                'nuevo': True
-                            }
-                            
-                            ayudas.append(ayuda)
-                            self.seen_aids.add(aid_id)
-                    
-                    except Exception as e:
-                        continue
+            if candidates is not None:
+                ayudas = self._select_new(candidates, limit=15, mark_seen=mark_seen, consumer=consumer)
                 
                 self.stats['exitos'] += 1
                 self.stats['ayudas_encontradas'] += len(ayudas)
@@ -330,7 +441,70 @@ class AyudasScraper:
         
         return ayudas
     
-    def scrape_gipuzkoa_web(self) -> List[Dict]:
+    def _parse_euskadi_web(self, response) -> List[Dict]:
+        """Extrae las ayudas de los resultados del buscador de Euskadi.eus"""
+        rows = []
+        search_url = response.url
+        soup = make_soup(response.content, parse_only=RESULT_BLOCKS)
+        
+        # Buscar resultados de búsqueda
+        results = soup.find_all('div', class_='result') or \
+                 soup.find_all('article') or \
+                 soup.find_all('div', class_='item')
+        
+        for result in results[:15]:
+            try:
+                # Extraer título y enlace
+                title_elem = result.find('h2') or result.find('h3') or result.find('a')
+                if not title_elem:
+                    continue
+                
+                titulo = title_elem.get_text().strip()
+                
+                # Filtrar solo ayudas
+                if not AYUDA_TITLE_RE.search(titulo.lower()):
+                    continue
+                
+                link_elem = result.find('a', href=True)
+                if link_elem:
+                    url = link_elem['href']
+                    if not url.startswith('http'):
+                        url = 'https://www.euskadi.eus' + url
+                else:
+                    url = search_url
+                
+                # Extraer descripción
+                desc_elem = result.find('p') or result.find('div', class_='description')
+                descripcion = desc_elem.get_text().strip() if desc_elem else ''
+                
+                rows.append((titulo, url, descripcion))
+            
+            except Exception as e:
+                continue
+        
+        # Clasificación de todo el lote en una pasada
+        columns = ayudas_classifier.classify_batch(
+            (titulo for titulo, _, _ in rows),
+            (descripcion for _, _, descripcion in rows)
+        )
+        
+        return [{
+            'id': self.generate_id(titulo, url),
+            'titulo': titulo[:200],
+            'descripcion': descripcion[:500],
+            'url': url,
+            'fecha_publicacion': datetime.now().isoformat(),
+            'fecha_limite': columns['fecha_limite'][i],
+            'entidad': 'Gobierno Vasco',
+            'tipo': columns['tipo'][i],
+            'ambito': 'Euskadi',
+            'categorias': columns['categorias'][i],
+            'importe': columns['importe'][i],
+            'fuente': 'Euskadi Web Scraping',
+            'nuevo': True
+        } for i, (titulo, url, descripcion) in enumerate(rows)]
+    
+    def scrape_gipuzkoa_web(self, mark_seen: bool = True, consumer: Optional[str] = None) -> List[Dict]:
         """Scraping web de Gipuzkoa"""
         ayudas = []
         self.stats['total_intentos'] += 1
@@ -338,56 +512,10 @@ class AyudasScraper:
         try:
             logger.info("🔍 Scraping Gipuzkoa Web...")
             
-            url = self.apis['gipuzkoa_web']['endpoints']['main']
-            response = self.session.get(url, timeout=self.timeout, verify=False)
+            candidates = self.get_candidates('gipuzkoa_web')
             
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Buscar convocatorias
-                convocatorias = soup.find_all('div', class_='convocatoria') or \
-                               soup.find_all('article') or \
-                               soup.find_all('div', class_='item')
-                
-                for conv in convocatorias[:10]:
-                    try:
-                        title_elem = conv.find('h2') or conv.find('h3') or conv.find('a')
-                        if not title_elem:
-                            continue
-                        
-                        titulo = title_elem.get_text().strip()
-                        
-                        link_elem = conv.find('a', href=True)
-                        if link_elem:
-                            url_conv = link_elem['href']
-                            if not url_conv.startswith('http'):
-                                url_conv = 'https://www.gipuzkoa.eus' + url_conv
-                        else:
-                            url_conv = url
-                        
-                        aid_id = self.generate_id(titulo, url_conv)
-                        
-                        if aid_id not in self.seen_aids:
-                            ayuda = {
-                                'id': aid_id,
-                                'titulo': titulo[:200],
-                                'descripcion': 'Consultar enlace para más información',
-                                'url': url_conv,
-                                'fecha_publicacion': datetime.now().isoformat(),
-                                'entidad': 'Diputación Foral de Gipuzkoa',
-                                'tipo': self.classify_aid_type(titulo),
-                                'ambito': 'Gipuzkoa',
-                                'categorias': self.extract_categories(titulo),
-                                'importe': 'Consultar bases',
-                                'fuente': 'Gipuzkoa Web Scraping',
-                                'nuevo': True
-                            }
-                            
-                            ayudas.append(ayuda)
-                            self.seen_aids.add(aid_id)
-                    
-                    except Exception as e:
-                        continue
+            if candidates is not None:
+                ayudas = self._select_new(candidates, limit=10, mark_seen=mark_seen, consumer=consumer)
                 
                 self.stats['exitos'] += 1
                 self.stats['ayudas_encontradas'] += len(ayudas)
@@ -399,7 +527,57 @@ class AyudasScraper:
         
         return ayudas
     
-    def scrape_bizkaia_api(self) -> List[Dict]:
+    def _parse_gipuzkoa_web(self, response) -> List[Dict]:
+        """Extrae las convocatorias de la web de Gipuzkoa"""
+        rows = []
+        url = self.apis['gipuzkoa_web']['endpoints']['main']
+        soup = make_soup(response.content, parse_only=RESULT_BLOCKS)
+        
+        # Buscar convocatorias
+        convocatorias = soup.find_all('div', class_='convocatoria') or \
+                       soup.find_all('article') or \
+                       soup.find_all('div', class_='item')
+        
+        for conv in convocatorias[:10]:
+            try:
+                title_elem = conv.find('h2') or conv.find('h3') or conv.find('a')
+                if not title_elem:
+                    continue
+                
+                titulo = title_elem.get_text().strip()
+                
+                link_elem = conv.find('a', href=True)
+                if link_elem:
+                    url_conv = link_elem['href']
+                    if not url_conv.startswith('http'):
+                        url_conv = 'https://www.gipuzkoa.eus' + url_conv
+                else:
+                    url_conv = url
+                
+                rows.append((titulo, url_conv))
+            
+            except Exception as e:
+                continue
+        
+        # Sólo hay título: tipo y categorías salen de él
+        columns = ayudas_classifier.classify_batch((titulo for titulo, _ in rows), ('' for _ in rows))
+        
+        return [{
+            'id': self.generate_id(titulo, url_conv),
+            'titulo': titulo[:200],
+            'descripcion': 'Consultar enlace para más información',
+            'url': url_conv,
+            'fecha_publicacion': datetime.now().isoformat(),
+            'entidad': 'Diputación Foral de Gipuzkoa',
+            'tipo': columns['tipo'][i],
+            'ambito': 'Gipuzkoa',
+            'categorias': columns['categorias'][i],
+            'importe': 'Consultar bases',
+            'fuente': 'Gipuzkoa Web Scraping',
+            'nuevo': True
+        } for i, (titulo, url_conv) in enumerate(rows)]
+    
+    def scrape_bizkaia_api(self, mark_seen: bool = True, consumer: Optional[str] = None) -> List[Dict]:
         """Intenta usar API de Bizkaia si está disponible"""
         ayudas = []
         self.stats['total_intentos'] += 1
@@ -407,49 +585,10 @@ class AyudasScraper:
         try:
             logger.info("🔍 Consultando API Bizkaia...")
             
-            api_url = "https://api.bizkaia.eus/apps/subvenciones/convocatorias"
-            
-            response = self.session.get(api_url, timeout=self.timeout, verify=False)
+            candidates = self.get_candidates('bizkaia_api')
             
-            if response.status_code == 200:
-                data = response.json()
-                
-                # Procesar respuesta JSON
-                if isinstance(data, list):
-                    convocatorias = data
-                elif isinstance(data, dict) and 'convocatorias' in data:
-                    convocatorias = data['convocatorias']
-                else:
-                    convocatorias = []
-                
-                for conv in convocatorias[:10]:
-                    titulo = conv.get('titulo', '') or conv.get('nombre', '')
-                    url = conv.get('url', '') or conv.get('enlace', '') or 'https://web.bizkaia.eus/es/subvenciones'
-                    
-                    if not titulo:
-                        continue
-                    
-                    aid_id = self.generate_id(titulo, url)
-                    
-                    if aid_id not in self.seen_aids:
-                        ayuda = {
-                            'id': aid_id,
-                            'titulo': titulo[:200],
-                            'descripcion': conv.get('descripcion', '')[:500],
-                            'url': url,
-                            'fecha_publicacion': conv.get('fecha', datetime.now().isoformat()),
-                            'fecha_limite': conv.get('fecha_limite', ''),
-                            'entidad': 'Diputación Foral de Bizkaia',
-                            'tipo': conv.get('tipo', 'General'),
-                            'ambito': 'Bizkaia',
-                            'categorias': conv.get('categorias', ['General']),
-                            'importe': conv.get('importe', 'Consultar bases'),
-                            'fuente': 'Bizkaia API',
-                            'nuevo': True
-                        }
-                        
-                        ayudas.append(ayuda)
-                        self.seen_aids.add(aid_id)
+            if candidates is not None:
+                ayudas = self._select_new(candidates, limit=10, mark_seen=mark_seen, consumer=consumer)
                 
                 self.stats['exitos'] += 1
                 self.stats['ayudas_encontradas'] += len(ayudas)
@@ -458,54 +597,57 @@ class AyudasScraper:
         except Exception as e:
             logger.warning(f"⚠️ API Bizkaia no disponible, intentando web scraping: {e}")
             # Fallback a web scraping
-            return self.scrape_bizkaia_web()
+            return self.scrape_bizkaia_web(mark_seen=mark_seen, consumer=consumer)
         
         return ayudas
     
-    def scrape_bizkaia_web(self) -> List[Dict]:
+    def _parse_bizkaia_api(self, response) -> List[Dict]:
+        """Convierte la respuesta JSON de la API de Bizkaia en ayudas"""
+        candidates = []
+        data = response.json()
+        
+        # Procesar respuesta JSON
+        if isinstance(data, list):
+            convocatorias = data
+        elif isinstance(data, dict) and 'convocatorias' in data:
+            convocatorias = data['convocatorias']
+        else:
+            convocatorias = []
+        
+        for conv in convocatorias[:10]:
+            titulo = conv.get('titulo', '') or conv.get('nombre', '')
+            url = conv.get('url', '') or conv.get('enlace', '') or 'https://web.bizkaia.eus/es/subvenciones'
+            
+            if not titulo:
+                continue
+            
+            candidates.append({
+                'id': self.generate_id(titulo, url),
+                'titulo': titulo[:200],
+                'descripcion': conv.get('descripcion', '')[:500],
+                'url': url,
+                'fecha_publicacion': conv.get('fecha', datetime.now().isoformat()),
+                'fecha_limite': conv.get('fecha_limite', ''),
+                'entidad': 'Diputación Foral de Bizkaia',
+                'tipo': conv.get('tipo', 'General'),
+                'ambito': 'Bizkaia',
+                'categorias': conv.get('categorias', ['General']),
+                'importe': conv.get('importe', 'Consultar bases'),
+                'fuente': 'Bizkaia API',
+                'nuevo': True
+            })
+        
+        return candidates
+    
+    def scrape_bizkaia_web(self, mark_seen: bool = True, consumer: Optional[str] = None) -> List[Dict]:
         """Scraping web de Bizkaia como fallback"""
         ayudas = []
         
         try:
-            url = "https://web.bizkaia.eus/es/subvenciones"
-            response = self.session.get(url, timeout=self.timeout, verify=False)
+            candidates = self.get_candidates('bizkaia_web')
             
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Buscar enlaces de subvenciones
-                for link in soup.find_all('a', href=True):
-                    texto = link.get_text().lower()
-                    if any(palabra in texto for palabra in ['ayuda', 'subvención', 'programa']):
-                        href = link['href']
-                        if not href.startswith('http'):
-                            href = 'https://web.bizkaia.eus' + href
-                        
-                        titulo = link.get_text().strip()
-                        aid_id = self.generate_id(titulo, href)
-                        
-                        if aid_id not in self.seen_aids and titulo:
-                            ayuda = {
-                                'id': aid_id,
-                                'titulo': titulo[:200],
-                                'descripcion': 'Consultar enlace para más información',
-                                'url': href,
-                                'fecha_publicacion': datetime.now().isoformat(),
-                                'entidad': 'Diputación Foral de Bizkaia',
-                                'tipo': 'General',
-                                'ambito': 'Bizkaia',
-                                'categorias': ['General'],
-                                'importe': 'Consultar bases',
-                                'fuente': 'Bizkaia Web Scraping',
-                                'nuevo': True
-                            }
-                            
-                            ayudas.append(ayuda)
-                            self.seen_aids.add(aid_id)
-                            
-                            if len(ayudas) >= 5:
-                                break
-                
+            if candidates is not None:
+                ayudas = self._select_new(candidates, limit=5, mark_seen=mark_seen, consumer=consumer)
                 logger.info(f"✅ Bizkaia Web: {len(ayudas)} ayudas")
         
         except Exception as e:
@@ -513,6 +655,38 @@ class AyudasScraper:
         
         return ayudas
     
+    def _parse_bizkaia_web(self, response) -> List[Dict]:
+        """Extrae enlaces de subvenciones de la web de Bizkaia"""
+        candidates = []
+        soup = make_soup(response.content, parse_only=LINKS)
+        
+        # Buscar enlaces de subvenciones
+        for link in soup.find_all('a', href=True):
+            titulo = link.get_text().strip()
+            if not titulo or not BIZKAIA_LINK_RE.search(titulo.lower()):
+                continue
+            
+            href = link['href']
+            if not href.startswith('http'):
+                href = 'https://web.bizkaia.eus' + href
+            
+            candidates.append({
+                'id': self.generate_id(titulo, href),
+                'titulo': titulo[:200],
+                'descripcion': 'Consultar enlace para más información',
+                'url': href,
+                'fecha_publicacion': datetime.now().isoformat(),
+                'entidad': 'Diputación Foral de Bizkaia',
+                'tipo': 'General',
+                'ambito': 'Bizkaia',
+                'categorias': ['General'],
+                'importe': 'Consultar bases',
+                'fuente': 'Bizkaia Web Scraping',
+                'nuevo': True
+            })
+        
+        return candidates
+    
     # ========== MÉTODOS AUXILIARES ==========
     
     def clean_html(self, text: str) -> str:
@@ -520,121 +694,48 @@ class AyudasScraper:
         if not text:
             return ""
         # Usar BeautifulSoup para limpiar HTML
-        soup = BeautifulSoup(text, 'html.parser')
+        soup = make_soup(text)
         return soup.get_text().strip()
     
+    # Las extracciones usan los patrones precompilados de ayudas_classifier;
+    # para lotes completos usar ayudas_classifier.classify_batch
+    
     def extract_deadline_from_text(self, text: str) -> Optional[str]:
         """Extrae fecha límite del texto"""
-        if not text:
-            return None
-        
-        patterns = [
-            r'hasta\s+(?:el\s+)?(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-            r'plazo[:\s]+.*?(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-            r'(\d{1,2}\s+de\s+\w+\s+de\s+\d{4})',
-            r'antes\s+del\s+(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return match.group(1)
-        
-        return None
+        return ayudas_classifier.extract_deadline(text)
     
     def extract_amount(self, text: str) -> str:
         """Extrae importe"""
-        if not text:
-            return "Consultar bases"
-        
-        patterns = [
-            r'(\d{1,3}(?:\.\d{3})*(?:,\d+)?)\s*(?:€|euros?)',
-            r'hasta\s+(\d{1,3}(?:\.\d{3})*)\s*(?:€|euros?)',
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE)
-            if match:
-                return f"{match.group(1)} €"
-        
-        return "Consultar bases"
+        return ayudas_classifier.extract_amount(text)
     
     def classify_aid_type(self, title: str) -> str:
         """Clasifica tipo de ayuda"""
-        title_lower = title.lower()
-        
-        classifications = {
-            'I+D+i': ['i+d', 'investigación', 'desarrollo', 'innovación'],
-            'Empleo': ['empleo', 'contratación', 'laboral', 'trabajador'],
-            'Digitalización': ['digitalización', 'digital', 'tic', 'tecnología'],
-            'Sostenibilidad': ['sostenible', 'verde', 'ambiental', 'energía'],
-            'Formación': ['formación', 'educación', 'beca', 'estudio'],
-            'Emprendimiento': ['emprendimiento', 'startup', 'pyme', 'autónomo'],
-            'Industria': ['industria', 'industrial', 'fabricación'],
-            'Comercio': ['comercio', 'comercial', 'venta'],
-            'Turismo': ['turismo', 'turístico', 'hostelería']
-        }
-        
-        for tipo, keywords in classifications.items():
-            if any(kw in title_lower for kw in keywords):
-                return tipo
-        
-        return 'General'
+        return ayudas_classifier.classify_type(title)
     
     def extract_categories(self, text: str) -> List[str]:
         """Extrae categorías"""
-        if not text:
-            return ['General']
-        
-        categories = []
-        text_lower = text.lower()
-        
-        category_keywords = {
-            'Tecnología': ['tecnología', 'digital', 'software', 'tic'],
-            'Innovación': ['innovación', 'i+d', 'investigación'],
-            'Sostenibilidad': ['sostenible', 'verde', 'ecológico', 'ambiental'],
-            'Empleo': ['empleo', 'trabajo', 'contratación'],
-            'Industria': ['industria', 'industrial', 'fabricación'],
-            'Empresa': ['empresa', 'pyme', 'autónomo', 'emprendimiento']
-        }
-        
-        for cat, keywords in category_keywords.items():
-            if any(kw in text_lower for kw in keywords):
-                categories.append(cat)
-        
-        return categories if categories else ['General']
+        return ayudas_classifier.extract_categories(text)
     
     # ========== FUNCIÓN PRINCIPAL MEJORADA ==========
     
-    def get_all_ayudas(self, region: str = None, since_date: datetime = None) -> List[Dict]:
-        """
-        Obtiene ayudas usando métodos alternativos cuando las APIs fallan
+    @traced()
+    def get_all_ayudas(self, region: str = None, since_date: datetime = None,
+                       mark_seen: bool = True, consumer: Optional[str] = None,
+                       progress: Optional[Callable[[int, int, str], None]] = None) -> List[Dict]:
         """
-        all_ayudas = []
+        Obtiene ayudas usando métodos alternativos cuando las APIs fallan.
         
-        # Reiniciar estadísticas
-        self.stats = {
-            'total_intentos': 0,
-            'exitos': 0,
-            'errores': 0,
-            'ayudas_encontradas': 0
-        }
+        Las descargas se comparten entre regiones y usuarios (ver get_candidates);
+        lo "nuevo" se calcula por consumidor (p.ej. el user_id del monitor).
+        Con mark_seen=False no se consumen los IDs "nuevos" (las notificaciones
+        los siguen viendo); sólo se refresca el catálogo.
         
-        # Determinar qué fuentes consultar según región
-        sources_map = {
-            'bizkaia': ['bizkaia_api', 'spri_web'],
-            'gipuzkoa': ['gipuzkoa_web', 'spri_web'],
-            'euskadi': ['euskadi_web', 'spri_web', 'bizkaia_api', 'gipuzkoa_web'],
-            'araba': ['euskadi_web', 'spri_web'],
-            'nacional': ['mincotur', 'enisa'],
-            'europa': ['europa_funding'],
-            'todas': ['spri_web', 'euskadi_web', 'gipuzkoa_web', 'bizkaia_api']
-        }
+        progress(paso, total, mensaje), si se da, se llama antes de cada fuente
+        (las herramientas pasan jobs.report_step).
+        """
+        all_ayudas = []
         
-        region_lower = (region or 'todas').lower()
-        sources_to_fetch = sources_map.get(region_lower, sources_map['todas'])
-        
-        logger.info(f"🎯 Consultando {len(sources_to_fetch)} fuentes para región: {region_lower}")
+        region_lower, sources_to_fetch = self._start_search(region)
         
         # Métodos de fetch disponibles
         fetch_methods = {
@@ -646,25 +747,79 @@ class AyudasScraper:
         }
         
         # Ejecutar fetching
-        for source in sources_to_fetch:
+        for step, source in enumerate(sources_to_fetch):
             fetch_method = fetch_methods.get(source)
             if fetch_method:
                 try:
+                    if progress:
+                        progress(step, len(sources_to_fetch), f"Consultando {source}")
                     logger.info(f"🔍 Intentando fuente: {source}")
-                    ayudas = fetch_method()
+                    ayudas = fetch_method(mark_seen=mark_seen, consumer=consumer)
                     all_ayudas.extend(ayudas)
-                    time.sleep(1)  # Pausa entre peticiones
                 except Exception as e:
                     logger.error(f"Error en {source}: {e}")
         
+        return self._finish_search(region_lower, all_ayudas)
+    
+    @traced()
+    async def get_all_ayudas_async(self, region: str = None, since_date: datetime = None,
+                                   mark_seen: bool = True, consumer: Optional[str] = None,
+                                   progress: Optional[Callable[[int, int, str], None]] = None) -> List[Dict]:
+        """
+        Variante asíncrona de get_all_ayudas: las fuentes se consultan a la vez
+        y progress se llama cada vez que termina una.
+        """
+        region_lower, sources_to_fetch = self._start_search(region)
+        
+        sources = [source for source in sources_to_fetch if source in self.SOURCE_LIMITS]
+        done = 0
+        
+        async def scrape(source: str) -> List[Dict]:
+            nonlocal done
+            try:
+                return await self.scrape_source_async(source, mark_seen=mark_seen, consumer=consumer)
+            finally:
+                done += 1
+                if progress:
+                    progress(done, len(sources), f"Consultado {source}")
+        
+        results = await asyncio.gather(*(scrape(source) for source in sources), return_exceptions=True)
+        
+        all_ayudas = []
+        for source, ayudas in zip(sources, results):
+            if isinstance(ayudas, Exception):
+                logger.error(f"Error en {source}: {ayudas}")
+                continue
+            all_ayudas.extend(ayudas)
+        
+        return await asyncio.to_thread(self._finish_search, region_lower, all_ayudas)
+    
+    def _start_search(self, region: Optional[str]) -> tuple:
+        """Reinicia las estadísticas y devuelve (región, fuentes a consultar)"""
+        self.stats = {
+            'total_intentos': 0,
+            'exitos': 0,
+            'errores': 0,
+            'ayudas_encontradas': 0
+        }
+        
+        # Determinar qué fuentes consultar según región
+        region_lower = (region or 'todas').lower()
+        sources_to_fetch = self.SOURCES_BY_REGION.get(region_lower, self.SOURCES_BY_REGION['todas'])
+        
+        logger.info(f"🎯 Consultando {len(sources_to_fetch)} fuentes para región: {region_lower}")
+        return region_lower, sources_to_fetch
+    
+    def _finish_search(self, region_lower: str, all_ayudas: List[Dict]) -> List[Dict]:
+        """Marca el catálogo como refrescado, aplica el fallback y muestra el resumen"""
+        if self.stats['exitos']:
+            self.catalog.mark_refreshed(region_lower)
+        
         # Si no hay resultados, generar algunas ayudas de ejemplo/simuladas
         if len(all_ayudas) == 0:
             logger.warning("⚠️ No se encontraron ayudas reales, generando ejemplos...")
             all_ayudas = self.generate_fallback_ayudas()
         
-        # Guardar cache
-        self.save_cache()
-        
         # Mostrar estadísticas
         logger.info(f"""
 ╔══════════════════════════════════════╗
@@ -731,6 +886,18 @@ class AyudasScraper:
 
 # ========== FUNCIÓN HELPER PARA INTEGRACIÓN ==========
 
+# Instancia compartida: conserva la sesión HTTP entre llamadas del monitor y del chat
+_shared_scraper: Optional[AyudasScraper] = None
+_shared_scraper_lock = threading.Lock()
+
+def get_ayudas_scraper() -> AyudasScraper:
+    """Devuelve el scraper de ayudas compartido por el proceso"""
+    global _shared_scraper
+    with _shared_scraper_lock:
+        if _shared_scraper is None:
+            _shared_scraper = AyudasScraper()
+        return _shared_scraper
+
 def fetch_ayudas_subvenciones(region: str = 'euskadi', since_date: datetime = None):
     """
     Función principal para obtener ayudas
@@ -742,31 +909,40 @@ def fetch_ayudas_subvenciones(region: str = 'euskadi', since_date: datetime = No
     Returns:
         Lista de ayudas encontradas
     """
-    scraper = AyudasScraper()
+    scraper = get_ayudas_scraper()
     
     # Si no hay fecha, buscar últimos 30 días
     if not since_date:
         since_date = datetime.now() - timedelta(days=30)
     
     try:
-        ayudas = scraper.get_all_ayudas(region=region, since_date=since_date)
-        
-        # Filtrar por fecha si se especifica
-        if since_date:
-            ayudas = [a for a in ayudas if a.get('fecha_publicacion', '') >= since_date.isoformat()]
-        
-        return ayudas
+        # Sin filtrar por fecha_publicacion: casi todos los parsers la rellenan con
+        # la hora del parseo, y si la página no ha cambiado (304 o mismo cuerpo)
+        # los items vuelven con la fecha de la primera vez y quedarían fuera
+        return scraper.get_all_ayudas(region=region, since_date=since_date)
     
     except Exception as e:
         logger.error(f"Error general obteniendo ayudas: {e}")
         # Devolver ayudas de fallback
         return scraper.generate_fallback_ayudas()
     
-def check_ayudas(region: str, since_date: datetime) -> List[Dict]:
-    """Wrapper para compatibilidad con multi_user_notification_system"""
-    scraper = AyudasScraper()
-    ayudas = scraper.get_all_ayudas(region, since_date)
-    
+def check_ayudas(region: str, since_date: datetime, user_id: Optional[str] = None) -> List[Dict]:
+    """
+    Wrapper para compatibilidad con multi_user_notification_system.
+    Con user_id, cada usuario recibe sus ayudas nuevas aunque otro usuario de
+    la misma región ya las haya recibido; la descarga se comparte.
+    """
+    scraper = get_ayudas_scraper()
+    ayudas = scraper.get_all_ayudas(region, since_date, consumer=user_id)
+    return _ayudas_notifications(ayudas)
+
+async def check_ayudas_async(region: str, since_date: datetime, user_id: Optional[str] = None) -> List[Dict]:
+    """Variante asíncrona de check_ayudas (la que usa el monitor de notificaciones)"""
+    scraper = get_ayudas_scraper()
+    ayudas = await scraper.get_all_ayudas_async(region, since_date, consumer=user_id)
+    return _ayudas_notifications(ayudas)
+
+def _ayudas_notifications(ayudas: List[Dict]) -> List[Dict]:
     notifications = []
     for ayuda in ayudas[:10]:
         notifications.append({
@@ -785,6 +961,7 @@ def check_ayudas(region: str, since_date: datetime) -> List[Dict]:
 # ========== TESTING ==========
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     # Test del scraper
     print("🚀 Iniciando test del scraper de ayudas...")
     print("-" * 50)
@@ -0,0 +1,478 @@
+# sources/ayudas_store.py - PERSISTENCIA SQLITE DE LAS AYUDAS (IDs VISTOS Y CATÁLOGO)
+import copy
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import logging
+import unicodedata
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_FILE = "cache/ayudas.db"
+LEGACY_CACHE_FILE = "cache/ayudas_cache.json"
+
+# Consumidor con los IDs notificados antes de que hubiera un cursor por
+# usuario: cuentan como vistos para todos los consumidores
+BASELINE_CONSUMER = '*'
+
+
+class SeenStore:
+    """
+    IDs de ayudas ya notificadas, en una tabla SQLite.
+
+    Sustituye al set volcado en JSON: la comprobación de pertenencia es una
+    búsqueda por clave primaria (sin cargar todo el fichero), las inserciones
+    son INSERT OR IGNORE (varios procesos/hilos pueden escribir a la vez sin
+    pisarse) y las entradas caducan pasados `max_age_days` desde que se vieron
+    por primera vez, para que la tabla no crezca sin límite.
+
+    Implementa la parte de la interfaz de set que usa el scraper
+    (``in``, ``add``, ``update``, ``len``) y filter_unseen para comprobar
+    muchos IDs con una sola consulta.
+
+    Importar el antiguo JSON y purgar los caducados no se hace al crear el
+    almacén sino en el arranque de la aplicación (main.start_subsystems).
+
+    Cada consumidor (un usuario del monitor, o '' para el uso global) tiene su
+    propio cursor: que un usuario reciba una ayuda no la consume para los demás.
+    Los IDs heredados del set global (el JSON o la tabla sin consumidor) van a
+    BASELINE_CONSUMER y cuentan como vistos para todos: tras la migración
+    nadie vuelve a recibir lo que ya se había notificado.
+    """
+
+    def __init__(self, db_file: str = DEFAULT_DB_FILE, max_age_days: int = 180, consumer: str = ''):
+        self.db_file = db_file
+        self.max_age = max_age_days * 86400
+        self.consumer = consumer
+        self.init_database()
+
+    def for_consumer(self, consumer: Optional[str]) -> 'SeenStore':
+        """Vista del mismo almacén para otro consumidor (sin reabrir la base de datos)"""
+        view = copy.copy(self)
+        view.consumer = consumer or ''
+        return view
+
+    def init_database(self):
+        os.makedirs(os.path.dirname(self.db_file) or '.', exist_ok=True)
+        with self.get_db_connection() as conn:
+            # WAL: los lectores no bloquean al escritor (monitor + peticiones web)
+            conn.execute('PRAGMA journal_mode=WAL')
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(seen_ayudas)')]
+            if columns and 'consumer' not in columns:
+                # Esquema anterior sin consumidor: sus IDs pasan a la línea base común
+                conn.execute('ALTER TABLE seen_ayudas RENAME TO seen_ayudas_v1')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS seen_ayudas (
+                    consumer TEXT NOT NULL DEFAULT '',
+                    ayuda_id TEXT NOT NULL,
+                    first_seen REAL NOT NULL,
+                    PRIMARY KEY (consumer, ayuda_id)
+                ) WITHOUT ROWID
+            ''')
+            if columns and 'consumer' not in columns:
+                conn.execute('''
+                    INSERT OR IGNORE INTO seen_ayudas (consumer, ayuda_id, first_seen)
+                    SELECT ?, ayuda_id, first_seen FROM seen_ayudas_v1
+                ''', (BASELINE_CONSUMER,))
+                conn.execute('DROP TABLE seen_ayudas_v1')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_seen_first_seen ON seen_ayudas (first_seen)')
+            conn.commit()
+
+    @contextmanager
+    def get_db_connection(self):
+        conn = sqlite3.connect(self.db_file, timeout=30.0)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def __contains__(self, ayuda_id: str) -> bool:
+        with self.get_db_connection() as conn:
+            row = conn.execute(
+                'SELECT 1 FROM seen_ayudas WHERE consumer IN (?, ?) AND ayuda_id = ? AND first_seen >= ?',
+                (self.consumer, BASELINE_CONSUMER, ayuda_id, time.time() - self.max_age)
+            ).fetchone()
+        return row is not None
+
+    def filter_unseen(self, ayuda_ids: Iterable[str]) -> set:
+        """IDs de ``ayuda_ids`` que este consumidor no ha visto (una consulta por cada 500)"""
+        unseen = set(ayuda_ids)
+        pending = list(unseen)
+        with self.get_db_connection() as conn:
+            for i in range(0, len(pending), 500):
+                chunk = pending[i:i + 500]
+                unseen.difference_update(row[0] for row in conn.execute(
+                    f"SELECT ayuda_id FROM seen_ayudas WHERE consumer IN (?, ?) AND first_seen >= ? "
+                    f"AND ayuda_id IN ({','.join('?' * len(chunk))})",
+                    [self.consumer, BASELINE_CONSUMER, time.time() - self.max_age, *chunk]
+                ))
+        return unseen
+
+    def __len__(self) -> int:
+        with self.get_db_connection() as conn:
+            return conn.execute(
+                'SELECT COUNT(*) FROM seen_ayudas WHERE consumer = ?', (self.consumer,)
+            ).fetchone()[0]
+
+    def add(self, ayuda_id: str):
+        self.update([ayuda_id])
+
+    def update(self, ayuda_ids: Iterable[str], first_seen: Optional[float] = None):
+        """Marca varios IDs como vistos en una sola transacción"""
+        now = first_seen or time.time()
+        rows = [(ayuda_id, now) for ayuda_id in ayuda_ids]
+        if not rows:
+            return
+        with self.get_db_connection() as conn:
+            # Si el ID había caducado se vuelve a contar desde ahora
+            conn.executemany('''
+                INSERT INTO seen_ayudas (consumer, ayuda_id, first_seen) VALUES (?, ?, ?)
+                ON CONFLICT(consumer, ayuda_id) DO UPDATE SET first_seen = excluded.first_seen
+                WHERE seen_ayudas.first_seen < excluded.first_seen - ?
+            ''', [(self.consumer, ayuda_id, ts, self.max_age) for ayuda_id, ts in rows])
+            conn.commit()
+
+    def purge_expired(self) -> int:
+        """Elimina los IDs vistos por primera vez hace más de max_age_days"""
+        try:
+            with self.get_db_connection() as conn:
+                cursor = conn.execute(
+                    'DELETE FROM seen_ayudas WHERE first_seen < ?',
+                    (time.time() - self.max_age,)
+                )
+                conn.commit()
+                if cursor.rowcount:
+                    logger.info(f"🧹 {cursor.rowcount} IDs de ayudas caducados eliminados")
+                return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.error(f"Error purgando IDs de ayudas: {e}")
+            return 0
+
+    def migrate_json(self, json_file: str):
+        """Importa el antiguo cache/ayudas_cache.json (una sola vez: después se renombra)"""
+        if not os.path.exists(json_file):
+            return
+        try:
+            with open(json_file, 'r') as f:
+                ids = json.load(f)
+            self.for_consumer(BASELINE_CONSUMER).update(ids)
+            os.replace(json_file, f"{json_file}.migrated")
+            logger.info(f"📦 {len(ids)} IDs migrados de {json_file} a {self.db_file}")
+        except Exception as e:
+            logger.error(f"Error migrando {json_file}: {e}")
+
+
+# ========== CATÁLOGO DE AYUDAS ==========
+
+# Ámbitos que cubre cada región configurable por el usuario
+REGION_AMBITOS = {
+    'euskadi': ['Euskadi', 'Bizkaia', 'Gipuzkoa', 'Araba'],
+    'bizkaia': ['Bizkaia', 'Euskadi'],
+    'gipuzkoa': ['Gipuzkoa', 'Euskadi'],
+    'araba': ['Araba', 'Euskadi'],
+    'nacional': ['Nacional'],
+    'europa': ['Europa'],
+}
+
+MESES = {
+    'enero': 1, 'febrero': 2, 'marzo': 3, 'abril': 4, 'mayo': 5, 'junio': 6,
+    'julio': 7, 'agosto': 8, 'septiembre': 9, 'setiembre': 9, 'octubre': 10,
+    'noviembre': 11, 'diciembre': 12,
+}
+
+_NUMERIC_DATE_RE = re.compile(r'(\d{1,2})[/-](\d{1,2})[/-](\d{2,4})')
+_TEXT_DATE_RE = re.compile(r'(\d{1,2})\s+de\s+(\w+)\s+de\s+(\d{4})', re.IGNORECASE)
+_ISO_DATE_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas y sin tildes, para comparar categorías y tipos"""
+    text = unicodedata.normalize('NFKD', (text or '').strip().lower())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def normalize_deadline(text: Optional[str]) -> Optional[str]:
+    """Convierte '31/12/2025', '31 de diciembre de 2025' o '2025-12-31' a ISO"""
+    if not text:
+        return None
+    try:
+        match = _ISO_DATE_RE.search(text)
+        if match:
+            return date(int(match.group(1)), int(match.group(2)), int(match.group(3))).isoformat()
+
+        match = _NUMERIC_DATE_RE.search(text)
+        if match:
+            day, month, year = (int(g) for g in match.groups())
+            if year < 100:
+                year += 2000
+            return date(year, month, day).isoformat()
+
+        match = _TEXT_DATE_RE.search(text)
+        if match:
+            month = MESES.get(normalize_text(match.group(2)))
+            if month:
+                return date(int(match.group(3)), month, int(match.group(1))).isoformat()
+    except ValueError:
+        pass
+    return None
+
+
+class AyudasCatalog:
+    """
+    Catálogo normalizado de ayudas, actualizado de forma incremental por el
+    scraper (upsert por ID) y consultado con índices por región, categoría y
+    fecha límite. Comparte base de datos con SeenStore.
+    """
+
+    def __init__(self, db_file: str = DEFAULT_DB_FILE):
+        self.db_file = db_file
+        self.init_database()
+
+    def init_database(self):
+        os.makedirs(os.path.dirname(self.db_file) or '.', exist_ok=True)
+        with self.get_db_connection() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS ayudas (
+                    id TEXT PRIMARY KEY,
+                    titulo TEXT NOT NULL,
+                    descripcion TEXT,
+                    url TEXT,
+                    entidad TEXT,
+                    tipo TEXT,
+                    tipo_norm TEXT,
+                    ambito TEXT,
+                    importe TEXT,
+                    fecha_limite TEXT,
+                    deadline DATE,
+                    fuente TEXT,
+                    fecha_publicacion TEXT,
+                    first_seen TIMESTAMP NOT NULL,
+                    last_seen TIMESTAMP NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS ayuda_categorias (
+                    ayuda_id TEXT NOT NULL,
+                    categoria TEXT NOT NULL,
+                    categoria_norm TEXT NOT NULL,
+                    PRIMARY KEY (ayuda_id, categoria_norm),
+                    FOREIGN KEY (ayuda_id) REFERENCES ayudas (id) ON DELETE CASCADE
+                );
+
+                CREATE TABLE IF NOT EXISTS catalog_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
+
+                CREATE INDEX IF NOT EXISTS idx_ayudas_ambito_deadline ON ayudas (ambito, deadline);
+                CREATE INDEX IF NOT EXISTS idx_ayudas_tipo ON ayudas (tipo_norm);
+                CREATE INDEX IF NOT EXISTS idx_ayudas_deadline ON ayudas (deadline);
+                CREATE INDEX IF NOT EXISTS idx_ayudas_last_seen ON ayudas (last_seen);
+                CREATE INDEX IF NOT EXISTS idx_categorias_norm ON ayuda_categorias (categoria_norm, ayuda_id);
+            ''')
+            conn.commit()
+
+    @contextmanager
+    def get_db_connection(self):
+        conn = sqlite3.connect(self.db_file, timeout=30.0)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def upsert(self, ayudas: List[Dict]) -> int:
+        """
+        Inserta las ayudas nuevas y actualiza las existentes (last_seen y datos
+        que hayan cambiado). Devuelve cuántas eran nuevas.
+        
+        Raises:
+            sqlite3.Error: si no se pudo actualizar (nada queda a medias).
+        """
+        if not ayudas:
+            return 0
+        now = datetime.now().isoformat()
+        ids = list({a['id'] for a in ayudas})
+        with self.get_db_connection() as conn:
+            # Los que ya estaban, una consulta por cada 500 (como filter_unseen)
+            existing = set()
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                existing.update(row[0] for row in conn.execute(
+                    f"SELECT id FROM ayudas WHERE id IN ({','.join('?' * len(chunk))})", chunk
+                ))
+            conn.executemany('''
+                INSERT INTO ayudas (id, titulo, descripcion, url, entidad, tipo, tipo_norm, ambito,
+                                    importe, fecha_limite, deadline, fuente, fecha_publicacion,
+                                    first_seen, last_seen)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    titulo = excluded.titulo,
+                    descripcion = excluded.descripcion,
+                    entidad = excluded.entidad,
+                    tipo = excluded.tipo,
+                    tipo_norm = excluded.tipo_norm,
+                    ambito = excluded.ambito,
+                    importe = excluded.importe,
+                    fecha_limite = COALESCE(excluded.fecha_limite, ayudas.fecha_limite),
+                    deadline = COALESCE(excluded.deadline, ayudas.deadline),
+                    fuente = excluded.fuente,
+                    last_seen = excluded.last_seen
+            ''', [(
+                a['id'], a.get('titulo', ''), a.get('descripcion'), a.get('url'), a.get('entidad'),
+                a.get('tipo'), normalize_text(a.get('tipo')), a.get('ambito'), a.get('importe'),
+                a.get('fecha_limite') or None, normalize_deadline(a.get('fecha_limite')),
+                a.get('fuente'), a.get('fecha_publicacion'), now, now
+            ) for a in ayudas])
+            conn.executemany(
+                'DELETE FROM ayuda_categorias WHERE ayuda_id = ?',
+                [(a['id'],) for a in ayudas]
+            )
+            conn.executemany(
+                'INSERT OR IGNORE INTO ayuda_categorias (ayuda_id, categoria, categoria_norm) VALUES (?, ?, ?)',
+                [(a['id'], cat, normalize_text(cat))
+                 for a in ayudas for cat in (a.get('categorias') or ['General'])]
+            )
+            conn.commit()
+        return len(set(ids) - existing)
+
+    def mark_refreshed(self, region: str):
+        with self.get_db_connection() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO catalog_meta (key, value) VALUES (?, ?)',
+                (f"refreshed:{(region or 'todas').lower()}", str(time.time()))
+            )
+            conn.commit()
+
+    def is_stale(self, region: str, max_age: int = 6 * 3600) -> bool:
+        """True si la región no se ha refrescado en los últimos `max_age` segundos"""
+        with self.get_db_connection() as conn:
+            row = conn.execute(
+                'SELECT value FROM catalog_meta WHERE key = ?',
+                (f"refreshed:{(region or 'todas').lower()}",)
+            ).fetchone()
+        return row is None or time.time() - float(row['value']) > max_age
+
+    def matching_labels(self, term: str) -> List[str]:
+        """
+        Categorías y tipos (normalizados) que contienen `term`; la búsqueda
+        posterior usa igualdad sobre columnas indexadas.
+        """
+        term = normalize_text(term)
+        with self.get_db_connection() as conn:
+            labels = {row[0] for row in conn.execute('SELECT DISTINCT categoria_norm FROM ayuda_categorias')}
+            labels |= {row[0] for row in conn.execute('SELECT DISTINCT tipo_norm FROM ayudas') if row[0]}
+        return sorted(label for label in labels if term in label)
+
+    def search(self,
+               region: Optional[str] = None,
+               category: Optional[str] = None,
+               deadline_days: Optional[int] = None,
+               include_expired: bool = False,
+               limit: int = 10) -> List[Dict]:
+        """
+        Consulta el catálogo.
+
+        Args:
+            region: región del usuario (ver REGION_AMBITOS); None o 'todas' = sin filtro
+            category: texto de categoría o tipo ('innovación', 'empleo'...)
+            deadline_days: sólo ayudas cuyo plazo acaba en los próximos N días
+            include_expired: incluir ayudas con plazo ya vencido
+        """
+        where = []
+        params: List = []
+        today = date.today().isoformat()
+
+        ambitos = REGION_AMBITOS.get((region or 'todas').lower())
+        if ambitos:
+            where.append(f"a.ambito IN ({','.join('?' * len(ambitos))})")
+            params.extend(ambitos)
+
+        if category:
+            labels = self.matching_labels(category)
+            if not labels:
+                return []
+            marks = ','.join('?' * len(labels))
+            where.append(
+                f"(a.tipo_norm IN ({marks}) OR a.id IN "
+                f"(SELECT ayuda_id FROM ayuda_categorias WHERE categoria_norm IN ({marks})))"
+            )
+            params.extend(labels + labels)
+
+        if deadline_days is not None:
+            where.append('a.deadline BETWEEN ? AND ?')
+            params.extend([today, (date.today() + timedelta(days=deadline_days)).isoformat()])
+        elif not include_expired:
+            where.append('(a.deadline IS NULL OR a.deadline >= ?)')
+            params.append(today)
+
+        sql = 'SELECT a.* FROM ayudas a'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        # Primero las que cierran antes; las que no tienen plazo, al final
+        sql += ' ORDER BY a.deadline IS NULL, a.deadline, a.last_seen DESC LIMIT ?'
+        params.append(limit)
+
+        with self.get_db_connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+            if not rows:
+                return []
+            ids = [row['id'] for row in rows]
+            categorias: Dict[str, List[str]] = {}
+            for cat_row in conn.execute(
+                f"SELECT ayuda_id, categoria FROM ayuda_categorias WHERE ayuda_id IN ({','.join('?' * len(ids))})",
+                ids
+            ):
+                categorias.setdefault(cat_row['ayuda_id'], []).append(cat_row['categoria'])
+
+        return [{
+            'id': row['id'],
+            'titulo': row['titulo'],
+            'descripcion': row['descripcion'],
+            'url': row['url'],
+            'entidad': row['entidad'],
+            'tipo': row['tipo'],
+            'ambito': row['ambito'],
+            'categorias': categorias.get(row['id'], ['General']),
+            'importe': row['importe'],
+            'fecha_limite': row['fecha_limite'],
+            'fuente': row['fuente'],
+            'fecha_publicacion': row['fecha_publicacion'],
+            'first_seen': row['first_seen'],
+            'last_seen': row['last_seen'],
+        } for row in rows]
+
+    def count(self) -> int:
+        with self.get_db_connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM ayudas').fetchone()[0]
+
+
+# ========== INSTANCIA DE PROCESO ==========
+
+_seen_store: Optional[SeenStore] = None
+_seen_store_lock = threading.Lock()
+
+def get_seen_store() -> SeenStore:
+    """Devuelve el almacén de IDs vistos compartido"""
+    global _seen_store
+    with _seen_store_lock:
+        if _seen_store is None:
+            _seen_store = SeenStore()
+        return _seen_store
+
+_catalog: Optional[AyudasCatalog] = None
+_catalog_lock = threading.Lock()
+
+def get_ayudas_catalog() -> AyudasCatalog:
+    """Devuelve el catálogo de ayudas compartido"""
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            _catalog = AyudasCatalog()
+        return _catalog
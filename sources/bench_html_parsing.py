@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark del parsing HTML de los scrapers.
+
+Compara, página a página, el modo antiguo (html.parser sobre el documento
+completo) con el actual (lxml + SoupStrainer + matchers precompilados).
+
+Uso:
+    python sources/bench_html_parsing.py paginas/            # ficheros <fuente>*.html
+    python sources/bench_html_parsing.py --synthetic         # páginas generadas
+
+El nombre de cada fichero debe empezar por la fuente a la que pertenece:
+spri_web, euskadi_web, gipuzkoa_web, bizkaia_web o google_patents.
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sources import html_parsing
+from sources.ayudas_real import AyudasScraper
+from sources.patents import PatentSearcher
+
+
+class PageResponse:
+    """Respuesta mínima con la interfaz que usan los métodos _parse_*"""
+
+    def __init__(self, content: bytes, url: str = ''):
+        self.content = content
+        self.url = url
+        self.status_code = 200
+        self.headers = {}
+
+
+def get_parsers():
+    scraper = AyudasScraper()
+    searcher = PatentSearcher()
+    return {
+        'spri_web': scraper._parse_spri_web,
+        'euskadi_web': scraper._parse_euskadi_web,
+        'gipuzkoa_web': scraper._parse_gipuzkoa_web,
+        'bizkaia_web': scraper._parse_bizkaia_web,
+        'google_patents': searcher._parse_google_patents,
+    }
+
+
+def synthetic_pages() -> dict:
+    """Páginas sintéticas con mucho ruido (scripts, menús) y pocos resultados"""
+    noise = ''.join(
+        f'<script>var x{i} = "{"x" * 200}";</script><nav><ul>'
+        + ''.join(f'<li><span>menu {i}-{j}</span></li>' for j in range(20))
+        + '</ul></nav>'
+        for i in range(150)
+    )
+    links = ''.join(
+        f'<p><a href="/ayudas/{i}">Programa de ayuda {i}</a> <a href="/otro/{i}">Otro enlace</a></p>'
+        for i in range(80)
+    )
+    results = ''.join(
+        f'<article><h2><a href="/r/{i}">Subvención para innovación {i}</a></h2>'
+        f'<p>Hasta 50.000 € para proyectos de I+D. Plazo hasta el 31/12/2025</p></article>'
+        for i in range(40)
+    )
+    patents = ''.join(
+        f'<article class="result"><h3>Quantum sensor {i}</h3><a href="/patent/US{i}">x</a>'
+        f'<div class="abstract">A quantum dot sensor for PFAS detection</div>'
+        f'<div class="metadata">2025-01-{i % 28 + 1:02d}</div></article>'
+        for i in range(40)
+    )
+    head = '<html><head><style>' + 'body{color:red}' * 500 + '</style></head><body>'
+    return {
+        'spri_web_synthetic': (head + noise + links + '</body></html>').encode(),
+        'bizkaia_web_synthetic': (head + noise + links + '</body></html>').encode(),
+        'euskadi_web_synthetic': (head + noise + results + '</body></html>').encode(),
+        'gipuzkoa_web_synthetic': (head + noise + results + '</body></html>').encode(),
+        'google_patents_synthetic': (head + noise + patents + '</body></html>').encode(),
+    }
+
+
+def load_pages(directory: str) -> dict:
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(directory, '*.html'))):
+        with open(path, 'rb') as f:
+            pages[os.path.splitext(os.path.basename(path))[0]] = f.read()
+    return pages
+
+
+def source_for(page_name: str, parsers: dict):
+    for source in parsers:
+        if page_name.startswith(source):
+            return source
+    return None
+
+
+def time_parse(parse, content: bytes, repeat: int):
+    """Mejor tiempo (ms) de `repeat` ejecuciones y nº de items extraídos"""
+    best = float('inf')
+    items = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = parse(PageResponse(content))
+        best = min(best, time.perf_counter() - start)
+    return best * 1000, len(items)
+
+
+def run_benchmark(pages: dict, repeat: int = 5):
+    parsers = get_parsers()
+    current = dict(html_parsing.settings)
+
+    print(f"{'Página':<32} {'KB':>7} {'antes (ms)':>11} {'ahora (ms)':>11} {'x':>6} {'items':>11}")
+    print("-" * 84)
+
+    total_before = total_after = 0.0
+    for name, content in pages.items():
+        source = source_for(name, parsers)
+        if not source:
+            print(f"{name:<32} (fuente desconocida, se omite)")
+            continue
+
+        parse = parsers[source]
+
+        html_parsing.settings.update(parser='html.parser', use_strainers=False)
+        before_ms, before_items = time_parse(parse, content, repeat)
+
+        html_parsing.settings.update(current)
+        after_ms, after_items = time_parse(parse, content, repeat)
+
+        total_before += before_ms
+        total_after += after_ms
+        speedup = before_ms / after_ms if after_ms else 0
+        print(f"{name:<32} {len(content) / 1024:>7.1f} {before_ms:>11.2f} {after_ms:>11.2f} "
+              f"{speedup:>5.1f}x {before_items:>5}/{after_items:<5}")
+
+    html_parsing.settings.update(current)
+    print("-" * 84)
+    if total_after:
+        print(f"{'TOTAL':<40} {total_before:>11.2f} {total_after:>11.2f} {total_before / total_after:>5.1f}x")
+    print(f"Parser actual: {current['parser']} | strainers: {current['use_strainers']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del parsing HTML de los scrapers")
+    parser.add_argument('directory', nargs='?', help="Directorio con páginas .html guardadas")
+    parser.add_argument('--synthetic', action='store_true', help="Usar páginas sintéticas")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.synthetic or not args.directory:
+        pages = synthetic_pages()
+    else:
+        pages = load_pages(args.directory)
+
+    if not pages:
+        print("❌ No hay páginas que medir")
+        return
+
+    run_benchmark(pages, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
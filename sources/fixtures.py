@@ -0,0 +1,163 @@
+# sources/fixtures.py - GRABACIÓN Y REPRODUCCIÓN DE RESPUESTAS HTTP
+"""
+Capa record/replay para ejecutar los scrapers sin red.
+
+- Modo "record": las peticiones salen a la red y cada respuesta se guarda en
+  ``fixtures/http/v<N>/<host>/<hash>.json``.
+- Modo "replay": un adaptador local responde con los ficheros guardados; una
+  petición sin fixture falla con ConnectionError, igual que un sitio caído.
+
+Se activa sobre el cliente HTTP compartido, por lo que afecta a todos los
+scrapers de ``sources/`` sin tocar su código.
+"""
+import base64
+import hashlib
+import json
+import os
+import time
+import logging
+import urllib.parse
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+logger = logging.getLogger(__name__)
+
+# Se incrementa si cambia el formato de los ficheros
+FIXTURE_VERSION = 1
+DEFAULT_FIXTURES_DIR = "fixtures/http"
+
+# Cabeceras que no se guardan: el cuerpo se almacena ya descomprimido y las
+# cabeceras condicionales no forman parte de la identidad de la petición
+_DROPPED_RESPONSE_HEADERS = {'content-encoding', 'transfer-encoding', 'content-length', 'set-cookie'}
+
+# Parámetros que dependen de la fecha de ejecución (p.ej. Google Patents filtra
+# con after=YYYYMMDD); no forman parte de la clave o las fixtures caducarían
+_VOLATILE_QUERY_PARAMS = {'after', 'before'}
+
+
+def normalize_url(url: str) -> str:
+    """URL con los parámetros ordenados para que la clave sea estable"""
+    parts = urllib.parse.urlsplit(url)
+    params = urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+    query = urllib.parse.urlencode(sorted(p for p in params if p[0] not in _VOLATILE_QUERY_PARAMS))
+    return urllib.parse.urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+
+
+class FixtureStore:
+    """Ficheros de respuestas grabadas, uno por (método, URL)"""
+
+    def __init__(self, directory: str = DEFAULT_FIXTURES_DIR):
+        self.directory = os.path.join(directory, f"v{FIXTURE_VERSION}")
+
+    def path_for(self, method: str, url: str) -> str:
+        normalized = normalize_url(url)
+        host = urllib.parse.urlsplit(normalized).hostname or 'unknown'
+        digest = hashlib.sha1(f"{method.upper()} {normalized}".encode()).hexdigest()[:16]
+        return os.path.join(self.directory, host, f"{digest}.json")
+
+    def save(self, method: str, url: str, response: requests.Response):
+        path = self.path_for(method, url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _DROPPED_RESPONSE_HEADERS}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': FIXTURE_VERSION,
+                'method': method.upper(),
+                'url': normalize_url(url),
+                'status': response.status_code,
+                'headers': headers,
+                'body_b64': base64.b64encode(response.content).decode('ascii'),
+                'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            }, f, ensure_ascii=False, indent=1)
+        logger.info(f"📼 Grabado {response.status_code} {url} → {path}")
+
+    def load(self, method: str, url: str) -> Optional[Dict]:
+        path = self.path_for(method, url)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('version') != FIXTURE_VERSION:
+            logger.warning(f"⚠️ Fixture con versión {data.get('version')} ignorado: {path}")
+            return None
+        return data
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Adaptador real que además guarda cada respuesta como fixture"""
+
+    def __init__(self, store: FixtureStore, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+
+    def send(self, request, **kwargs):
+        # Sin cabeceras condicionales: se quiere grabar el cuerpo completo
+        for header in ('If-None-Match', 'If-Modified-Since'):
+            request.headers.pop(header, None)
+        response = super().send(request, **kwargs)
+        self.store.save(request.method, request.url, response)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """Transporte local que responde con las fixtures grabadas"""
+
+    def __init__(self, store: FixtureStore):
+        super().__init__()
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+
+    def send(self, request, **kwargs):
+        data = self.store.load(request.method, request.url)
+        if data is None:
+            self.misses += 1
+            raise requests.exceptions.ConnectionError(
+                f"Sin fixture para {request.method} {request.url}", request=request
+            )
+
+        self.hits += 1
+        response = requests.Response()
+        response.status_code = data['status']
+        response.headers = CaseInsensitiveDict(data.get('headers', {}))
+        response._content = base64.b64decode(data['body_b64'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = request.url
+        response.request = request
+        response.reason = 'Replayed'
+        return response
+
+    def close(self):
+        pass
+
+
+def use_fixtures(mode: str, directory: str = DEFAULT_FIXTURES_DIR, client=None):
+    """
+    Activa el modo 'record' o 'replay' en el cliente HTTP compartido.
+
+    Returns:
+        El adaptador montado (ReplayAdapter expone hits/misses).
+    """
+    if client is None:
+        from sources.http_client import get_http_client
+        client = get_http_client()
+    store = FixtureStore(directory)
+
+    if mode == 'record':
+        adapter = RecordingAdapter(store)
+    elif mode == 'replay':
+        adapter = ReplayAdapter(store)
+        # Sin red no tiene sentido espaciar las peticiones por host
+        client.DEFAULT_MIN_INTERVAL = 0.0
+        client.host_min_intervals = {}
+    else:
+        raise ValueError(f"Modo de fixtures no válido: {mode}")
+
+    client.mount('http://', adapter)
+    client.mount('https://', adapter)
+    logger.info(f"📼 Fixtures en modo {mode}: {store.directory}")
+    return adapter
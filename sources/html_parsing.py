@@ -0,0 +1,48 @@
+# sources/html_parsing.py - CAPA DE PARSING HTML PARA LOS SCRAPERS
+import re
+import logging
+from typing import Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+logger = logging.getLogger(__name__)
+
+# lxml es mucho más rápido que 'html.parser'; si no está instalado se usa el
+# parser de la librería estándar para no romper los scrapers
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = 'lxml'
+except ImportError:
+    DEFAULT_PARSER = 'html.parser'
+    logger.warning("⚠️ lxml no disponible, usando html.parser (más lento)")
+
+# Ajustes activos (el benchmark los cambia para medir el modo "antiguo")
+settings = {
+    'parser': DEFAULT_PARSER,
+    'use_strainers': True,
+}
+
+# ========== STRAINERS: SÓLO SE CONSTRUYE EL ÁRBOL DE LO QUE SE USA ==========
+
+# Páginas donde sólo interesan los enlaces
+LINKS = SoupStrainer('a', href=True)
+
+# Páginas de resultados: los resultados son <article> o <div> (con su contenido);
+# se descartan <head>, <script>, <style>, menús, etc.
+RESULT_BLOCKS = SoupStrainer(['article', 'div'])
+
+# ========== MATCHERS PRECOMPILADOS ==========
+
+AYUDA_LINK_RE = re.compile(r'ayuda|subvención|programa|convocatoria')
+BIZKAIA_LINK_RE = re.compile(r'ayuda|subvención|programa')
+AYUDA_TITLE_RE = re.compile(r'ayuda|subvención|beca|programa')
+ISO_DATE_RE = re.compile(r'(\d{4}-\d{2}-\d{2})')
+
+
+def make_soup(content, parse_only: Optional[SoupStrainer] = None) -> BeautifulSoup:
+    """
+    Construye el árbol con el parser configurado, limitado al strainer indicado.
+    """
+    strainer = parse_only if settings['use_strainers'] else None
+    return BeautifulSoup(content, settings['parser'], parse_only=strainer)
+
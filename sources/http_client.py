@@ -0,0 +1,155 @@
+# sources/http_client.py - CLIENTE HTTP COMPARTIDO PARA TODOS LOS SCRAPERS
+import os
+import threading
+import time
+import logging
+import urllib.parse
+from typing import Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+# requests sólo sabe descomprimir brotli si hay un decodificador instalado
+try:
+    import brotli  # noqa: F401
+    _BROTLI_AVAILABLE = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        _BROTLI_AVAILABLE = True
+    except ImportError:
+        _BROTLI_AVAILABLE = False
+
+ACCEPT_ENCODING = 'gzip, deflate, br' if _BROTLI_AVAILABLE else 'gzip, deflate'
+
+
+class HttpClient:
+    """
+    Cliente HTTP de proceso: una única sesión con pools de conexiones por host,
+    keep-alive, negociación gzip/brotli, reintentos con backoff y límite de
+    frecuencia por host.
+    """
+
+    # Intervalo mínimo (segundos) entre peticiones al mismo host
+    DEFAULT_MIN_INTERVAL = 0.5
+    HOST_MIN_INTERVALS = {
+        'export.arxiv.org': 3.0,       # arXiv pide 3 s entre peticiones
+        'patents.google.com': 1.0,
+        'developer.uspto.gov': 1.0,
+    }
+
+    def __init__(self,
+                 pool_connections: int = 20,
+                 pool_maxsize: int = 10,
+                 retries: int = 2,
+                 backoff_factor: float = 1.0):
+        self._session = requests.Session()
+        self._session.headers.update({
+            'Accept-Encoding': ACCEPT_ENCODING,
+            'Connection': 'keep-alive',
+        })
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+        )
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+        self.host_min_intervals = dict(self.HOST_MIN_INTERVALS)
+        # True si se ha montado un adaptador propio (fixtures, tests): el
+        # cliente asíncrono debe entonces pasar por esta sesión
+        self.transport_overridden = False
+        self._rate_lock = threading.Lock()
+        self._next_slot: Dict[str, float] = {}
+
+    def set_rate_limit(self, host: str, min_interval: float):
+        """Configura el intervalo mínimo entre peticiones a un host"""
+        self.host_min_intervals[host] = min_interval
+
+    def mount(self, prefix: str, adapter):
+        """Monta un adaptador alternativo (p.ej. para tests o replays)"""
+        self._session.mount(prefix, adapter)
+        self.transport_overridden = True
+
+    def reserve_slot(self, url: str) -> float:
+        """Reserva el siguiente hueco libre del host y devuelve los segundos que faltan"""
+        host = urllib.parse.urlsplit(url).hostname or ''
+        interval = self.host_min_intervals.get(host, self.DEFAULT_MIN_INTERVAL)
+
+        with self._rate_lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + interval
+
+        return slot - now
+
+    def _wait_for_host(self, url: str):
+        """Reserva el siguiente hueco libre del host y espera hasta él"""
+        delay = self.reserve_slot(url)
+        if delay > 0:
+            time.sleep(delay)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        self._wait_for_host(url)
+        return self._session.request(method, url, **kwargs)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def session(self, headers: Optional[Dict[str, str]] = None, verify=True) -> 'ClientSession':
+        """Vista con cabeceras propias de un scraper sobre los pools compartidos"""
+        return ClientSession(self, headers, verify)
+
+    def close(self):
+        self._session.close()
+
+
+class ClientSession:
+    """
+    Vista ligera del cliente compartido con la misma interfaz que usaban los
+    scrapers (``session.get``, ``session.headers``, ``session.verify``).
+    """
+
+    def __init__(self, client: HttpClient, headers: Optional[Dict[str, str]] = None, verify=True):
+        self.client = client
+        self.headers = dict(headers or {})
+        self.verify = verify
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, **kwargs) -> requests.Response:
+        merged_headers = {**self.headers, **(headers or {})}
+        kwargs.setdefault('verify', self.verify)
+        return self.client.get(url, headers=merged_headers, **kwargs)
+
+
+# ========== INSTANCIA DE PROCESO ==========
+
+_client: Optional[HttpClient] = None
+_client_lock = threading.Lock()
+
+def get_http_client() -> HttpClient:
+    """Devuelve el cliente HTTP compartido (se crea en el primer uso)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+            # SCRAPER_FIXTURES=record|replay permite ejecutar sin red (ver sources/fixtures.py)
+            fixtures_mode = os.environ.get('SCRAPER_FIXTURES')
+            if fixtures_mode:
+                from sources.fixtures import use_fixtures, DEFAULT_FIXTURES_DIR
+                use_fixtures(fixtures_mode, os.environ.get('SCRAPER_FIXTURES_DIR', DEFAULT_FIXTURES_DIR), client=_client)
+        return _client
@@ -0,0 +1,191 @@
+# sources/http_validators.py - PETICIONES CONDICIONALES (ETag / Last-Modified)
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import logging
+import urllib.parse
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class ValidatorStore:
+    """
+    Recuerda por URL el ETag, el Last-Modified, un hash del cuerpo y los items
+    ya extraídos de la última respuesta. Si el servidor responde 304 o el cuerpo
+    no ha cambiado, se reutilizan los items sin volver a parsear la página.
+    """
+
+    def __init__(self, store_file: str = "cache/http_validators.json", max_entries: int = 500):
+        self.store_file = store_file
+        self.max_entries = max_entries
+        self._lock = threading.RLock()
+        self._entries = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            if os.path.exists(self.store_file):
+                with open(self.store_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    return data.get('entries', {})
+        except Exception as e:
+            logger.error(f"Error cargando validadores HTTP: {e}")
+        return {}
+
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.store_file) or '.', exist_ok=True)
+            tmp_file = f"{self.store_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'entries': self._entries}, f, ensure_ascii=False)
+            os.replace(tmp_file, self.store_file)
+        except Exception as e:
+            logger.error(f"Error guardando validadores HTTP: {e}")
+
+    @staticmethod
+    def body_hash(content: bytes) -> str:
+        return hashlib.sha256(content or b'').hexdigest()
+
+    def conditional_headers(self, key: str) -> Dict[str, str]:
+        """Cabeceras If-None-Match / If-Modified-Since para la URL"""
+        with self._lock:
+            entry = self._entries.get(key)
+        if not entry or entry.get('items') is None:
+            return {}
+
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def unchanged_items(self, key: str, response) -> Optional[List[Dict]]:
+        """
+        Devuelve los items cacheados si la respuesta es un 304 o trae exactamente
+        el mismo cuerpo que la última vez; None si hay que parsear.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry or entry.get('items') is None:
+                return None
+
+            if response.status_code == 304:
+                entry['checked_at'] = time.time()
+                return list(entry['items'])
+
+            if response.status_code == 200 and entry.get('body_hash') == self.body_hash(response.content):
+                # Mismo contenido: actualizar validadores por si el servidor los ha cambiado
+                entry['etag'] = response.headers.get('ETag') or entry.get('etag')
+                entry['last_modified'] = response.headers.get('Last-Modified') or entry.get('last_modified')
+                entry['checked_at'] = time.time()
+                return list(entry['items'])
+
+        return None
+
+    def store(self, key: str, response, items: List[Dict]):
+        """Guarda validadores e items extraídos de una respuesta 200"""
+        with self._lock:
+            self._entries[key] = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'body_hash': self.body_hash(response.content),
+                'items': items,
+                'checked_at': time.time(),
+            }
+
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                oldest = sorted(self._entries, key=lambda k: self._entries[k].get('checked_at', 0))
+                for old_key in oldest[:overflow]:
+                    del self._entries[old_key]
+
+            self._save()
+
+
+def request_key(url: str, params: Optional[Dict] = None) -> str:
+    """Clave estable de una petición GET (URL + parámetros ordenados)"""
+    if not params:
+        return url
+    query = urllib.parse.urlencode(sorted((k, str(v)) for k, v in params.items()))
+    return f"{url}?{query}"
+
+
+def fetch_conditional(session,
+                      store: ValidatorStore,
+                      url: str,
+                      parse: Callable,
+                      params: Optional[Dict] = None,
+                      headers: Optional[Dict[str, str]] = None,
+                      **kwargs) -> Tuple[Optional[List[Dict]], object]:
+    """
+    GET condicional con reutilización de items.
+
+    Returns:
+        (items, response). items es None si la respuesta no es 200/304;
+        en ese caso el llamador decide qué hacer con ``response``.
+    """
+    key = request_key(url, params)
+    request_headers = {**(headers or {}), **store.conditional_headers(key)}
+
+    response = session.get(url, params=params, headers=request_headers, **kwargs)
+
+    cached = store.unchanged_items(key, response)
+    if cached is not None:
+        logger.info(f"💾 Sin cambios ({response.status_code}), reutilizando {len(cached)} items: {url}")
+        return cached, response
+
+    if response.status_code != 200:
+        return None, response
+
+    items = parse(response)
+    store.store(key, response, items)
+    return items, response
+
+
+async def fetch_conditional_async(session,
+                                  store: ValidatorStore,
+                                  url: str,
+                                  parse: Callable,
+                                  params: Optional[Dict] = None,
+                                  headers: Optional[Dict[str, str]] = None,
+                                  **kwargs) -> Tuple[Optional[List[Dict]], object]:
+    """
+    Igual que fetch_conditional, con una sesión asíncrona (AsyncClientSession).
+    El hash del cuerpo, el parsing y la escritura del almacén van en un hilo:
+    no bloquean el event loop.
+    """
+    key = request_key(url, params)
+    request_headers = {**(headers or {}), **store.conditional_headers(key)}
+
+    response = await session.get(url, params=params, headers=request_headers, **kwargs)
+
+    cached = await asyncio.to_thread(store.unchanged_items, key, response)
+    if cached is not None:
+        logger.info(f"💾 Sin cambios ({response.status_code}), reutilizando {len(cached)} items: {url}")
+        return cached, response
+
+    if response.status_code != 200:
+        return None, response
+
+    items = await asyncio.to_thread(parse, response)
+    await asyncio.to_thread(store.store, key, response, items)
+    return items, response
+
+
+# ========== INSTANCIA DE PROCESO ==========
+
+_store: Optional[ValidatorStore] = None
+_store_lock = threading.Lock()
+
+def get_validator_store() -> ValidatorStore:
+    """Devuelve el almacén de validadores compartido"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ValidatorStore()
+        return _store
@@ -0,0 +1,41 @@
+# sources/instrumentation.py - TRAZAS Y MÉTRICAS DE LA APLICACIÓN, SI ESTÁ
+"""
+Los scrapers de sources/ registran spans (tracing.py) y métricas (metrics.py)
+de la aplicación, pero tienen que poder usarse sin ella (scripts, pruebas,
+otro proyecto). Si esos módulos no están en sys.path, span/traced no hacen
+nada y las métricas se descartan.
+"""
+from contextlib import nullcontext
+
+try:
+    from metrics import get_metrics
+    from tracing import span, traced
+except ImportError:  # sources/ sin la aplicación
+    class _NullMetric:
+        def inc(self, *args, **kwargs):
+            pass
+
+        def observe(self, *args, **kwargs):
+            pass
+
+        def set(self, *args, **kwargs):
+            pass
+
+    class _NullMetrics:
+        def counter(self, *args, **kwargs) -> _NullMetric:
+            return _NullMetric()
+
+        histogram = gauge = counter
+
+    _null_metrics = _NullMetrics()
+
+    def get_metrics() -> _NullMetrics:
+        return _null_metrics
+
+    def span(name: str, **attributes):
+        return nullcontext()
+
+    def traced(name=None):
+        return lambda func: func
+
+__all__ = ['get_metrics', 'span', 'traced']
@@ -1,31 +1,65 @@
+import asyncio
+import logging
 from datetime import datetime
-import requests, xml.etree.ElementTree as ET
+import xml.etree.ElementTree as ET
+
+from sources.http_client import get_http_client
+from sources.async_http import get_async_http_client
+from sources.source_health import timed_fetch, timed_fetch_async
+
+logger = logging.getLogger(__name__)
+
+ARXIV_API_URL = "http://export.arxiv.org/api/query"
+ARXIV_NAMESPACE = {"atom": "http://www.w3.org/2005/Atom", "arxiv": "http://arxiv.org/schemas/atom"}
 
 def check_papers(keywords, categories, since_date, max_results=5):
     """Busca papers en arXiv y devuelve notificaciones"""
     notifications = []
-    base_url = "http://export.arxiv.org/api/query"
-    namespace = {"atom": "http://www.w3.org/2005/Atom", "arxiv": "http://arxiv.org/schemas/atom"}
+    client = get_http_client()
 
     for keyword in keywords[:3]:
-        params = {"search_query": f"all:{keyword}", "start": 0, "max_results": max_results, "sortBy": "submittedDate", "sortOrder": "descending"}
         try:
-            response = requests.get(base_url, params=params, timeout=15)
+            response = timed_fetch('arxiv', lambda: client.get(ARXIV_API_URL, params=_arxiv_params(keyword, max_results), timeout=15))
             response.raise_for_status()
-            root = ET.fromstring(response.content)
-            for entry in root.findall("atom:entry", namespace):
-                title = entry.find("atom:title", namespace).text.strip()
-                published = entry.find("atom:published", namespace).text.strip()
-                published_date = datetime.fromisoformat(published.replace("Z", "+00:00")).replace(tzinfo=None)
-                if published_date > since_date:
-                    notifications.append({
-                        "type": "papers",
-                        "title": f"📚 Nuevo paper: {keyword}",
-                        "message": title[:150] + "...",
-                        "data": {"title": title, "published": published}
-                    })
+            notifications.extend(_parse_arxiv(response.content, keyword, since_date))
         except Exception as e:
-            print(f"❌ Error buscando papers: {e}")
+            logger.error("❌ Error buscando papers: %s", e)
             continue
 
     return notifications
+
+async def check_papers_async(keywords, categories, since_date, max_results=5):
+    """Variante asíncrona de check_papers (el límite de 3 s de arXiv se mantiene)"""
+    client = get_async_http_client()
+
+    async def search(keyword):
+        try:
+            response = await timed_fetch_async('arxiv', lambda: client.get(ARXIV_API_URL, params=_arxiv_params(keyword, max_results), timeout=15))
+            response.raise_for_status()
+            return await asyncio.to_thread(_parse_arxiv, response.content, keyword, since_date)
+        except Exception as e:
+            logger.error("❌ Error buscando papers: %s", e)
+            return []
+
+    results = await asyncio.gather(*(search(keyword) for keyword in keywords[:3]))
+    return [notification for notifications in results for notification in notifications]
+
+def _arxiv_params(keyword, max_results):
+    return {"search_query": f"all:{keyword}", "start": 0, "max_results": max_results, "sortBy": "submittedDate", "sortOrder": "descending"}
+
+def _parse_arxiv(content, keyword, since_date):
+    """Notificaciones de los papers del feed Atom publicados después de since_date"""
+    notifications = []
+    root = ET.fromstring(content)
+    for entry in root.findall("atom:entry", ARXIV_NAMESPACE):
+        title = entry.find("atom:title", ARXIV_NAMESPACE).text.strip()
+        published = entry.find("atom:published", ARXIV_NAMESPACE).text.strip()
+        published_date = datetime.fromisoformat(published.replace("Z", "+00:00")).replace(tzinfo=None)
+        if published_date > since_date:
+            notifications.append({
+                "type": "papers",
+                "title": f"📚 Nuevo paper: {keyword}",
+                "message": title[:150] + "...",
+                "data": {"title": title, "published": published}
+            })
+    return notifications
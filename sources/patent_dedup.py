@@ -0,0 +1,145 @@
+# sources/patent_dedup.py - DEDUPLICACIÓN DE PATENTES ENTRE OFICINAS
+"""
+Agrupa las patentes que describen la misma invención aunque vengan de
+fuentes distintas (Google Patents, USPTO, Espacenet, WIPO, OEPM).
+
+Dos registros son la misma invención si comparten alguna de estas claves:
+  1. identificador de familia (family_id)
+  2. número de publicación normalizado, sin código de tipo (US1234567B2 → US1234567)
+  3. número de solicitud normalizado
+  4. hash del título normalizado: si no hay número de publicación ni de
+     familia, o si el título es lo bastante específico (5+ palabras) para
+     unir, p.ej., un registro de USPTO (nº de solicitud) con el de Google
+     Patents (nº de publicación)
+"""
+import hashlib
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+# Número de publicación: país + dígitos + código de tipo opcional (A1, B2, U...)
+_PUBLICATION_RE = re.compile(r'^([A-Z]{2})(\d{4,})([A-Z]\d?)?$')
+# Número de publicación dentro de una URL (p.ej. patents.google.com/patent/US11234567B2/en)
+_URL_PUBLICATION_RE = re.compile(r'/patent/([A-Z]{2}\d{4,}[A-Z]?\d?)(?:/|$)', re.IGNORECASE)
+_NON_ALNUM_RE = re.compile(r'[^A-Z0-9]')
+_TITLE_CLEAN_RE = re.compile(r'[^a-z0-9]+')
+SPECIFIC_TITLE_WORDS = 5
+
+# Preferencia al fusionar: la fuente con datos más completos se queda como principal
+SOURCE_PRIORITY = ['Google Patents', 'USPTO', 'Espacenet (EPO)', 'WIPO PatentScope', 'OEPM España']
+
+
+def normalize_publication_number(number: Optional[str]) -> Optional[str]:
+    """'US 2023/0123456 A1' → 'US20230123456' (sin código de tipo)"""
+    if not number:
+        return None
+    compact = _NON_ALNUM_RE.sub('', str(number).upper())
+    match = _PUBLICATION_RE.match(compact)
+    if not match:
+        return None
+    return f"{match.group(1)}{match.group(2).lstrip('0') or '0'}"
+
+
+def publication_number_from_url(url: Optional[str]) -> Optional[str]:
+    """Número de publicación normalizado a partir de una URL de patente"""
+    match = _URL_PUBLICATION_RE.search(url or '')
+    return normalize_publication_number(match.group(1)) if match else None
+
+
+def normalize_title(title: Optional[str]) -> str:
+    text = unicodedata.normalize('NFKD', (title or '').lower())
+    text = ''.join(c for c in text if not unicodedata.combining(c))
+    return _TITLE_CLEAN_RE.sub(' ', text).strip()
+
+
+def patent_keys(patent: Dict) -> List[str]:
+    """Claves de identidad de un registro, de la más fuerte a la más débil"""
+    keys = []
+
+    if patent.get('family_id'):
+        keys.append(f"family:{patent['family_id']}")
+
+    publication = (normalize_publication_number(patent.get('publication_number'))
+                   or publication_number_from_url(patent.get('url')))
+    if publication:
+        keys.append(f"pub:{publication}")
+
+    application = patent.get('application_number')
+    if application:
+        keys.append(f"app:{_NON_ALNUM_RE.sub('', str(application).upper())}")
+
+    if patent.get('status') == 'search_link':
+        # Enlaces de búsqueda: sólo son duplicados si apuntan a la misma URL
+        keys.append(f"url:{patent.get('url', '')}")
+    else:
+        title = normalize_title(patent.get('title'))
+        has_number = any(key.startswith(('family:', 'pub:')) for key in keys)
+        if title and (not has_number or len(title.split()) >= SPECIFIC_TITLE_WORDS):
+            keys.append(f"title:{hashlib.sha1(title.encode()).hexdigest()[:16]}")
+
+    return keys
+
+
+def _richness(patent: Dict) -> tuple:
+    """Orden para elegir el registro principal de un grupo"""
+    source = patent.get('source', '')
+    priority = SOURCE_PRIORITY.index(source) if source in SOURCE_PRIORITY else len(SOURCE_PRIORITY)
+    return (
+        patent.get('status') != 'search_link',
+        len(patent.get('abstract') or ''),
+        -priority,
+    )
+
+
+def merge_group(group: List[Dict]) -> Dict:
+    """Fusiona los registros de una misma invención en uno (copia)"""
+    primary = max(group, key=_richness)
+    merged = dict(primary)
+
+    # Completar campos vacíos con los de las demás fuentes
+    for patent in group:
+        for field, value in patent.items():
+            if value and not merged.get(field):
+                merged[field] = value
+
+    sources = []
+    urls = {}
+    for patent in group:
+        source = patent.get('source', '')
+        if source and source not in sources:
+            sources.append(source)
+            urls[source] = patent.get('url', '')
+    merged['sources'] = sources
+    merged['urls'] = urls
+    merged['duplicates'] = len(group) - 1
+    return merged
+
+
+def deduplicate_patents(patents: List[Dict]) -> List[Dict]:
+    """
+    Une los registros que comparten alguna clave (union-find sobre claves) y
+    devuelve una patente por invención, en el orden de primera aparición.
+    """
+    parent = list(range(len(patents)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    owner: Dict[str, int] = {}
+    for index, patent in enumerate(patents):
+        for key in patent_keys(patent):
+            if key in owner:
+                a, b = find(owner[key]), find(index)
+                if a != b:
+                    parent[max(a, b)] = min(a, b)
+            else:
+                owner[key] = index
+
+    groups: Dict[int, List[Dict]] = {}
+    for index, patent in enumerate(patents):
+        groups.setdefault(find(index), []).append(patent)
+
+    return [merge_group(group) if len(group) > 1 else group[0] for _, group in sorted(groups.items())]
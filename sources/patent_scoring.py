@@ -0,0 +1,126 @@
+# sources/patent_scoring.py - RELEVANCIA DE PATENTES SEGÚN LOS INTERESES DEL USUARIO
+"""
+Puntuación de patentes con pesos precalculados.
+
+Los términos (keywords del usuario, keywords de sensórica cuántica, términos
+genéricos y códigos IPC) y sus pesos se calculan una vez por conjunto de
+keywords. Igual que la antigua calculate_relevance, un término cuenta si
+aparece como subcadena del texto en minúsculas ('sensor' en 'nanosensor'), y
+una sola vez aunque aparezca varias veces.
+"""
+import heapq
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence
+
+# Pesos por origen del término
+USER_KEYWORD_WEIGHT = 3.0
+USER_WORD_WEIGHT = 0.5
+QUANTUM_KEYWORD_WEIGHT = 2.0
+GENERIC_TERM_WEIGHT = 1.0
+IPC_CODE_WEIGHT = 1.5
+
+# Con este total la relevancia vale 1.0
+SCORE_NORMALIZATION = 10.0
+
+# Términos de la antigua calculate_relevance
+DEFAULT_HIGH_TERMS = ['quantum sensor', 'pfas', 'water quality', 'quantum dot']
+DEFAULT_MEDIUM_TERMS = ['sensor', 'detector', 'measurement', 'quantum']
+
+# Palabras que no aportan nada como término suelto
+_STOPWORDS = {'and', 'or', 'the', 'for', 'of', 'in', 'on', 'with', 'de', 'la', 'el', 'y', 'para', 'en', 'del'}
+
+
+class RelevanceScorer:
+    """
+    Términos ponderados para un conjunto de keywords.
+
+    Cada término se busca con ``in`` (búsqueda de subcadenas en C): con unas
+    decenas de términos es más rápido que una expresión regular que tenga
+    que probar todas las alternativas en cada posición, y los términos que
+    se solapan ('quantum sensor', 'quantum', 'sensor') cuentan todos.
+    """
+
+    def __init__(self,
+                 keywords: Sequence[str] = (),
+                 ipc_codes: Sequence[str] = (),
+                 quantum_keywords: Sequence[str] = ()):
+        weights: Dict[str, float] = {}
+
+        def add(term: str, weight: float):
+            term = ' '.join(term.lower().split())
+            if term and term not in _STOPWORDS:
+                weights[term] = max(weights.get(term, 0.0), weight)
+
+        for term in DEFAULT_MEDIUM_TERMS:
+            add(term, GENERIC_TERM_WEIGHT)
+        for term in DEFAULT_HIGH_TERMS:
+            add(term, QUANTUM_KEYWORD_WEIGHT)
+        for term in quantum_keywords:
+            add(term, QUANTUM_KEYWORD_WEIGHT)
+        for keyword in keywords:
+            add(keyword, USER_KEYWORD_WEIGHT)
+            for word in keyword.split():
+                if len(word) > 2:
+                    add(word, USER_WORD_WEIGHT)
+
+        self.weights = weights
+        self.terms = tuple(weights.items())
+        self.ipc_codes = {code.upper(): IPC_CODE_WEIGHT for code in ipc_codes}
+
+        ipc_alternation = '|'.join(re.escape(code) for code in sorted(self.ipc_codes, key=len, reverse=True))
+        self.ipc_pattern = re.compile(rf'\b({ipc_alternation})', re.IGNORECASE) if self.ipc_codes else None
+
+    def raw_score(self, text: str, classification: str = '') -> float:
+        score = 0.0
+        if text:
+            text_lower = text.lower()
+            score = sum(weight for term, weight in self.terms if term in text_lower)
+
+        if self.ipc_pattern and classification:
+            codes = {code.upper() for code in self.ipc_pattern.findall(classification)}
+            score += sum(self.ipc_codes[code] for code in codes)
+        return score
+
+    def score(self, text: str, classification: str = '') -> float:
+        """Relevancia normalizada entre 0 y 1"""
+        return min(self.raw_score(text, classification) / SCORE_NORMALIZATION, 1.0)
+
+    def score_patent(self, patent: Dict) -> float:
+        text = f"{patent.get('title', '')} {patent.get('abstract', '')}"
+        return self.score(text, patent.get('classification') or '')
+
+    def rank(self, patents: Iterable[Dict], k: Optional[int] = None) -> List[Dict]:
+        """
+        Puntúa las patentes (copias, no modifica las originales, que pueden
+        venir de la cache) y devuelve las k mejores ordenadas; todas si k es None.
+        """
+        scored = [dict(patent, relevance_score=self.score_patent(patent)) for patent in patents]
+        if k is None:
+            return sorted(scored, key=lambda p: p['relevance_score'], reverse=True)
+        return heapq.nlargest(k, scored, key=lambda p: p['relevance_score'])
+
+
+# ========== SCORERS PRECALCULADOS POR CONJUNTO DE KEYWORDS ==========
+
+_scorers: Dict[tuple, RelevanceScorer] = {}
+_scorers_lock = threading.Lock()
+_MAX_SCORERS = 64
+
+def get_scorer(keywords: Sequence[str] = (),
+               ipc_codes: Sequence[str] = (),
+               quantum_keywords: Sequence[str] = ()) -> RelevanceScorer:
+    """Devuelve (y reutiliza) el scorer compilado para estas keywords"""
+    key = (
+        tuple(sorted(k.lower() for k in keywords)),
+        tuple(ipc_codes),
+        tuple(quantum_keywords),
+    )
+    with _scorers_lock:
+        scorer = _scorers.get(key)
+        if scorer is None:
+            if len(_scorers) >= _MAX_SCORERS:
+                _scorers.pop(next(iter(_scorers)))
+            scorer = RelevanceScorer(keywords, ipc_codes, quantum_keywords)
+            _scorers[key] = scorer
+        return scorer
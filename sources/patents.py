@@ -1,34 +1,49 @@
 # sources/patents.py - SISTEMA COMPLETO DE BÚSQUEDA DE PATENTES
-import requests
+import asyncio
 from datetime import datetime, timedelta
 import json
-import time
-import re
-from typing import List, Dict, Optional
+import hashlib
+import threading
+from contextvars import ContextVar
+from typing import Callable, List, Dict, Optional
 import logging
-from bs4 import BeautifulSoup
 import urllib.parse
 
+from sources.http_client import get_http_client
+from sources.async_http import get_async_http_client
+from sources.http_validators import fetch_conditional, fetch_conditional_async, get_validator_store
+from sources.html_parsing import make_soup, RESULT_BLOCKS, ISO_DATE_RE
+from sources.patents_cache import PatentCache
+from sources.patent_scoring import get_scorer
+from sources.source_health import timed_fetch, timed_fetch_async
+from sources.patent_dedup import deduplicate_patents, normalize_publication_number, publication_number_from_url
+from sources.instrumentation import traced
+
 # Configurar logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# IDs vistos en la búsqueda en curso. Un ContextVar aísla tanto hilos como
+# tareas asyncio: el buscador se comparte entre búsquedas concurrentes.
+_seen_patents: ContextVar[Optional[set]] = ContextVar('seen_patents', default=None)
+
 class PatentSearcher:
     """
     Buscador de patentes multi-fuente con APIs funcionales
     """
     
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
+    def __init__(self, cache_file: str = "cache/patents_cache.json", validators=None):
+        self.session = get_http_client().session(headers={
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
             'Accept': 'application/json, text/html, */*',
             'Accept-Language': 'en-US,en;q=0.9,es;q=0.8'
         })
+        self.async_session = get_async_http_client().session(headers=self.session.headers)
         
-        # Cache para evitar duplicados
-        self.seen_patents = set()
-        self.cache_file = "cache/patents_cache.json"
+        self.cache_file = cache_file
+        self.cache = PatentCache(self.cache_file)
+        
+        # Validadores HTTP para no re-descargar ni re-parsear páginas sin cambios
+        self.validators = validators if validators is not None else get_validator_store()
         
         # APIs y endpoints funcionales
         self.apis = {
@@ -100,127 +115,180 @@ class PatentSearcher:
             'G01T',  # Measurement of nuclear or X-radiation
         ]
     
+    @property
+    def seen_patents(self) -> set:
+        """IDs vistos en la búsqueda en curso (del hilo o tarea actual)"""
+        seen = _seen_patents.get()
+        if seen is None:
+            seen = set()
+            _seen_patents.set(seen)
+        return seen
+    
+    def reset_seen_patents(self):
+        """Empieza un registro de duplicados vacío para el hilo o tarea actual"""
+        _seen_patents.set(set())
+    
     # ========== GOOGLE PATENTS - MÉTODO PRINCIPAL ==========
     
     def search_google_patents(self, keywords: List[str], limit: int = 10) -> List[Dict]:
         """
         Busca en Google Patents (método más confiable)
         """
-        patents = []
-        
         try:
             logger.info(f"🔍 Buscando en Google Patents: {', '.join(keywords)}")
+            search_url, params = self._google_patents_request(keywords, limit)
             
-            # Construir query
-            query = ' OR '.join([f'("{kw}")' for kw in keywords])
-            
-            # Parámetros de búsqueda
-            params = {
-                'q': query,
-                'oq': query,
-                'scholar': '',
-                'before': '',
-                'after': (datetime.now() - timedelta(days=365)).strftime('%Y%m%d'),
-                'type': 'PATENT',
-                'num': limit,
-                'sort': 'new'  # Ordenar por más recientes
-            }
+            # Realizar búsqueda (condicional: si la página no cambia no se re-parsea)
+            results, response = fetch_conditional(
+                self.session,
+                self.validators,
+                search_url,
+                self._parse_google_patents,
+                params=params,
+                timeout=30
+            )
+            return self._google_patents_select(keywords, limit, results)
             
-            # URL de búsqueda
-            search_url = f"{self.apis['google_patents']['base_url']}/search"
+        except Exception as e:
+            logger.error(f"❌ Error en Google Patents: {e}")
+            return []
+    
+    async def search_google_patents_async(self, keywords: List[str], limit: int = 10) -> List[Dict]:
+        """Variante asíncrona de search_google_patents"""
+        try:
+            logger.info(f"🔍 Buscando en Google Patents (async): {', '.join(keywords)}")
+            search_url, params = self._google_patents_request(keywords, limit)
             
-            # Realizar búsqueda
-            response = self.session.get(search_url, params=params, timeout=30)
+            results, response = await fetch_conditional_async(
+                self.async_session,
+                self.validators,
+                search_url,
+                self._parse_google_patents,
+                params=params,
+                timeout=30
+            )
+            return self._google_patents_select(keywords, limit, results)
             
-            if response.status_code == 200:
-                soup = BeautifulSoup(response.content, 'html.parser')
-                
-                # Buscar resultados
-                results = soup.find_all('article', class_='result') or \
-                         soup.find_all('div', class_='search-result-item')
+        except Exception as e:
+            logger.error(f"❌ Error en Google Patents: {e}")
+            return []
+    
+    def _google_patents_request(self, keywords: List[str], limit: int) -> tuple:
+        """URL y parámetros de la búsqueda en Google Patents"""
+        # Construir query
+        query = ' OR '.join([f'("{kw}")' for kw in keywords])
+        
+        # Parámetros de búsqueda
+        params = {
+            'q': query,
+            'oq': query,
+            'scholar': '',
+            'before': '',
+            'after': (datetime.now() - timedelta(days=365)).strftime('%Y%m%d'),
+            'type': 'PATENT',
+            'num': limit,
+            'sort': 'new'  # Ordenar por más recientes
+        }
+        
+        # URL de búsqueda
+        search_url = f"{self.apis['google_patents']['base_url']}/search"
+        return search_url, params
+    
+    def _google_patents_select(self, keywords: List[str], limit: int, results: Optional[List[Dict]]) -> List[Dict]:
+        """Patentes no vistas de la respuesta (o enlaces de búsqueda si no hay resultados)"""
+        patents = []
+        if results is None:
+            return patents
+        
+        # Si no hay resultados con scraping, generar URLs directas
+        if not results:
+            # Generar enlaces directos de búsqueda
+            for kw in keywords[:5]:
+                patent_url = f"https://patents.google.com/?q={urllib.parse.quote(kw)}&oq={urllib.parse.quote(kw)}&sort=new"
                 
-                # Si no hay resultados con scraping, generar URLs directas
-                if not results:
-                    # Generar enlaces directos de búsqueda
-                    for kw in keywords[:5]:
-                        patent_url = f"https://patents.google.com/?q={urllib.parse.quote(kw)}&oq={urllib.parse.quote(kw)}&sort=new"
-                        
-                        patent_id = f"google_{kw.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}"
-                        
-                        if patent_id not in self.seen_patents:
-                            patent = {
-                                'id': patent_id,
-                                'title': f"Búsqueda de patentes: {kw}",
-                                'abstract': f"Búsqueda en Google Patents para '{kw}'. Click para ver resultados actualizados.",
-                                'url': patent_url,
-                                'publication_date': datetime.now().isoformat(),
-                                'inventors': [],
-                                'applicant': 'Multiple',
-                                'classification': self.get_relevant_classification(kw),
-                                'source': 'Google Patents',
-                                'status': 'search_link',
-                                'relevance_score': self.calculate_relevance(kw)
-                            }
-                            
-                            patents.append(patent)
-                            self.seen_patents.add(patent_id)
+                patent_id = f"google_{kw.replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}"
                 
-                # Procesar resultados encontrados
-                for result in results[:limit]:
-                    try:
-                        title_elem = result.find('h3') or result.find('a', class_='result-title')
-                        if not title_elem:
-                            continue
-                        
-                        title = title_elem.get_text().strip()
-                        
-                        # Extraer URL
-                        link_elem = result.find('a', href=True)
-                        url = link_elem['href'] if link_elem else ''
-                        if url and not url.startswith('http'):
-                            url = f"https://patents.google.com{url}"
-                        
-                        # Extraer abstract
-                        abstract_elem = result.find('div', class_='abstract') or \
-                                      result.find('span', class_='description')
-                        abstract = abstract_elem.get_text().strip() if abstract_elem else ''
-                        
-                        # Extraer metadata
-                        metadata = result.find('div', class_='metadata')
-                        pub_date = 'N/A'
-                        if metadata:
-                            date_match = re.search(r'(\d{4}-\d{2}-\d{2})', metadata.get_text())
-                            if date_match:
-                                pub_date = date_match.group(1)
-                        
-                        patent_id = f"google_{hash(title)}"
-                        
-                        if patent_id not in self.seen_patents:
-                            patent = {
-                                'id': patent_id,
-                                'title': title[:200],
-                                'abstract': abstract[:500],
-                                'url': url,
-                                'publication_date': pub_date,
-                                'inventors': self.extract_inventors(result),
-                                'applicant': self.extract_applicant(result),
-                                'classification': self.extract_classification(result),
-                                'source': 'Google Patents',
-                                'status': 'published',
-                                'relevance_score': self.calculate_relevance(title + ' ' + abstract)
-                            }
-                            
-                            patents.append(patent)
-                            self.seen_patents.add(patent_id)
+                if patent_id not in self.seen_patents:
+                    patent = {
+                        'id': patent_id,
+                        'title': f"Búsqueda de patentes: {kw}",
+                        'abstract': f"Búsqueda en Google Patents para '{kw}'. Click para ver resultados actualizados.",
+                        'url': patent_url,
+                        'publication_date': datetime.now().isoformat(),
+                        'inventors': [],
+                        'applicant': 'Multiple',
+                        'classification': self.get_relevant_classification(kw),
+                        'source': 'Google Patents',
+                        'status': 'search_link',
+                        'relevance_score': self.calculate_relevance(kw)
+                    }
                     
-                    except Exception as e:
-                        logger.debug(f"Error procesando resultado: {e}")
-                        continue
+                    patents.append(patent)
+                    self.seen_patents.add(patent_id)
+        
+        # Procesar resultados encontrados
+        for patent in results[:limit]:
+            if patent['id'] not in self.seen_patents:
+                patents.append(patent)
+                self.seen_patents.add(patent['id'])
+        
+        logger.info(f"✅ Google Patents: {len(patents)} patentes encontradas")
+        return patents
+    
+    def _parse_google_patents(self, response) -> List[Dict]:
+        """Extrae las patentes de la página de resultados de Google Patents"""
+        patents = []
+        soup = make_soup(response.content, parse_only=RESULT_BLOCKS)
+        
+        # Buscar resultados
+        results = soup.find_all('article', class_='result') or \
+                 soup.find_all('div', class_='search-result-item')
+        
+        for result in results:
+            try:
+                title_elem = result.find('h3') or result.find('a', class_='result-title')
+                if not title_elem:
+                    continue
                 
-                logger.info(f"✅ Google Patents: {len(patents)} patentes encontradas")
+                title = title_elem.get_text().strip()
+                
+                # Extraer URL
+                link_elem = result.find('a', href=True)
+                url = link_elem['href'] if link_elem else ''
+                if url and not url.startswith('http'):
+                    url = f"https://patents.google.com{url}"
+                
+                # Extraer abstract
+                abstract_elem = result.find('div', class_='abstract') or \
+                              result.find('span', class_='description')
+                abstract = abstract_elem.get_text().strip() if abstract_elem else ''
+                
+                # Extraer metadata
+                metadata = result.find('div', class_='metadata')
+                pub_date = 'N/A'
+                if metadata:
+                    date_match = ISO_DATE_RE.search(metadata.get_text())
+                    if date_match:
+                        pub_date = date_match.group(1)
+                
+                patents.append({
+                    'id': f"google_{hashlib.md5(title.encode()).hexdigest()[:16]}",
+                    'title': title[:200],
+                    'abstract': abstract[:500],
+                    'url': url,
+                    'publication_number': publication_number_from_url(url),
+                    'publication_date': pub_date,
+                    'inventors': self.extract_inventors(result),
+                    'applicant': self.extract_applicant(result),
+                    'classification': self.extract_classification(result),
+                    'source': 'Google Patents',
+                    'status': 'published',
+                    'relevance_score': self.calculate_relevance(title + ' ' + abstract)
+                })
             
-        except Exception as e:
-            logger.error(f"❌ Error en Google Patents: {e}")
+            except Exception as e:
+                logger.debug(f"Error procesando resultado: {e}")
+                continue
         
         return patents
     
@@ -230,87 +298,136 @@ class PatentSearcher:
         """
         Busca en USPTO usando su API
         """
-        patents = []
-        
         try:
             logger.info(f"🔍 Buscando en USPTO: {', '.join(keywords)}")
+            api_url, params, headers = self._uspto_request(keywords, limit)
             
-            # Construir query para USPTO
-            query_text = ' OR '.join(keywords)
-            
-            # API endpoint
-            api_url = "https://developer.uspto.gov/ibd-api/v1/patent/application"
-            
-            # Parámetros
-            params = {
-                'searchText': query_text,
-                'start': 0,
-                'rows': limit,
-                'largeTextSearchFlag': 'Y',
-                'sortBy': 'applFilingDate',
-                'sortOrder': 'desc'
-            }
-            
-            # Headers específicos para USPTO
-            headers = {
-                'Accept': 'application/json',
-                'Content-Type': 'application/json'
-            }
+            items, response = fetch_conditional(
+                self.session,
+                self.validators,
+                api_url,
+                self._parse_uspto,
+                params=params,
+                headers=headers,
+                timeout=30
+            )
+            return self._uspto_select(keywords, limit, items)
+        
+        except Exception as e:
+            logger.error(f"❌ Error en USPTO: {e}")
+            return []
+    
+    async def search_uspto_async(self, keywords: List[str], limit: int = 10) -> List[Dict]:
+        """Variante asíncrona de search_uspto"""
+        try:
+            logger.info(f"🔍 Buscando en USPTO (async): {', '.join(keywords)}")
+            api_url, params, headers = self._uspto_request(keywords, limit)
             
-            response = self.session.get(api_url, params=params, headers=headers, timeout=30)
+            items, response = await fetch_conditional_async(
+                self.async_session,
+                self.validators,
+                api_url,
+                self._parse_uspto,
+                params=params,
+                headers=headers,
+                timeout=30
+            )
+            return self._uspto_select(keywords, limit, items)
+        
+        except Exception as e:
+            logger.error(f"❌ Error en USPTO: {e}")
+            return []
+    
+    def _uspto_request(self, keywords: List[str], limit: int) -> tuple:
+        """URL, parámetros y cabeceras de la consulta a la API de USPTO"""
+        # Construir query para USPTO
+        query_text = ' OR '.join(keywords)
+        
+        # API endpoint
+        api_url = "https://developer.uspto.gov/ibd-api/v1/patent/application"
+        
+        # Parámetros
+        params = {
+            'searchText': query_text,
+            'start': 0,
+            'rows': limit,
+            'largeTextSearchFlag': 'Y',
+            'sortBy': 'applFilingDate',
+            'sortOrder': 'desc'
+        }
+        
+        # Headers específicos para USPTO
+        headers = {
+            'Accept': 'application/json',
+            'Content-Type': 'application/json'
+        }
+        return api_url, params, headers
+    
+    def _uspto_select(self, keywords: List[str], limit: int, items: Optional[List[Dict]]) -> List[Dict]:
+        """Patentes no vistas de la respuesta (o enlaces de búsqueda si la API falla)"""
+        patents = []
+        
+        if items is not None:
+            for patent in items[:limit]:
+                if patent['id'] not in self.seen_patents:
+                    patents.append(patent)
+                    self.seen_patents.add(patent['id'])
             
-            if response.status_code == 200:
-                data = response.json()
+            logger.info(f"✅ USPTO: {len(patents)} patentes encontradas")
+        
+        else:
+            # Si la API falla, generar enlaces de búsqueda
+            logger.warning(f"⚠️ USPTO API no disponible, generando enlaces...")
+            for kw in keywords[:3]:
+                search_url = f"https://ppubs.uspto.gov/pubwebapp/static/pages/landing.html?q={urllib.parse.quote(kw)}"
                 
-                # Procesar respuesta
-                if 'response' in data and 'docs' in data['response']:
-                    for doc in data['response']['docs'][:limit]:
-                        patent_id = doc.get('patentApplicationNumber', '')
-                        
-                        if patent_id and patent_id not in self.seen_patents:
-                            patent = {
-                                'id': f"uspto_{patent_id}",
-                                'title': doc.get('inventionTitle', '')[:200],
-                                'abstract': doc.get('abstractText', [''])[0][:500] if doc.get('abstractText') else '',
-                                'url': f"https://ppubs.uspto.gov/dirsearch-public/print/downloadPdf/{patent_id}",
-                                'publication_date': doc.get('publicationDate', ''),
-                                'filing_date': doc.get('filingDate', ''),
-                                'inventors': doc.get('inventorNameArrayText', []),
-                                'applicant': doc.get('applicantName', [''])[0] if doc.get('applicantName') else '',
-                                'classification': doc.get('mainCPCSymbolText', ''),
-                                'source': 'USPTO',
-                                'status': doc.get('applicationStatusDescription', ''),
-                                'relevance_score': self.calculate_relevance(
-                                    doc.get('inventionTitle', '') + ' ' + 
-                                    (doc.get('abstractText', [''])[0] if doc.get('abstractText') else '')
-                                )
-                            }
-                            
-                            patents.append(patent)
-                            self.seen_patents.add(f"uspto_{patent_id}")
+                patent = {
+                    'id': f"uspto_search_{kw.replace(' ', '_')}",
+                    'title': f"USPTO - Búsqueda: {kw}",
+                    'abstract': f"Búsqueda en USPTO para '{kw}'",
+                    'url': search_url,
+                    'publication_date': datetime.now().isoformat(),
+                    'source': 'USPTO',
+                    'status': 'search_link'
+                }
                 
-                logger.info(f"✅ USPTO: {len(patents)} patentes encontradas")
-            
-            else:
-                # Si la API falla, generar enlaces de búsqueda
-                logger.warning(f"⚠️ USPTO API no disponible, generando enlaces...")
-                for kw in keywords[:3]:
-                    search_url = f"https://ppubs.uspto.gov/pubwebapp/static/pages/landing.html?q={urllib.parse.quote(kw)}"
-                    
-                    patent = {
-                        'id': f"uspto_search_{kw.replace(' ', '_')}",
-                        'title': f"USPTO - Búsqueda: {kw}",
-                        'abstract': f"Búsqueda en USPTO para '{kw}'",
-                        'url': search_url,
-                        'publication_date': datetime.now().isoformat(),
-                        'source': 'USPTO',
-                        'status': 'search_link'
-                    }
-                    
-                    patents.append(patent)
+                patents.append(patent)
         
-        except Exception as e:
-            logger.error(f"❌ Error en USPTO: {e}")
+        return patents
+    
+    def _parse_uspto(self, response) -> List[Dict]:
+        """Convierte la respuesta JSON de la API de USPTO en patentes"""
+        patents = []
+        data = response.json()
+        
+        # Procesar respuesta
+        if 'response' in data and 'docs' in data['response']:
+            for doc in data['response']['docs']:
+                patent_id = doc.get('patentApplicationNumber', '')
+                if not patent_id:
+                    continue
+                
+                patents.append({
+                    'id': f"uspto_{patent_id}",
+                    'title': doc.get('inventionTitle', '')[:200],
+                    'abstract': doc.get('abstractText', [''])[0][:500] if doc.get('abstractText') else '',
+                    'url': f"https://ppubs.uspto.gov/dirsearch-public/print/downloadPdf/{patent_id}",
+                    'application_number': patent_id,
+                    'publication_number': normalize_publication_number(
+                        doc.get('patentNumber') or doc.get('publicationNumber')
+                    ),
+                    'publication_date': doc.get('publicationDate', ''),
+                    'filing_date': doc.get('filingDate', ''),
+                    'inventors': doc.get('inventorNameArrayText', []),
+                    'applicant': doc.get('applicantName', [''])[0] if doc.get('applicantName') else '',
+                    'classification': doc.get('mainCPCSymbolText', ''),
+                    'source': 'USPTO',
+                    'status': doc.get('applicationStatusDescription', ''),
+                    'relevance_score': self.calculate_relevance(
+                        doc.get('inventionTitle', '') + ' ' + 
+                        (doc.get('abstractText', [''])[0] if doc.get('abstractText') else '')
+                    )
+                })
         
         return patents
     
@@ -440,28 +557,10 @@ class PatentSearcher:
     
     def calculate_relevance(self, text: str) -> float:
         """
-        Calcula relevancia para sensórica cuántica
+        Relevancia genérica para sensórica cuántica (antes de conocer las
+        keywords del usuario; search_all_sources vuelve a puntuar con ellas)
         """
-        if not text:
-            return 0.0
-        
-        text_lower = text.lower()
-        score = 0.0
-        
-        # Keywords de alta relevancia
-        high_relevance = ['quantum sensor', 'pfas', 'water quality', 'quantum dot']
-        medium_relevance = ['sensor', 'detector', 'measurement', 'quantum']
-        
-        for kw in high_relevance:
-            if kw in text_lower:
-                score += 2.0
-        
-        for kw in medium_relevance:
-            if kw in text_lower:
-                score += 1.0
-        
-        # Normalizar entre 0 y 1
-        return min(score / 10.0, 1.0)
+        return get_scorer().score(text)
     
     def get_relevant_classification(self, keyword: str) -> str:
         """
@@ -517,10 +616,13 @@ class PatentSearcher:
     
     # ========== FUNCIÓN PRINCIPAL ==========
     
+    @traced()
     def search_all_sources(self, 
                           keywords: List[str] = None,
                           categories: List[str] = None,
-                          limit_per_source: int = 5) -> List[Dict]:
+                          limit_per_source: int = 5,
+                          top_k: Optional[int] = None,
+                          progress: Optional[Callable[[int, int, str], None]] = None) -> List[Dict]:
         """
         Busca en todas las fuentes disponibles
         
@@ -528,21 +630,102 @@ class PatentSearcher:
             keywords: Lista de palabras clave
             categories: Categorías IPC
             limit_per_source: Límite por fuente
+            top_k: Devolver sólo las k más relevantes (todas si es None)
+            progress: progress(paso, total, mensaje) antes de cada fuente (p.ej. jobs.report_step)
         
         Returns:
-            Lista de patentes encontradas
+            Lista de patentes encontradas, de más a menos relevante
         """
         
+        keywords = self._start_search(keywords, categories)
+        
         all_patents = []
+        search_methods = self._search_methods()
+        for step, (source_key, source_name, search_method) in enumerate(search_methods):
+            try:
+                if progress:
+                    progress(step, len(search_methods), f"Consultando {source_name}")
+                logger.info(f"🔍 Consultando {source_name}...")
+                patents, from_cache = self.cache.get_or_fetch(
+                    source_key,
+                    keywords,
+                    limit_per_source,
+                    lambda key=source_key, method=search_method: timed_fetch(
+                        key, lambda: method(keywords, limit_per_source)
+                    )
+                )
+                all_patents.extend(patents)
+                if from_cache:
+                    logger.info(f"💾 {source_name}: {len(patents)} patentes desde cache")
+            except Exception as e:
+                logger.error(f"Error en {source_name}: {e}")
+        
+        return self._finish_search(all_patents, keywords, top_k)
+    
+    @traced()
+    async def search_all_sources_async(self,
+                                       keywords: List[str] = None,
+                                       categories: List[str] = None,
+                                       limit_per_source: int = 5,
+                                       top_k: Optional[int] = None) -> List[Dict]:
+        """Variante asíncrona de search_all_sources: las fuentes se consultan a la vez"""
+        keywords = self._start_search(keywords, categories)
+        
+        async_methods = {
+            'google_patents': self.search_google_patents_async,
+            'uspto': self.search_uspto_async,
+        }
+        
+        async def search_source(source_key: str, source_name: str, search_method) -> List[Dict]:
+            async_method = async_methods.get(source_key)
+            
+            async def fetch() -> List[Dict]:
+                if async_method:
+                    return await timed_fetch_async(source_key, lambda: async_method(keywords, limit_per_source))
+                # Espacenet, WIPO y OEPM sólo generan enlaces: no hay red que esperar
+                return search_method(keywords, limit_per_source)
+            
+            try:
+                logger.info(f"🔍 Consultando {source_name}...")
+                patents, from_cache = await self.cache.get_or_fetch_async(
+                    source_key, keywords, limit_per_source, fetch
+                )
+                if from_cache:
+                    logger.info(f"💾 {source_name}: {len(patents)} patentes desde cache")
+                return patents
+            except Exception as e:
+                logger.error(f"Error en {source_name}: {e}")
+                return []
         
+        # Las tareas heredan el contexto: todas comparten el registro de duplicados
+        results = await asyncio.gather(*(search_source(*method) for method in self._search_methods()))
+        all_patents = [patent for patents in results for patent in patents]
+        
+        return self._finish_search(all_patents, keywords, top_k)
+    
+    def _search_methods(self) -> List[tuple]:
+        return [
+            ('google_patents', 'Google Patents', self.search_google_patents),
+            ('uspto', 'USPTO', self.search_uspto),
+            ('espacenet', 'Espacenet', self.search_espacenet),
+            ('patentscope', 'WIPO', self.search_patentscope),
+            ('oepm', 'OEPM', self.search_oepm)
+        ]
+    
+    def _start_search(self, keywords: Optional[List[str]], categories: Optional[List[str]]) -> List[str]:
+        """Keywords efectivas de la búsqueda; reinicia el registro de duplicados"""
         # Usar keywords predefinidos si no se proporcionan
         if not keywords:
             keywords = self.quantum_keywords[:5]
         
-        # Añadir categorías a keywords si se proporcionan
+        # Añadir categorías a keywords si se proporcionan (sin mutar la lista del llamador)
+        keywords = list(keywords)
         if categories:
             keywords.extend(categories)
         
+        # Cada búsqueda empieza con su propio registro de duplicados
+        self.reset_seen_patents()
+        
         logger.info(f"""
 ╔══════════════════════════════════════╗
 ║   BÚSQUEDA DE PATENTES INICIADA      ║
@@ -551,27 +734,20 @@ class PatentSearcher:
 ║ Fuentes activas: 5                   ║
 ╚══════════════════════════════════════╝
         """)
-        
-        # Buscar en cada fuente
-        search_methods = [
-            ('Google Patents', self.search_google_patents),
-            ('USPTO', self.search_uspto),
-            ('Espacenet', self.search_espacenet),
-            ('WIPO', self.search_patentscope),
-            ('OEPM', self.search_oepm)
-        ]
-        
-        for source_name, search_method in search_methods:
-            try:
-                logger.info(f"🔍 Consultando {source_name}...")
-                patents = search_method(keywords, limit_per_source)
-                all_patents.extend(patents)
-                time.sleep(1)  # Pausa entre fuentes
-            except Exception as e:
-                logger.error(f"Error en {source_name}: {e}")
-        
-        # Ordenar por relevancia
-        all_patents.sort(key=lambda x: x.get('relevance_score', 0), reverse=True)
+        return keywords
+    
+    def _finish_search(self, all_patents: List[Dict], keywords: List[str], top_k: Optional[int]) -> List[Dict]:
+        """Fusiona duplicados entre oficinas y ordena por relevancia"""
+        # Una entrada por invención aunque aparezca en varias oficinas
+        unique_patents = deduplicate_patents(all_patents)
+        if len(unique_patents) < len(all_patents):
+            logger.info(f"🧬 {len(all_patents) - len(unique_patents)} patentes duplicadas entre fuentes fusionadas")
+        all_patents = unique_patents
+        
+        # Puntuar según las keywords del usuario, los códigos IPC y las
+        # keywords cuánticas (scorer precompilado por conjunto de keywords)
+        scorer = get_scorer(keywords, self.relevant_ipc_codes, self.quantum_keywords)
+        all_patents = scorer.rank(all_patents, k=top_k)
         
         logger.info(f"""
 ╔══════════════════════════════════════╗
@@ -587,6 +763,18 @@ class PatentSearcher:
 
 # ========== FUNCIÓN HELPER PARA INTEGRACIÓN ==========
 
+# Instancia compartida: conserva la sesión HTTP y la cache entre llamadas
+_shared_searcher: Optional[PatentSearcher] = None
+_shared_searcher_lock = threading.Lock()
+
+def get_patent_searcher() -> PatentSearcher:
+    """Devuelve el buscador de patentes compartido por el proceso"""
+    global _shared_searcher
+    with _shared_searcher_lock:
+        if _shared_searcher is None:
+            _shared_searcher = PatentSearcher()
+        return _shared_searcher
+
 def fetch_patents(keywords: List[str] = None, categories: List[str] = None):
     """
     Función principal para obtener patentes
@@ -598,7 +786,7 @@ def fetch_patents(keywords: List[str] = None, categories: List[str] = None):
     Returns:
         Lista de patentes encontradas
     """
-    searcher = PatentSearcher()
+    searcher = get_patent_searcher()
     
     # Si no hay keywords, usar algunos por defecto para sensórica cuántica
     if not keywords:
@@ -621,13 +809,22 @@ def fetch_patents(keywords: List[str] = None, categories: List[str] = None):
         logger.error(f"Error general buscando patentes: {e}")
         return []
 
-def check_patents(keywords: List[str], since_date: datetime) -> List[Dict]:
+def check_patents(keywords: List[str], since_date: datetime,
+                  progress: Optional[Callable[[int, int, str], None]] = None) -> List[Dict]:
     """Wrapper para compatibilidad con multi_user_notification_system"""
-    searcher = PatentSearcher()
-    patents = searcher.search_all_sources(keywords=keywords)
-    
+    searcher = get_patent_searcher()
+    patents = searcher.search_all_sources(keywords=keywords, top_k=5, progress=progress)
+    return _patent_notifications(patents)
+
+async def check_patents_async(keywords: List[str], since_date: datetime) -> List[Dict]:
+    """Variante asíncrona de check_patents"""
+    searcher = get_patent_searcher()
+    patents = await searcher.search_all_sources_async(keywords=keywords, top_k=5)
+    return _patent_notifications(patents)
+
+def _patent_notifications(patents: List[Dict]) -> List[Dict]:
     notifications = []
-    for patent in patents[:5]:
+    for patent in patents:
         notifications.append({
             "type": "patents",
             "title": f"🔬 {patent['title'][:100]}",
@@ -642,6 +839,7 @@ def check_patents(keywords: List[str], since_date: datetime) -> List[Dict]:
 # ========== TESTING ==========
 
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
     print("🚀 Test del buscador de patentes...")
     print("-" * 50)
     
@@ -0,0 +1,238 @@
+# sources/patents_cache.py - CACHE PERSISTENTE DE RESULTADOS DE PATENTES
+import asyncio
+import json
+import os
+import threading
+import time
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PatentCache:
+    """
+    Cache en disco de resultados de patentes.
+
+    Las entradas se indexan por (fuente, conjunto normalizado de keywords, límite),
+    cada fuente tiene su propio TTL y el fichero está acotado en número de entradas
+    (se descartan las menos usadas). Una entrada caducada pero dentro de la ventana
+    de "stale" se sirve inmediatamente mientras se refresca en segundo plano.
+    """
+
+    # TTL por fuente (segundos). Las fuentes que sólo generan enlaces de búsqueda
+    # cambian una vez al día como mucho.
+    SOURCE_TTLS = {
+        'google_patents': 6 * 3600,
+        'uspto': 12 * 3600,
+        'espacenet': 24 * 3600,
+        'patentscope': 24 * 3600,
+        'oepm': 24 * 3600,
+    }
+    DEFAULT_TTL = 6 * 3600
+
+    def __init__(self,
+                 cache_file: str = "cache/patents_cache.json",
+                 max_entries: int = 200,
+                 stale_window: int = 24 * 3600):
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.stale_window = stale_window
+
+        self._lock = threading.RLock()
+        self._refreshing = set()
+        self._refresh_tasks = set()
+        self._entries = self._load()
+
+    # ========== PERSISTENCIA ==========
+
+    def _load(self) -> Dict[str, Dict]:
+        """Carga el fichero de cache (tolerante a ficheros corruptos o antiguos)"""
+        try:
+            if os.path.exists(self.cache_file):
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                if isinstance(data, dict):
+                    return data.get('entries', {})
+        except Exception as e:
+            logger.error(f"Error cargando cache de patentes: {e}")
+        return {}
+
+    def _save(self):
+        """Escritura atómica: fichero temporal + rename"""
+        try:
+            os.makedirs(os.path.dirname(self.cache_file) or '.', exist_ok=True)
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'entries': self._entries}, f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+        except Exception as e:
+            logger.error(f"Error guardando cache de patentes: {e}")
+
+    # ========== CLAVES ==========
+
+    @staticmethod
+    def normalize_keywords(keywords: List[str]) -> str:
+        """Normaliza keywords: minúsculas, espacios colapsados, sin duplicados, ordenadas"""
+        normalized = {' '.join(str(kw).lower().split()) for kw in (keywords or [])}
+        normalized.discard('')
+        return '|'.join(sorted(normalized))
+
+    def make_key(self, source: str, keywords: List[str], limit: int) -> str:
+        return f"{source}::{self.normalize_keywords(keywords)}::{limit}"
+
+    def ttl_for(self, source: str) -> int:
+        return self.SOURCE_TTLS.get(source, self.DEFAULT_TTL)
+
+    # ========== API ==========
+
+    def get(self, source: str, keywords: List[str], limit: int) -> Tuple[Optional[List[Dict]], Optional[str]]:
+        """
+        Devuelve (resultados, estado) con estado 'fresh', 'stale' o None si no hay
+        entrada utilizable.
+        """
+        key = self.make_key(source, keywords, limit)
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None, None
+
+            age = time.time() - entry.get('stored_at', 0)
+            ttl = self.ttl_for(source)
+            if age <= ttl:
+                state = 'fresh'
+            elif age <= ttl + self.stale_window:
+                state = 'stale'
+            else:
+                return None, None
+
+            entry['last_access'] = time.time()
+            return list(entry.get('results', [])), state
+
+    def set(self, source: str, keywords: List[str], limit: int, results: List[Dict]):
+        """Guarda resultados y aplica el límite de tamaño"""
+        key = self.make_key(source, keywords, limit)
+        now = time.time()
+        with self._lock:
+            self._entries[key] = {
+                'source': source,
+                'stored_at': now,
+                'last_access': now,
+                'results': results,
+            }
+            self._evict()
+            self._save()
+
+    def _evict(self):
+        """Descarta entradas expiradas y, si sigue lleno, las menos usadas"""
+        now = time.time()
+        expired = [
+            key for key, entry in self._entries.items()
+            if now - entry.get('stored_at', 0) > self.ttl_for(entry.get('source', '')) + self.stale_window
+        ]
+        for key in expired:
+            del self._entries[key]
+
+        overflow = len(self._entries) - self.max_entries
+        if overflow > 0:
+            oldest = sorted(self._entries, key=lambda k: self._entries[k].get('last_access', 0))
+            for key in oldest[:overflow]:
+                del self._entries[key]
+
+    def get_or_fetch(self,
+                     source: str,
+                     keywords: List[str],
+                     limit: int,
+                     fetch: Callable[[], List[Dict]]) -> Tuple[List[Dict], bool]:
+        """
+        Sirve desde cache si es posible (stale-while-revalidate).
+
+        Returns:
+            (resultados, desde_cache)
+        """
+        results, state = self.get(source, keywords, limit)
+
+        if state == 'fresh':
+            return results, True
+
+        if state == 'stale':
+            self._refresh_in_background(source, keywords, limit, fetch)
+            return results, True
+
+        results = fetch()
+        # No se cachean respuestas vacías: suelen ser errores temporales de la fuente
+        if results:
+            self.set(source, keywords, limit, results)
+        return results, False
+
+    def _refresh_in_background(self, source: str, keywords: List[str], limit: int,
+                               fetch: Callable[[], List[Dict]]):
+        key = self.make_key(source, keywords, limit)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                logger.info(f"♻️ Refrescando cache de patentes: {source}")
+                results = fetch()
+                if results:
+                    self.set(source, keywords, limit, results)
+            except Exception as e:
+                logger.error(f"Error refrescando cache de {source}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    async def get_or_fetch_async(self,
+                                 source: str,
+                                 keywords: List[str],
+                                 limit: int,
+                                 fetch: Callable[[], Awaitable[List[Dict]]]) -> Tuple[List[Dict], bool]:
+        """Como get_or_fetch, con un fetch asíncrono; el refresco en segundo plano es una tarea"""
+        results, state = self.get(source, keywords, limit)
+
+        if state == 'fresh':
+            return results, True
+
+        if state == 'stale':
+            self._refresh_task(source, keywords, limit, fetch)
+            return results, True
+
+        results = await fetch()
+        if results:
+            await asyncio.to_thread(self.set, source, keywords, limit, results)
+        return results, False
+
+    def _refresh_task(self, source: str, keywords: List[str], limit: int,
+                      fetch: Callable[[], Awaitable[List[Dict]]]):
+        key = self.make_key(source, keywords, limit)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        async def refresh():
+            try:
+                logger.info(f"♻️ Refrescando cache de patentes: {source}")
+                results = await fetch()
+                if results:
+                    await asyncio.to_thread(self.set, source, keywords, limit, results)
+            except Exception as e:
+                logger.error(f"Error refrescando cache de {source}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        # El loop sólo guarda referencias débiles a las tareas
+        task = asyncio.ensure_future(refresh())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+            self._save()
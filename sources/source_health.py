@@ -0,0 +1,258 @@
+# sources/source_health.py - SALUD DE LAS FUENTES Y CIRCUIT BREAKER
+import threading
+import time
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+from sources.instrumentation import get_metrics, span
+
+logger = logging.getLogger(__name__)
+
+SOURCE_SECONDS = get_metrics().histogram('source_fetch_seconds', 'Duración de cada consulta a una fuente', ['source', 'outcome'])
+SOURCE_SKIPPED = get_metrics().counter('source_skipped_total', 'Consultas no hechas por circuito abierto', ['source'])
+
+T = TypeVar('T')
+
+CLOSED = 'closed'        # funcionando: se consulta normalmente
+OPEN = 'open'            # caída: no se consulta hasta que pase el backoff
+HALF_OPEN = 'half_open'  # backoff cumplido: se deja pasar una única prueba
+
+
+class CircuitOpenError(Exception):
+    """La fuente tiene el circuito abierto y no se ha consultado"""
+
+
+class SourceHealth:
+    """
+    Latencia y tasa de error de una fuente, con circuit breaker.
+
+    Tras `failure_threshold` fallos seguidos el circuito se abre y la fuente
+    no se consulta durante `base_backoff` segundos. Pasado ese tiempo se deja
+    pasar una petición de prueba: si falla, el backoff se duplica (hasta
+    `max_backoff`); si funciona, el circuito se cierra.
+    """
+
+    def __init__(self,
+                 name: str,
+                 failure_threshold: int = 3,
+                 base_backoff: float = 60.0,
+                 max_backoff: float = 3600.0,
+                 window: int = 50):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.backoff = base_backoff
+        self.open_until = 0.0
+        self.probe_in_flight = False
+
+        self.total_calls = 0
+        self.total_failures = 0
+        self.skipped = 0
+        self.last_error: Optional[str] = None
+        self.last_success: Optional[float] = None
+        self.last_failure: Optional[float] = None
+        # Últimas llamadas: (latencia en segundos, éxito)
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True si se puede consultar la fuente ahora"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.time() >= self.open_until:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self.probe_in_flight:
+                self.probe_in_flight = True
+                logger.info(f"🩺 {self.name}: probando de nuevo tras {int(self.backoff)}s")
+                return True
+            self.skipped += 1
+            SOURCE_SKIPPED.inc(source=self.name)
+            return False
+
+    def record_success(self, latency: float):
+        SOURCE_SECONDS.observe(latency, source=self.name, outcome='ok')
+        with self._lock:
+            self.total_calls += 1
+            self.recent.append((latency, True))
+            self.last_success = time.time()
+            if self.state != CLOSED:
+                logger.info(f"✅ {self.name}: circuito cerrado, la fuente responde de nuevo")
+            self.state = CLOSED
+            self.consecutive_failures = 0
+            self.backoff = self.base_backoff
+            self.probe_in_flight = False
+
+    def record_failure(self, latency: float, error: str):
+        SOURCE_SECONDS.observe(latency, source=self.name, outcome='error')
+        with self._lock:
+            self.total_calls += 1
+            self.total_failures += 1
+            self.recent.append((latency, False))
+            self.last_error = error[:200]
+            self.last_failure = time.time()
+            self.consecutive_failures += 1
+
+            if self.state == HALF_OPEN:
+                # La prueba ha fallado: más espera antes de la siguiente
+                self.backoff = min(self.backoff * 2, self.max_backoff)
+                self._open()
+            elif self.consecutive_failures >= self.failure_threshold:
+                self._open()
+            self.probe_in_flight = False
+
+    def release_probe(self):
+        """La llamada se interrumpió sin respuesta (cancelación): ni éxito ni fallo"""
+        with self._lock:
+            self.probe_in_flight = False
+
+    def _open(self):
+        self.state = OPEN
+        self.open_until = time.time() + self.backoff
+        logger.warning(
+            f"🔌 {self.name}: circuito abierto tras {self.consecutive_failures} fallos, "
+            f"siguiente intento en {int(self.backoff)}s"
+        )
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            latencies = sorted(latency for latency, _ in self.recent)
+            failures = sum(1 for _, ok in self.recent if not ok)
+            return {
+                'state': self.state,
+                'healthy': self.state == CLOSED,
+                'calls': self.total_calls,
+                'failures': self.total_failures,
+                'skipped': self.skipped,
+                'error_rate': round(failures / len(self.recent), 3) if self.recent else 0.0,
+                'latency_p50_ms': round(latencies[len(latencies) // 2] * 1000) if latencies else None,
+                'latency_max_ms': round(latencies[-1] * 1000) if latencies else None,
+                'consecutive_failures': self.consecutive_failures,
+                'retry_in_s': max(0, int(self.open_until - time.time())) if self.state == OPEN else 0,
+                'last_error': self.last_error,
+                'last_success': self.last_success,
+            }
+
+
+class SourceHealthRegistry:
+    """Salud de todas las fuentes del proceso"""
+
+    def __init__(self, **defaults):
+        self.defaults = defaults
+        self._sources: Dict[str, SourceHealth] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> SourceHealth:
+        with self._lock:
+            if name not in self._sources:
+                self._sources[name] = SourceHealth(name, **self.defaults)
+            return self._sources[name]
+
+    def call(self, name: str, fetch: Callable[[], T], is_failure: Callable[[T], bool] = lambda r: r is None) -> T:
+        """
+        Ejecuta `fetch` para la fuente `name` registrando latencia y resultado.
+
+        Raises:
+            CircuitOpenError: si el circuito está abierto (no se llama a fetch).
+        """
+        health = self.get(name)
+        if not health.allow():
+            raise CircuitOpenError(f"{name}: fuente caída, circuito abierto")
+
+        start = time.perf_counter()
+        try:
+            with span(f'source:{name}'):
+                result = fetch()
+        except Exception as e:
+            health.record_failure(time.perf_counter() - start, f"{type(e).__name__}: {e}")
+            raise
+        except BaseException:
+            # Cancelación o parada: no dice nada de la fuente, pero si era la
+            # prueba de un circuito medio abierto hay que liberarla o no habría otra
+            health.release_probe()
+            raise
+
+        latency = time.perf_counter() - start
+        if is_failure(result):
+            health.record_failure(latency, "respuesta no válida")
+        else:
+            health.record_success(latency)
+        return result
+
+    async def call_async(self,
+                         name: str,
+                         fetch: Callable[[], Awaitable[T]],
+                         is_failure: Callable[[T], bool] = lambda r: r is None) -> T:
+        """Como call, para un fetch asíncrono (``fetch`` devuelve una corrutina)"""
+        health = self.get(name)
+        if not health.allow():
+            raise CircuitOpenError(f"{name}: fuente caída, circuito abierto")
+
+        start = time.perf_counter()
+        try:
+            with span(f'source:{name}'):
+                result = await fetch()
+        except Exception as e:
+            health.record_failure(time.perf_counter() - start, f"{type(e).__name__}: {e}")
+            raise
+        except BaseException:
+            # CancelledError (ver call)
+            health.release_probe()
+            raise
+
+        latency = time.perf_counter() - start
+        if is_failure(result):
+            health.record_failure(latency, "respuesta no válida")
+        else:
+            health.record_success(latency)
+        return result
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            sources = dict(self._sources)
+        return {name: health.snapshot() for name, health in sorted(sources.items())}
+
+
+def timed_fetch(source: str, fetch: Callable[[], T]) -> T:
+    """Ejecuta `fetch` registrando su duración en source_fetch_seconds (sin circuit breaker)"""
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        with span(f'source:{source}'):
+            result = fetch()
+        outcome = 'ok'
+        return result
+    finally:
+        SOURCE_SECONDS.observe(time.perf_counter() - start, source=source, outcome=outcome)
+
+
+async def timed_fetch_async(source: str, fetch: Callable[[], Awaitable[T]]) -> T:
+    """Como timed_fetch, para un fetch asíncrono"""
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        with span(f'source:{source}'):
+            result = await fetch()
+        outcome = 'ok'
+        return result
+    finally:
+        SOURCE_SECONDS.observe(time.perf_counter() - start, source=source, outcome=outcome)
+
+
+# ========== INSTANCIA DE PROCESO ==========
+
+_registry: Optional[SourceHealthRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_source_health() -> SourceHealthRegistry:
+    """Devuelve el registro de salud de fuentes compartido"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = SourceHealthRegistry()
+        return _registry
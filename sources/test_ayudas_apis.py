@@ -1,16 +1,34 @@
 #!/usr/bin/env python3
 """
-Script de prueba para verificar APIs de ayudas
+Script de prueba para verificar las fuentes de ayudas y patentes
 Prueba cada fuente individualmente y muestra resultados
+
+Modos:
+    python sources/test_ayudas_apis.py                    # contra los sitios reales
+    python sources/test_ayudas_apis.py --record           # reales + graba fixtures
+    python sources/test_ayudas_apis.py --replay           # sin red, desde fixtures
+    python sources/test_ayudas_apis.py --replay --bench   # benchmark offline
+
+Las fixtures se guardan en fixtures/http/v<N>/ (ver sources/fixtures.py).
 """
 
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sources.ayudas_real import AyudasScraperAPIs
-from datetime import datetime, timedelta
+import argparse
 import json
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from sources.fixtures import use_fixtures, DEFAULT_FIXTURES_DIR
+from sources.http_validators import ValidatorStore
+from sources.ayudas_store import AyudasCatalog, SeenStore
+from sources.source_health import SourceHealthRegistry
+
+PATENT_KEYWORDS = ['quantum sensor', 'PFAS detection', 'water quality sensor']
 
 def print_separator(char="=", length=70):
     print(char * length)
@@ -20,181 +38,210 @@ def print_header(text):
     print(f"  {text}")
     print_separator()
 
-def test_individual_source(scraper, source_name, fetch_method):
+def build_scrapers(workdir: str):
+    """
+    Crea scrapers aislados: sin IDs vistos, sin validadores HTTP ni cache de
+    patentes previos, para que cada ejecución sea determinista. Todos los
+    almacenes viven en `workdir`: no se toca nada de cache/.
+    """
+    from sources.ayudas_real import AyudasScraper
+    from sources.patents import PatentSearcher
+
+    scraper = AyudasScraper(
+        seen_store=SeenStore(os.path.join(workdir, "ayudas.db")),
+        catalog=AyudasCatalog(os.path.join(workdir, "ayudas.db")),
+        validators=ValidatorStore(os.path.join(workdir, "validators.json")),
+        health=SourceHealthRegistry(),
+    )
+    searcher = PatentSearcher(
+        cache_file=os.path.join(workdir, "patents_cache.json"),
+        validators=ValidatorStore(os.path.join(workdir, "patent_validators.json")),
+    )
+    return scraper, searcher
+
+def get_sources(scraper, searcher):
+    """(nombre, método de fetch, objeto, nombre del método de parsing)"""
+    return [
+        ("SPRI", scraper.scrape_spri_web, scraper, '_parse_spri_web'),
+        ("Euskadi Web", scraper.scrape_euskadi_web, scraper, '_parse_euskadi_web'),
+        ("Gipuzkoa Web", scraper.scrape_gipuzkoa_web, scraper, '_parse_gipuzkoa_web'),
+        ("Bizkaia API", scraper.scrape_bizkaia_api, scraper, '_parse_bizkaia_api'),
+        ("Bizkaia Web", scraper.scrape_bizkaia_web, scraper, '_parse_bizkaia_web'),
+        ("Google Patents", lambda: searcher.search_google_patents(PATENT_KEYWORDS, 5), searcher, '_parse_google_patents'),
+        ("USPTO", lambda: searcher.search_uspto(PATENT_KEYWORDS, 5), searcher, '_parse_uspto'),
+    ]
+
+def reset_state(scraper, searcher, workdir: str):
+    """Olvida lo visto y lo descargado en la repetición anterior"""
+    scraper.seen_aids = SeenStore(os.path.join(workdir, f"seen_{time.time_ns()}.db"))
+    searcher.reset_seen_patents()
+    scraper.clear_source_results()
+    scraper.health = SourceHealthRegistry()
+    scraper.validators = ValidatorStore(os.path.join(workdir, f"validators_{time.time_ns()}.json"))
+    searcher.validators = ValidatorStore(os.path.join(workdir, f"patent_validators_{time.time_ns()}.json"))
+
+def probar_fuente(source_name, fetch_method):
     """Prueba una fuente individual"""
     print(f"\n🔍 Probando: {source_name}")
     print("-" * 70)
-    
+
     try:
-        ayudas = fetch_method()
-        
-        if ayudas:
-            print(f"✅ ÉXITO: {len(ayudas)} ayudas encontradas")
-            
-            # Mostrar primera ayuda como ejemplo
-            if len(ayudas) > 0:
-                print(f"\n📋 Ejemplo de ayuda encontrada:")
-                primera = ayudas[0]
-                print(f"   Título: {primera['titulo'][:80]}")
-                print(f"   Entidad: {primera['entidad']}")
-                print(f"   Ámbito: {primera['ambito']}")
-                print(f"   URL: {primera['url'][:80]}")
-                print(f"   Fuente: {primera.get('fuente', 'N/A')}")
+        items = fetch_method()
+
+        if items:
+            print(f"✅ ÉXITO: {len(items)} resultados encontrados")
+
+            # Mostrar el primer resultado como ejemplo
+            primera = items[0]
+            print("\n📋 Ejemplo:")
+            print(f"   Título: {(primera.get('titulo') or primera.get('title', ''))[:80]}")
+            print(f"   Entidad: {primera.get('entidad') or primera.get('source', 'N/A')}")
+            print(f"   URL: {primera.get('url', '')[:80]}")
+            print(f"   Fuente: {primera.get('fuente', primera.get('source', 'N/A'))}")
         else:
-            print("⚠️  No se encontraron ayudas (puede ser normal)")
-        
-        return True, len(ayudas)
-    
+            print("⚠️  No se encontraron resultados (puede ser normal)")
+
+        return True, len(items)
+
     except Exception as e:
         print(f"❌ ERROR: {str(e)}")
         return False, 0
 
-def main():
-    print_header("🧪 TEST DE APIS DE AYUDAS Y SUBVENCIONES")
-    
-    print("""
-Este script prueba cada API individualmente para verificar su funcionamiento.
-Las APIs pueden tardar varios segundos en responder.
-    """)
-    
-    # Crear instancia del scraper
-    scraper = AyudasScraperAPIs()
-    
-    # Definir tests
-    tests = [
-        ("Open Data Euskadi", scraper.fetch_euskadi_opendata),
-        ("BDNS - Base Nacional", scraper.fetch_bdns_api),
-        ("Bizkaia RSS", scraper.fetch_bizkaia_rss),
-        ("SPRI Agencia Vasca", scraper.fetch_spri_rss),
-        ("Next Generation EU", scraper.fetch_next_generation),
-        ("CDTI", scraper.fetch_cdti_rss),
-    ]
-    
-    # Resultados
+def run_tests(scraper, searcher, save_results: bool):
+    print_header("🧪 TEST DE FUENTES DE AYUDAS Y PATENTES")
+
     results = {
         'exitosos': 0,
         'fallidos': 0,
-        'total_ayudas': 0
+        'total_items': 0
     }
-    
-    # Ejecutar tests
-    for nombre, metodo in tests:
-        exito, num_ayudas = test_individual_source(scraper, nombre, metodo)
-        
-        if exito:
+
+    sources = get_sources(scraper, searcher)
+    for nombre, metodo, _, _ in sources:
+        exito, num_items = probar_fuente(nombre, metodo)
+
+        if exito and num_items:
             results['exitosos'] += 1
         else:
             results['fallidos'] += 1
-        
-        results['total_ayudas'] += num_ayudas
-        
-        # Pausa entre tests
-        import time
-        time.sleep(2)
-    
-    # Resumen final
+
+        results['total_items'] += num_items
+
     print("\n")
     print_header("📊 RESUMEN DE PRUEBAS")
-    
-    print(f"""
-    Fuentes probadas:    {len(tests)}
-    ✅ Exitosas:         {results['exitosos']}
-    ❌ Fallidas:         {results['fallidos']}
-    📦 Ayudas totales:   {results['total_ayudas']}
-    
-    Tasa de éxito: {(results['exitosos']/len(tests)*100):.1f}%
-    """)
-    
-    # Estadísticas del scraper
-    stats = scraper.get_statistics()
+
     print(f"""
-    📈 Estadísticas del sistema:
-       - Cache: {stats['cache_size']} ayudas únicas
-       - Fuentes configuradas: {stats['sources_configured']}
+    Fuentes probadas:    {len(sources)}
+    ✅ Con resultados:   {results['exitosos']}
+    ❌ Sin resultados:   {results['fallidos']}
+    📦 Items totales:    {results['total_items']}
     """)
-    
-    # Test completo integrado
-    print_header("🌍 TEST INTEGRADO - TODAS LAS FUENTES")
-    print("\nProbando búsqueda completa en todas las regiones...")
-    
-    regiones_test = ['euskadi', 'nacional', 'bizkaia']
-    
-    for region in regiones_test:
-        print(f"\n📍 Región: {region.upper()}")
+
+    if save_results:
         try:
-            ayudas = scraper.get_all_ayudas(region=region)
-            print(f"   ✅ {len(ayudas)} ayudas encontradas")
-            
-            # Mostrar distribución por fuente
-            fuentes = {}
-            for ayuda in ayudas:
-                fuente = ayuda.get('fuente', 'Desconocida')
-                fuentes[fuente] = fuentes.get(fuente, 0) + 1
-            
-            if fuentes:
-                print(f"   📊 Distribución por fuente:")
-                for fuente, count in sorted(fuentes.items(), key=lambda x: x[1], reverse=True):
-                    print(f"      • {fuente}: {count}")
-        
+            resultados_file = "cache/test_results.json"
+            os.makedirs("cache", exist_ok=True)
+
+            with open(resultados_file, 'w') as f:
+                json.dump({
+                    'fecha': datetime.now().isoformat(),
+                    'resultados': results,
+                    'estadisticas': scraper.stats
+                }, f, indent=2)
+
+            print(f"✅ Resultados guardados en: {resultados_file}")
+
         except Exception as e:
-            print(f"   ❌ Error: {e}")
-    
-    # Guardar resultados
-    print("\n")
-    print_header("💾 GUARDANDO RESULTADOS")
-    
-    try:
-        resultados_file = "cache/test_results.json"
-        os.makedirs("cache", exist_ok=True)
-        
-        with open(resultados_file, 'w') as f:
-            json.dump({
-                'fecha': datetime.now().isoformat(),
-                'resultados': results,
-                'estadisticas': stats
-            }, f, indent=2)
-        
-        print(f"✅ Resultados guardados en: {resultados_file}")
-    
-    except Exception as e:
-        print(f"⚠️  No se pudieron guardar resultados: {e}")
-    
+            print(f"⚠️  No se pudieron guardar resultados: {e}")
+
+def run_benchmark(scraper, searcher, workdir: str, repeat: int):
+    """
+    Ejecuta cada fuente `repeat` veces desde las fixtures y mide, por fuente:
+    tiempo total, tiempo de parsing, items extraídos y memoria reservada.
+    """
+    print_header(f"⏱️  BENCHMARK OFFLINE ({repeat} repeticiones por fuente)")
+    print(f"\n{'Fuente':<16} {'total ms':>9} {'parse ms':>9} {'items':>6} {'pico KB':>9} {'neto KB':>9}")
+    print("-" * 62)
+
+    for nombre, metodo, owner, parse_name in get_sources(scraper, searcher):
+        parse_times = []
+        total_times = []
+        peaks = []
+        nets = []
+        items = 0
+
+        for _ in range(repeat):
+            reset_state(scraper, searcher, workdir)
+            original_parse = getattr(owner, parse_name)
+
+            def timed_parse(response, _parse=original_parse):
+                start = time.perf_counter()
+                try:
+                    return _parse(response)
+                finally:
+                    parse_times.append(time.perf_counter() - start)
+
+            setattr(owner, parse_name, timed_parse)
+            tracemalloc.start()
+            try:
+                baseline, _ = tracemalloc.get_traced_memory()
+                start = time.perf_counter()
+                result = metodo()
+                total_times.append(time.perf_counter() - start)
+                current, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - baseline)
+                nets.append(current - baseline)
+                items = len(result)
+            finally:
+                tracemalloc.stop()
+                delattr(owner, parse_name)
+
+        # tracemalloc ralentiza la ejecución: se comparan medianas entre fuentes
+        def median(values):
+            values = sorted(values)
+            return values[len(values) // 2] if values else 0.0
+
+        parse_ms = median(parse_times) * 1000 if parse_times else float('nan')
+        print(f"{nombre:<16} {median(total_times) * 1000:>9.2f} {parse_ms:>9.2f} {items:>6} "
+              f"{median(peaks) / 1024:>9.1f} {median(nets) / 1024:>9.1f}")
+
+    print("-" * 62)
+    print("parse ms = nan: la fuente no tiene fixture o no llegó a parsear")
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de las fuentes de ayudas y patentes")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--record', action='store_true', help="Consultar los sitios reales y grabar fixtures")
+    mode.add_argument('--replay', action='store_true', help="Reproducir fixtures sin red")
+    parser.add_argument('--bench', action='store_true', help="Modo benchmark (requiere --replay)")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES_DIR, help="Directorio de fixtures")
+    args = parser.parse_args()
+
+    if args.bench and not args.replay:
+        parser.error("--bench sólo tiene sentido con --replay")
+
+    adapter = None
+    if args.record:
+        adapter = use_fixtures('record', args.fixtures)
+    elif args.replay:
+        adapter = use_fixtures('replay', args.fixtures)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        scraper, searcher = build_scrapers(workdir)
+
+        if args.bench:
+            run_benchmark(scraper, searcher, workdir, args.repeat)
+        else:
+            run_tests(scraper, searcher, save_results=not args.replay)
+
+    if args.replay:
+        print(f"\n📼 Fixtures: {adapter.hits} servidas, {adapter.misses} sin grabar")
+
     print("\n")
     print_separator("=")
     print("✨ Test completado")
     print_separator("=")
-    
-    # Recomendaciones
-    if results['fallidos'] > 0:
-        print(f"""
-⚠️  ATENCIÓN: {results['fallidos']} fuentes fallaron
-
-Posibles causas:
-1. Las URLs de las APIs pueden haber cambiado
-2. Problemas de conectividad de red
-3. Sitios web temporalmente no disponibles
-4. Necesidad de actualizar parsers/selectores
-
-Recomendaciones:
-- Verifica tu conexión a internet
-- Consulta los logs para ver errores específicos
-- Algunas fuentes pueden requerir ajustes en el código
-        """)
-    else:
-        print("""
-🎉 ¡PERFECTO! Todas las fuentes funcionan correctamente
-
-El sistema está listo para buscar ayudas en:
-- Bizkaia, Gipuzkoa, Álava
-- Euskadi (Gobierno Vasco)
-- Nacional (BDNS)
-- Europa (Next Generation)
-
-Comandos disponibles en el chat:
-- ayudas buscar
-- ayudas region: bizkaia
-- ayudas filtrar: tecnología
-        """)
 
 if __name__ == "__main__":
     try:
@@ -204,4 +251,4 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"\n\n❌ Error fatal: {e}")
         import traceback
-        traceback.print_exc()
\ No newline at end of file
+        traceback.print_exc()
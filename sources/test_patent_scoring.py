@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Compara RelevanceScorer con la antigua PatentSearcher.calculate_relevance.
+
+Con las keywords por defecto las puntuaciones deben ser idénticas: mismos
+términos, mismos pesos y misma semántica de subcadena ('sensor' cuenta en
+'nanosensor', 'quantum dot' en 'quantumdot' no).
+
+    python -m pytest -q sources/test_patent_scoring.py
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import random
+
+from sources.patent_scoring import RelevanceScorer, get_scorer
+
+def legacy_calculate_relevance(text: str) -> float:
+    """Copia literal de la calculate_relevance original"""
+    if not text:
+        return 0.0
+
+    text_lower = text.lower()
+    score = 0.0
+
+    high_relevance = ['quantum sensor', 'pfas', 'water quality', 'quantum dot']
+    medium_relevance = ['sensor', 'detector', 'measurement', 'quantum']
+
+    for kw in high_relevance:
+        if kw in text_lower:
+            score += 2.0
+
+    for kw in medium_relevance:
+        if kw in text_lower:
+            score += 1.0
+
+    return min(score / 10.0, 1.0)
+
+FRAGMENTS = [
+    'quantum', 'Quantum', 'QUANTUM', 'sensor', 'Sensors', 'nano', 'bio', 'dot', 'dots',
+    'pfas', 'PFAS', 'water', 'quality', 'detector', 'measurement', 'photon',
+    ' ', ' ', ' ', '  ', '-', '_', '.', ',', '\n', 'a', 'x', 'é', 'İ',
+]
+
+def random_text(rng: random.Random) -> str:
+    return ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 30)))
+
+def test_default_scorer_matches_legacy_examples():
+    scorer = get_scorer()
+    for text in ['', 'nanosensor', 'biosensor array', 'quantumdot', 'quantum dot',
+                 'Quantum Sensor for PFAS in Water Quality', 'sensorsensor detector',
+                 'a measurement', 'quantum  sensor', 'PFAS']:
+        assert scorer.score(text) == legacy_calculate_relevance(text), text
+
+def test_default_scorer_matches_legacy_randomized():
+    rng = random.Random(36)
+    scorer = RelevanceScorer()
+    for _ in range(20000):
+        text = random_text(rng)
+        assert scorer.score(text) == legacy_calculate_relevance(text), repr(text)
+
+def test_overlapping_user_terms_all_count():
+    scorer = RelevanceScorer(keywords=['quantum sensor', 'sensor array'])
+    # 'quantum sensor array' contiene ambas keywords (se solapan en 'sensor')
+    both = scorer.raw_score('quantum sensor array')
+    assert both == scorer.raw_score('quantum sensor') + scorer.raw_score('sensor array') - scorer.raw_score('sensor')
+
+if __name__ == "__main__":
+    test_default_scorer_matches_legacy_examples()
+    test_default_scorer_matches_legacy_randomized()
+    test_overlapping_user_terms_all_count()
+    print("✅ RelevanceScorer coincide con calculate_relevance")
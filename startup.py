@@ -0,0 +1,168 @@
+# startup.py - PERFIL DE ARRANQUE Y ARRANQUE RÁPIDO
+"""
+Cada despliegue (y cada arranque desde cero en Render) paga la cadena de
+imports completa: main.py → agent.py (genai) → multi_user_notification_system
+(las cuatro fuentes, bs4, feedparser, httpx...) antes de atender la primera
+petición.
+
+  - ``python main.py --profile-startup``: importa main en un proceso limpio
+    con ``-X importtime`` y muestra el árbol de tiempos de importación
+  - FAST_BOOT=1 (o ``--fast-boot``): el servidor responde /health y /static
+    al momento y carga los subsistemas pesados en segundo plano; el resto de
+    peticiones esperan a que termine la carga (ver BootState)
+"""
+import asyncio
+import logging
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)')
+
+
+# ========== PERFIL DE IMPORTACIONES ==========
+
+class ImportNode:
+    def __init__(self, name: str, self_us: int, cumulative_us: int):
+        self.name = name
+        self.self_ms = self_us / 1000
+        self.cumulative_ms = cumulative_us / 1000
+        self.children: List['ImportNode'] = []
+
+
+def parse_importtime(output: str) -> List[ImportNode]:
+    """
+    Árbol de la salida de ``-X importtime``. Python escribe cada módulo
+    DESPUÉS de sus dependencias, con dos espacios de sangría por nivel.
+    """
+    pending: Dict[int, List[ImportNode]] = {}
+    for line in output.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        depth = len(indent) // 2
+        node = ImportNode(name, int(self_us), int(cumulative_us))
+        node.children = pending.pop(depth + 1, [])
+        pending.setdefault(depth, []).append(node)
+    return pending.get(0, [])
+
+
+def format_import_tree(roots: List[ImportNode], min_ms: float = 5.0, top: int = 15) -> str:
+    """Árbol con los módulos que tardan al menos min_ms (acumulado) y los más lentos por sí mismos"""
+    lines = []
+
+    def walk(node: ImportNode, depth: int):
+        if node.cumulative_ms < min_ms:
+            return
+        lines.append(f"{node.cumulative_ms:9.1f} ms {node.self_ms:8.1f} ms  {'  ' * depth}{node.name}")
+        for child in sorted(node.children, key=lambda n: n.cumulative_ms, reverse=True):
+            walk(child, depth + 1)
+
+    lines.append(f"{'acumulado':>12} {'propio':>11}  módulo (>= {min_ms:g} ms)")
+    for root in sorted(roots, key=lambda n: n.cumulative_ms, reverse=True):
+        walk(root, 0)
+
+    everything = []
+    stack = list(roots)
+    while stack:
+        node = stack.pop()
+        everything.append(node)
+        stack.extend(node.children)
+    lines.append("")
+    lines.append(f"Los {top} módulos más lentos por sí mismos:")
+    for node in sorted(everything, key=lambda n: n.self_ms, reverse=True)[:top]:
+        lines.append(f"{node.self_ms:9.1f} ms  {node.name}")
+
+    lines.append("")
+    lines.append(f"Total: {sum(root.cumulative_ms for root in roots):.0f} ms en {len(everything)} módulos")
+    return "\n".join(lines)
+
+
+def profile_startup(module: str = "main", min_ms: float = 5.0) -> int:
+    """Importa ``module`` en un proceso nuevo con -X importtime e imprime el árbol"""
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=os.environ.copy(),
+    )
+    elapsed = time.perf_counter() - start
+
+    roots = parse_importtime(completed.stderr)
+    print(format_import_tree(roots, min_ms=min_ms))
+    print(f"Proceso completo (intérprete incluido): {elapsed:.2f} s "
+          f"[FAST_BOOT={os.getenv('FAST_BOOT', '0')}]")
+    if completed.returncode != 0:
+        errors = [line for line in completed.stderr.splitlines() if not line.startswith("import time:")]
+        print("\n".join(errors[-20:]))
+    return completed.returncode
+
+
+# ========== ARRANQUE RÁPIDO ==========
+
+class BootState:
+    """
+    Estado de la carga en segundo plano de los subsistemas pesados. Las
+    peticiones que los necesitan esperan con wait(); /health consulta
+    snapshot() mientras tanto.
+    """
+
+    def __init__(self):
+        self.created = time.perf_counter()
+        self.ready = False
+        self.error: Optional[str] = None
+        self.phases: Dict[str, float] = {}
+        self._event: Optional[asyncio.Event] = None
+
+    def _get_event(self) -> asyncio.Event:
+        if self._event is None:
+            self._event = asyncio.Event()
+        return self._event
+
+    async def run(self, phases: List[Tuple[str, Callable[[], None]]]):
+        """
+        Ejecuta las fases ``[(nombre, función síncrona), ...]`` en orden, en
+        un hilo, y marca el arranque como completado (o fallido).
+        """
+        event = self._get_event()
+        try:
+            for name, func in phases:
+                start = time.perf_counter()
+                await asyncio.to_thread(func)
+                self.phases[name] = round(time.perf_counter() - start, 3)
+            self.ready = True
+            logger.info("⚡ Subsistemas cargados en segundo plano en %.2f s", time.perf_counter() - self.created,
+                        extra=self.phases)
+        except Exception as e:
+            self.error = str(e)
+            logger.exception("❌ Error cargando subsistemas: %s", e)
+        finally:
+            event.set()
+
+    def mark_ready(self):
+        """Arranque normal: todo se cargó al importar"""
+        self.ready = True
+        self._get_event().set()
+
+    async def wait(self, timeout: float) -> bool:
+        """True si los subsistemas están listos (esperando como mucho ``timeout`` s)"""
+        if self.ready:
+            return True
+        try:
+            await asyncio.wait_for(self._get_event().wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return self.ready
+
+    def snapshot(self) -> Dict:
+        return {
+            'ready': self.ready,
+            'error': self.error,
+            'phases_s': dict(self.phases),
+            'uptime_s': round(time.perf_counter() - self.created, 1),
+        }
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Compara CommandRouter con las cascadas de if que sustituye: la de
+CommandHandler.process_command (main.py) y, si ninguna regla de main.py
+aplicaba, la de ask_gemini_for_tool (agent.py).
+
+Para cualquier entrada el router debe elegir la misma herramienta (o None
+cuando antes se acababa preguntando a Gemini).
+
+    python -m pytest -q test_command_router.py
+"""
+
+import random
+import re
+
+from command_router import CommandRouter, ROUTING_TABLE, get_command_router
+
+def legacy_main_tool(user_input: str):
+    """Copia de las reglas de process_command (main.py), sin ejecutar las herramientas"""
+    user_input_strip = user_input.strip().lower()
+
+    if user_input_strip in ["leer", "borrar", "descargar", "contar"]:
+        return "note"
+    if user_input_strip.startswith("guardar:") or user_input_strip.startswith("buscar:"):
+        return "note"
+
+    if any(phrase in user_input_strip for phrase in [
+        "listar plantillas", "listar datos", "plantilla", "rellenar:", "analizar plantilla",
+        "crear ejemplo datos", "usar plantilla:", "convertir a json"
+    ]):
+        return "document_filler"
+
+    if any(phrase in user_input_strip for phrase in [
+        "listar espectros", "limpiar:", "analizar:", "comparar:", "exportar:",
+        "espectro", "espectros", "limpiar auto:", "métodos rmn"
+    ]):
+        return "rmn_spectrum_cleaner"
+
+    if (user_input_strip in ["status", "debug", "test", "probar", "resumen", "start", "iniciar", "stop", "detener"]) or \
+    any(phrase in user_input_strip for phrase in [
+        "listar notificaciones", "listar papers", "listar patentes", "listar emails",
+        "activar emails", "activar patentes", "activar papers",
+        "desactivar emails", "desactivar patentes", "desactivar papers"
+    ]) or \
+    user_input_strip.startswith("keywords") or \
+    user_input_strip.startswith("categories:") or \
+    user_input_strip.startswith("borrar notif"):
+        return "notifications"
+
+    if any(keyword in user_input_strip for keyword in ["generar", "genera", "crear codigo"]):
+        return "code_gen"
+
+    return None
+
+def legacy_agent_tool(prompt: str):
+    """Copia de las reglas de ask_gemini_for_tool (agent.py), sin la consulta a Gemini"""
+    prompt_lower = prompt.lower().strip()
+
+    if re.match(r"(https?://[^\s]+)", prompt.strip()):
+        return "web_open"
+    if re.match(r"^[0-9\s\+\-\*/\(\)\.]+$", prompt_lower):
+        return "calculator"
+    if "||" in prompt:
+        return "save_code"
+
+    for tool, commands in [
+        ("document_filler", ["analizar:", "rellenar:", "rellenar auto:", "usar plantilla:", "crear ejemplo datos:",
+                             "convertir a json:", "ver mapeo:", "crear mapeo:", "listar plantillas", "listar datos",
+                             "listar mapeos"]),
+        ("rmn_spectrum_cleaner", ["limpiar:", "comparar:", "exportar:", "listar espectros"]),
+        ("ayudas_manager", ["ayudas buscar", "ayudas filtrar", "ayudas activar"]),
+        ("notifications", ["status", "debug", "resumen", "test", "listar notificaciones", "listar papers",
+                           "listar patentes", "listar emails", "activar emails", "activar patentes",
+                           "activar papers", "keywords patentes:", "keywords papers:", "borrar notificaciones"]),
+    ]:
+        for cmd in commands:
+            if prompt_lower.startswith(cmd) or prompt_lower == cmd:
+                return tool
+
+    if any(k in prompt_lower for k in ["generar", "genera", "crear codigo", "escribe codigo"]):
+        return "code_gen"
+
+    if any(word in prompt_lower for word in ["plantilla", "plantillas", "mapeo", "rellenar", "documento"]):
+        return "document_filler"
+    if any(word in prompt_lower for word in ["espectro", "espectros", "rmn", "nmr", "savgol", "gaussian", "línea base", "snr", "ppm"]):
+        return "rmn_spectrum_cleaner"
+    if any(word in prompt_lower for word in ["subvención", "subvenciones", "beca", "becas", "convocatoria", "financiación", "ayuda"]):
+        return "ayudas_manager"
+
+    return None
+
+def legacy_tool(text: str):
+    return legacy_main_tool(text) or legacy_agent_tool(text)
+
+def routed_tool(router: CommandRouter, text: str):
+    route = router.route(text)
+    return route.tool if route else None
+
+# Frases de la tabla (y en mayúsculas), trozos de URL y de operaciones, ruido
+PHRASES = sorted({p for _, kind, patterns in ROUTING_TABLE if kind != 'regex' for p in patterns})
+FRAGMENTS = PHRASES + [p.upper() for p in PHRASES] + [
+    'http://', 'https://', 'HTTP://', 'Https://', 'x.com', '/ruta',
+    '1', '23', '+', '-', '*', '/', '(', ')', '.', '||', '|',
+    ' ', ' ', ' ', '\t', '\n', ':', 'a', 'hola', 'é', 'İ',
+]
+
+def random_command(rng: random.Random) -> str:
+    return ''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 6)))
+
+def test_router_matches_legacy_examples():
+    router = get_command_router()
+    for text in ['HTTP://example.com', 'http://example.com', '  https://a.b/C  ', 'ver http://x.com',
+                 '2 + 3 * (4 - 1)', '2 + x', 'def f(): pass || f.py', 'a | b',
+                 'status', ' STATUS ', 'status x', 'test', 'test x', 'testear', 'leer', 'leer notas',
+                 'guardar: comprar pan', 'ayudas buscar', 'ayudas filtrar: tecnología', 'beca',
+                 'limpiar: espectro.csv', 'analizar: plantilla.docx', 'keywords patentes: pfas',
+                 'genera una función', '', '   ', 'qué tiempo hace']:
+        assert routed_tool(router, text) == legacy_tool(text), repr(text)
+
+def test_url_keeps_original_case():
+    router = CommandRouter()
+    assert routed_tool(router, 'http://example.com') == 'web_open'
+    assert routed_tool(router, 'HTTP://example.com') is None
+
+def test_exact_and_prefix_rules():
+    router = CommandRouter()
+    # 'status' exacto es de main.py; con más texto lo recoge el prefijo de agent.py
+    assert router.route('status').kind == 'exact'
+    assert router.route('status x').kind == 'prefix'
+    assert routed_tool(router, 'test x') == 'notifications'
+    assert routed_tool(router, 'probar x') is None
+
+def test_router_matches_legacy_randomized():
+    rng = random.Random(41)
+    router = CommandRouter()
+    for _ in range(20000):
+        text = random_command(rng)
+        assert routed_tool(router, text) == legacy_tool(text), repr(text)
+
+if __name__ == "__main__":
+    test_router_matches_legacy_examples()
+    test_url_keeps_original_case()
+    test_exact_and_prefix_rules()
+    test_router_matches_legacy_randomized()
+    print("✅ CommandRouter coincide con las cascadas de main.py y agent.py")
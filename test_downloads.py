@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Cabeceras condicionales y peticiones parciales de downloads.file_response:
+Range (206/416), If-Range, If-None-Match (304).
+
+    python -m pytest -q test_downloads.py
+"""
+
+import pytest
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from downloads import file_response, parse_range
+
+CONTENT = b'0123456789'
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    # La cache de variantes comprimidas (cache/compressed) se crearía en el cwd
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'short.txt').write_bytes(CONTENT)
+    (tmp_path / 'empty.txt').write_bytes(b'')
+
+    async def download(request: Request):
+        return await file_response(request.headers, str(tmp_path / request.path_params['name']))
+
+    app = Starlette(routes=[Route('/{name}', download)])
+    # identity: sin variante comprimida, los tramos son de los bytes del archivo
+    return TestClient(app, headers={'accept-encoding': 'identity'})
+
+def test_parse_range():
+    assert parse_range('bytes=2-4', 10) == (2, 5)
+    assert parse_range('bytes=8-', 10) == (8, 10)
+    assert parse_range('bytes=-3', 10) == (7, 10)
+    assert parse_range('bytes=-30', 10) == (0, 10)
+    assert parse_range('bytes=0-1,4-5', 10) is None
+    assert parse_range('items=0-1', 10) is None
+    for value, size in [('bytes=-3', 0), ('bytes=-0', 10), ('bytes=10-', 10), ('bytes=5-2', 10)]:
+        with pytest.raises(ValueError):
+            parse_range(value, size)
+
+def test_suffix_range_on_empty_file_is_416(client):
+    response = client.get('/empty.txt', headers={'range': 'bytes=-5'})
+    assert response.status_code == 416
+    assert response.headers['content-range'] == 'bytes */0'
+
+def test_suffix_range_longer_than_file_returns_whole_file(client):
+    response = client.get('/short.txt', headers={'range': 'bytes=-50'})
+    assert response.status_code == 206
+    assert response.headers['content-range'] == 'bytes 0-9/10'
+    assert response.content == CONTENT
+
+def test_suffix_range(client):
+    response = client.get('/short.txt', headers={'range': 'bytes=-3'})
+    assert response.status_code == 206
+    assert response.headers['content-range'] == 'bytes 7-9/10'
+    assert response.content == b'789'
+
+def test_open_range_past_eof_is_416(client):
+    response = client.get('/short.txt', headers={'range': 'bytes=10-'})
+    assert response.status_code == 416
+    assert response.headers['content-range'] == 'bytes */10'
+
+def test_multi_range_falls_back_to_full_response(client):
+    response = client.get('/short.txt', headers={'range': 'bytes=0-1,4-5'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+def test_unknown_range_unit_returns_full_response(client):
+    response = client.get('/short.txt', headers={'range': 'items=0-1'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
+
+def test_if_none_match_hit_is_304(client):
+    etag = client.get('/short.txt').headers['etag']
+    response = client.get('/short.txt', headers={'if-none-match': etag})
+    assert response.status_code == 304
+    assert response.content == b''
+    assert client.get('/short.txt', headers={'if-none-match': 'W/' + etag}).status_code == 304
+    assert client.get('/short.txt', headers={'if-none-match': '"otro"'}).status_code == 200
+
+def test_if_range_with_current_etag_is_partial(client):
+    etag = client.get('/short.txt').headers['etag']
+    response = client.get('/short.txt', headers={'range': 'bytes=0-3', 'if-range': etag})
+    assert response.status_code == 206
+    assert response.content == b'0123'
+
+def test_if_range_with_stale_etag_returns_full_file(client):
+    response = client.get('/short.txt', headers={'range': 'bytes=0-3', 'if-range': '"a-0"'})
+    assert response.status_code == 200
+    assert response.content == CONTENT
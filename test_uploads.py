@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Límites de subida: UploadLimitMiddleware (413 por Content-Length y a mitad
+de un cuerpo chunked) y save_upload (sin .part sueltos si falla o se cancela).
+
+    python -m pytest -q test_uploads.py
+"""
+
+import asyncio
+import io
+import os
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from starlette.datastructures import UploadFile as StarletteUploadFile
+from starlette.testclient import TestClient
+
+import uploads
+from blob_store import BlobStore
+from uploads import MULTIPART_OVERHEAD, UploadLimitMiddleware, UploadTooLargeError, save_upload
+
+MAX_BYTES = 1000
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = BlobStore(root=str(tmp_path / 'blobs'), db_file=str(tmp_path / 'blobs.db'))
+    monkeypatch.setattr(uploads, 'get_blob_store', lambda: store)
+    return store
+
+@pytest.fixture
+def app(tmp_path, store):
+    app = FastAPI()
+    app.state.calls = 0
+    directory = str(tmp_path / 'uploads')
+    os.makedirs(directory)
+
+    @app.post('/upload')
+    async def upload(file: UploadFile = File(...)):
+        app.state.calls += 1
+        saved = await save_upload(file, directory, file.filename, max_bytes=MAX_BYTES)
+        return {'success': True, 'size': saved['size']}
+
+    app.add_middleware(UploadLimitMiddleware, limits={'/upload': MAX_BYTES})
+    return app
+
+def multipart(content: bytes, boundary: str = 'limite') -> bytes:
+    return (f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="a.txt"\r\n'
+            f'Content-Type: text/plain\r\n\r\n').encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+
+def leftover_parts(store: BlobStore) -> list:
+    return [name for name in os.listdir(store.tmp_dir) if name.endswith('.part')]
+
+def test_upload_within_limit(app, store):
+    response = TestClient(app).post('/upload', files={'file': ('a.txt', b'x' * MAX_BYTES)})
+    assert response.status_code == 200
+    assert response.json() == {'success': True, 'size': MAX_BYTES}
+    assert leftover_parts(store) == []
+
+def test_content_length_over_limit_is_413_before_the_endpoint(app):
+    response = TestClient(app).post('/upload', files={'file': ('a.txt', b'x' * (MAX_BYTES + MULTIPART_OVERHEAD + 1))})
+    assert response.status_code == 413
+    assert response.json()['success'] is False
+    assert app.state.calls == 0
+
+def test_chunked_body_over_limit_is_413(app, store):
+    body = multipart(b'x' * (MAX_BYTES + MULTIPART_OVERHEAD + 1))
+
+    def chunks():
+        # Sin Content-Length: el middleware tiene que contar lo recibido
+        for start in range(0, len(body), 8192):
+            yield body[start:start + 8192]
+
+    response = TestClient(app).post('/upload', content=chunks(),
+                                    headers={'content-type': 'multipart/form-data; boundary=limite'})
+    assert response.status_code == 413
+    assert response.json()['success'] is False
+    assert app.state.calls == 0
+    assert leftover_parts(store) == []
+
+def test_file_over_limit_inside_multipart_margin_is_rejected_by_save_upload(app, store):
+    # El cuerpo cabe en el margen multipart del middleware: lo corta save_upload
+    # y el middleware convierte su UploadTooLargeError en el mismo 413
+    response = TestClient(app).post('/upload', files={'file': ('a.txt', b'x' * (MAX_BYTES + 1))})
+    assert response.status_code == 413
+    assert app.state.calls == 1
+    assert leftover_parts(store) == []
+
+def test_save_upload_removes_part_when_too_large(tmp_path, store):
+    file = StarletteUploadFile(io.BytesIO(b'x' * (MAX_BYTES + 1)), filename='a.txt')
+    with pytest.raises(UploadTooLargeError):
+        asyncio.run(save_upload(file, str(tmp_path), 'a.txt', max_bytes=MAX_BYTES, chunk_size=100))
+    assert leftover_parts(store) == []
+    assert not os.path.exists(tmp_path / 'a.txt')
+
+def test_save_upload_removes_part_on_read_error(tmp_path, store):
+    class BrokenFile:
+        size = None
+        async def read(self, size):
+            raise OSError('conexión perdida')
+
+    with pytest.raises(OSError):
+        asyncio.run(save_upload(BrokenFile(), str(tmp_path), 'a.txt', max_bytes=MAX_BYTES))
+    assert leftover_parts(store) == []
+
+def test_save_upload_removes_part_on_cancel(tmp_path, store):
+    class StalledFile:
+        size = None
+        def __init__(self):
+            self.sent = False
+        async def read(self, size):
+            if not self.sent:
+                self.sent = True
+                return b'x' * 10
+            await asyncio.sleep(3600)
+
+    async def cancelled_upload():
+        task = asyncio.create_task(save_upload(StalledFile(), str(tmp_path), 'a.txt', max_bytes=MAX_BYTES))
+        await asyncio.sleep(0.1)
+        assert leftover_parts(store)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(cancelled_upload())
+    assert leftover_parts(store) == []
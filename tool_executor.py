@@ -0,0 +1,256 @@
+# tool_executor.py - EJECUCIÓN DE HERRAMIENTAS FUERA DEL EVENT LOOP
+"""
+Las herramientas (use_tool, scrapers, Gemini, RMN...) son síncronas. Si se
+llaman directamente desde un endpoint async, una sola petición lenta bloquea
+a todos los usuarios del worker de uvicorn.
+
+ToolExecutor las despacha a pools dimensionados:
+  - hilos para lo que espera red o disco (scrapers, Gemini, notas...)
+  - procesos para el cálculo numérico (limpieza de espectros RMN)
+  - el propio event loop para las que ya son asíncronas (run_async, p.ej. ayudas)
+
+con un límite de ejecuciones simultáneas y un timeout por herramienta.
+
+Las llamadas en hilo heredan el contexto (contextvars) de la petición, p.ej.
+el user_id de tools/notifications.py. Los procesos no: la traza vuelve con el
+resultado y el progreso del trabajo en curso llega por una cola del Manager
+de multiprocessing, que un hilo del padre reenvía a jobs.
+"""
+import asyncio
+import contextvars
+import functools
+import importlib
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from jobs import current_job_id, get_job_manager, progress_sink
+from metrics import get_metrics
+from tracing import get_tracer, span
+
+logger = logging.getLogger(__name__)
+
+TOOL_CALLS = get_metrics().counter('tool_calls_total', 'Ejecuciones de herramientas', ['tool', 'outcome'])
+TOOL_SECONDS = get_metrics().histogram('tool_seconds', 'Duración de cada ejecución de herramienta', ['tool'])
+TOOL_QUEUE_SECONDS = get_metrics().histogram('tool_queue_seconds', 'Espera por un hueco de concurrencia', ['tool'])
+
+# Ejecuciones simultáneas por herramienta (el resto espera turno)
+TOOL_CONCURRENCY = {
+    'gemini': 8,
+    'rmn_spectrum_cleaner': 2,
+    'ayudas_manager': 4,
+    'patents': 4,
+    'papers': 4,
+    'code_gen': 4,
+}
+DEFAULT_CONCURRENCY = 8
+
+# Segundos máximos por ejecución
+TOOL_TIMEOUTS = {
+    'gemini': 30,
+    'rmn_spectrum_cleaner': 180,
+    'ayudas_manager': 120,
+    'patents': 120,
+    'papers': 60,
+    'code_gen': 90,
+}
+DEFAULT_TIMEOUT = 60
+
+
+class ToolTimeoutError(TimeoutError):
+    """La herramienta no ha terminado dentro de su timeout"""
+
+
+def _call_in_process(module_name: str, attr_path: str, args: tuple,
+                     trace_context: Optional[Tuple[str, str]] = None,
+                     progress: Optional[Tuple[Any, str]] = None) -> Tuple[Any, List[Tuple]]:
+    """
+    Punto de entrada en el proceso hijo: importa el módulo y llama a la
+    función. Devuelve (resultado, spans) para que el padre los añada a su traza.
+    ``progress`` = (cola, job_id) si la llamada forma parte de un trabajo.
+    """
+    sink = None
+    if progress is not None:
+        progress_queue, job_id = progress
+        sink = lambda value, message: progress_queue.put((job_id, value, message))
+
+    spans: List[Tuple] = []
+    with get_tracer().continue_trace(trace_context, spans), progress_sink(sink):
+        with span('process_call', module=module_name, function=attr_path, pid=os.getpid()):
+            target = importlib.import_module(module_name)
+            for attr in attr_path.split('.'):
+                target = getattr(target, attr)
+            result = target(*args)
+    return result, spans
+
+
+class ToolExecutor:
+    """Pools de hilos y procesos compartidos por todas las peticiones"""
+
+    def __init__(self, thread_workers: int = 16, process_workers: int = 2):
+        self.thread_workers = thread_workers
+        self.process_workers = process_workers
+        self._threads = ThreadPoolExecutor(max_workers=thread_workers, thread_name_prefix='tool')
+        self._processes: Optional[ProcessPoolExecutor] = None
+        self._processes_lock = threading.Lock()
+        self._progress_manager = None
+        self._progress_queue = None
+        # Semáforos por (event loop, herramienta): asyncio los ata al loop
+        self._semaphores: Dict[tuple, asyncio.Semaphore] = {}
+
+    def _semaphore(self, tool: str) -> asyncio.Semaphore:
+        key = (id(asyncio.get_running_loop()), tool)
+        semaphore = self._semaphores.get(key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(TOOL_CONCURRENCY.get(tool, DEFAULT_CONCURRENCY))
+            self._semaphores[key] = semaphore
+        return semaphore
+
+    def _process_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.process_workers <= 0:
+            return None
+        with self._processes_lock:
+            if self._processes is None:
+                # spawn: no se heredan los hilos ni los sockets del servidor
+                self._processes = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                )
+            return self._processes
+
+    def _progress_channel(self):
+        """Cola (proxy del Manager, se puede pasar al hijo) y el hilo que la vacía, creados al primer uso"""
+        with self._processes_lock:
+            if self._progress_queue is None:
+                self._progress_manager = multiprocessing.get_context('spawn').Manager()
+                self._progress_queue = self._progress_manager.Queue()
+                threading.Thread(target=self._forward_progress, args=(self._progress_queue,),
+                                 name='tool-progress', daemon=True).start()
+            return self._progress_queue
+
+    @staticmethod
+    def _forward_progress(progress_queue):
+        while True:
+            try:
+                item = progress_queue.get()
+            except (EOFError, OSError, queue.Empty):
+                return
+            if item is None:
+                return
+            job_id, value, message = item
+            try:
+                get_job_manager().report_progress(job_id, value, message)
+            except Exception as e:
+                logger.debug("Progreso del trabajo %.8s no actualizado: %s", job_id, e)
+
+    async def _limited(self, tool: str, future_factory: Callable[[], Awaitable]) -> Any:
+        timeout = TOOL_TIMEOUTS.get(tool, DEFAULT_TIMEOUT)
+        queued = time.perf_counter()
+        # future_factory se llama dentro del span: el hilo o proceso cuelga de él
+        with span('executor', tool=tool) as current:
+            async with self._semaphore(tool):
+                start = time.perf_counter()
+                TOOL_QUEUE_SECONDS.observe(start - queued, tool=tool)
+                current.set('queue_ms', round((start - queued) * 1000, 1))
+                outcome = 'error'
+                try:
+                    result = await asyncio.wait_for(future_factory(), timeout)
+                    outcome = 'ok'
+                    return result
+                except asyncio.TimeoutError:
+                    outcome = 'timeout'
+                    # El hilo no se puede interrumpir: termina en segundo plano
+                    raise ToolTimeoutError(f"La herramienta '{tool}' no respondió en {timeout}s")
+                finally:
+                    TOOL_SECONDS.observe(time.perf_counter() - start, tool=tool)
+                    TOOL_CALLS.inc(tool=tool, outcome=outcome)
+
+    async def run(self, tool: str, func: Callable, *args, **kwargs) -> Any:
+        """Ejecuta una herramienta de E/S en el pool de hilos"""
+        loop = asyncio.get_running_loop()
+
+        def submit() -> asyncio.Future:
+            call = functools.partial(contextvars.copy_context().run, func, *args, **kwargs)
+            return loop.run_in_executor(self._threads, call)
+
+        return await self._limited(tool, submit)
+
+    async def run_async(self, tool: str, func: Callable[..., Awaitable], *args, **kwargs) -> Any:
+        """
+        Espera una herramienta asíncrona en el propio event loop, con el mismo
+        límite de concurrencia y timeout que las de hilo (sin ocupar un hilo)
+        """
+        return await self._limited(tool, lambda: func(*args, **kwargs))
+
+    async def run_cpu(self, tool: str, module_name: str, attr_path: str, *args) -> Any:
+        """
+        Ejecuta ``module_name.attr_path(*args)`` en el pool de procesos.
+        Si no hay procesos disponibles se usa el pool de hilos.
+        """
+        tracer = get_tracer()
+        pool = self._process_pool()
+        if pool is not None:
+            loop = asyncio.get_running_loop()
+            job_id = current_job_id()
+            progress = (self._progress_channel(), job_id) if job_id else None
+            try:
+                result, spans = await self._limited(tool, lambda: loop.run_in_executor(
+                    pool, _call_in_process, module_name, attr_path, args, tracer.current_context(), progress
+                ))
+                tracer.adopt(spans)
+                return result
+            except BrokenProcessPool:
+                logger.warning("⚠️ Pool de procesos caído, reintentando '%s' en hilo", tool)
+                with self._processes_lock:
+                    self._processes = None
+
+        result, spans = await self.run(
+            tool, lambda: _call_in_process(module_name, attr_path, args, tracer.current_context())
+        )
+        tracer.adopt(spans)
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            'thread_workers': self.thread_workers,
+            'process_workers': self.process_workers,
+            'process_pool_started': self._processes is not None,
+        }
+
+    def shutdown(self):
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        with self._processes_lock:
+            if self._processes is not None:
+                self._processes.shutdown(wait=False, cancel_futures=True)
+                self._processes = None
+            if self._progress_manager is not None:
+                self._progress_queue.put(None)
+                self._progress_manager.shutdown()
+                self._progress_manager = self._progress_queue = None
+
+
+# ========== INSTANCIA DE PROCESO ==========
+
+_executor: Optional[ToolExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_tool_executor() -> ToolExecutor:
+    """
+    Devuelve el ejecutor compartido. Tamaños configurables con
+    TOOL_THREAD_WORKERS y TOOL_PROCESS_WORKERS (0 = sin procesos).
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            cpus = os.cpu_count() or 1
+            _executor = ToolExecutor(
+                thread_workers=int(os.getenv('TOOL_THREAD_WORKERS', 16)),
+                process_workers=int(os.getenv('TOOL_PROCESS_WORKERS', min(2, cpus))),
+            )
+        return _executor
@@ -0,0 +1,135 @@
+# tool_registry.py - REGISTRO DE HERRAMIENTAS CON IMPORTACIÓN DIFERIDA
+"""
+Antes use_tool llamaba a importlib.import_module en cada comando y main.py
+importaba al arrancar document_filler (genai, docx, PyPDF2, pandas) y
+rmn_spectrum_cleaner (scipy, matplotlib, pandas): el arranque en frío pagaba
+todas las dependencias pesadas aunque nadie usara esas herramientas.
+
+ToolRegistry importa cada herramienta la primera vez que se usa y guarda su
+``run`` ya resuelto. Opcionalmente, un hilo de calentamiento las pre-importa
+justo después del arranque, sin retrasar el inicio del servidor. Se mide el
+tiempo de importación de cada módulo (ver /health).
+"""
+import importlib
+import logging
+import sys
+import threading
+import time
+from types import ModuleType
+from typing import Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Herramientas que elige el agente (su run recibe sólo el comando)
+TOOL_MODULES = {
+    "note": "tools.note",
+    "save_code": "tools.save_code",
+    "web_search": "tools.web_search",
+    "calculator": "tools.calculator",
+    "web_open": "tools.web_open",
+    "code_gen": "tools.code_gen",
+    "notifications": "tools.notifications",
+    "document_filler": "tools.document_filler",
+    "rmn_spectrum_cleaner": "tools.rmn_spectrum_cleaner",
+    "ayudas_manager": "tools.ayudas_manager"
+}
+
+# Herramientas cuyo run recibe el user_id explícitamente
+USER_TOOL_MODULES = {
+    "patents": "tools.patents_manager",
+    "papers": "tools.papers_manager",
+}
+
+# Herramientas con run_async: consultan las fuentes con los fetchers asíncronos
+# y se esperan en el event loop en lugar de ocupar un hilo del ToolExecutor
+ASYNC_TOOLS = {"ayudas_manager"}
+
+# Orden del calentamiento: primero lo que más tarda en importarse
+WARM_UP_ORDER = ["document_filler", "rmn_spectrum_cleaner", "ayudas_manager", "code_gen", "web_search"]
+
+
+class ToolRegistry:
+    """Módulos y funciones run de las herramientas, importados en el primer uso"""
+
+    def __init__(self, modules: Dict[str, str]):
+        self.modules = dict(modules)
+        self._loaded: Dict[str, ModuleType] = {}
+        self._runs: Dict[str, Callable] = {}
+        self.import_times: Dict[str, float] = {}
+        # Un lock por herramienta: importar pandas no bloquea a la calculadora
+        self._locks = {tool: threading.Lock() for tool in self.modules}
+        self._warm_up_thread: Optional[threading.Thread] = None
+
+    def module(self, tool: str) -> ModuleType:
+        """Módulo de la herramienta (lo importa la primera vez). KeyError si no existe."""
+        module = self._loaded.get(tool)
+        if module is not None:
+            return module
+
+        module_name = self.modules[tool]
+        with self._locks[tool]:
+            module = self._loaded.get(tool)
+            if module is None:
+                already_imported = module_name in sys.modules
+                start = time.perf_counter()
+                module = importlib.import_module(module_name)
+                elapsed = time.perf_counter() - start
+                if not already_imported:
+                    self.import_times[tool] = round(elapsed * 1000, 1)
+                    logger.info("📦 Herramienta %s importada en %.0f ms", tool, elapsed * 1000)
+                self._loaded[tool] = module
+        return module
+
+    def get(self, tool: str) -> Callable:
+        """Función run de la herramienta"""
+        run = self._runs.get(tool)
+        if run is None:
+            run = self._runs[tool] = self.module(tool).run
+        return run
+
+    def __contains__(self, tool: str) -> bool:
+        return tool in self.modules
+
+    def warm_up(self, tools: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """Importa las herramientas indicadas (todas por defecto); un fallo no detiene al resto"""
+        if tools is None:
+            tools = WARM_UP_ORDER + [t for t in self.modules if t not in WARM_UP_ORDER]
+        start = time.perf_counter()
+        for tool in tools:
+            if tool not in self.modules:
+                continue
+            try:
+                self.get(tool)
+            except Exception as e:
+                logger.warning("⚠️ No se pudo precargar la herramienta %s: %s", tool, e)
+        logger.info("🔥 Calentamiento de herramientas completado en %.1f s", time.perf_counter() - start)
+        return dict(self.import_times)
+
+    def start_warm_up(self) -> threading.Thread:
+        """Lanza warm_up en un hilo en segundo plano (una sola vez)"""
+        if self._warm_up_thread is None:
+            self._warm_up_thread = threading.Thread(target=self.warm_up, name='tool-warm-up', daemon=True)
+            self._warm_up_thread.start()
+        return self._warm_up_thread
+
+    def stats(self) -> Dict:
+        return {
+            'loaded': sorted(self._loaded),
+            'pending': sorted(set(self.modules) - set(self._loaded)),
+            'import_ms': dict(self.import_times),
+            'warming_up': bool(self._warm_up_thread and self._warm_up_thread.is_alive()),
+        }
+
+
+# ========== INSTANCIA DE PROCESO ==========
+
+_registry: Optional[ToolRegistry] = None
+_registry_lock = threading.Lock()
+
+def get_tool_registry() -> ToolRegistry:
+    """Devuelve el registro compartido (herramientas del agente y de usuario)"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ToolRegistry({**TOOL_MODULES, **USER_TOOL_MODULES})
+        return _registry
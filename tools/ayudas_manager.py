@@ -1,11 +1,16 @@
+import asyncio
 import json
+import re
 from datetime import datetime, timedelta
 import sys
 import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sources.ayudas_real import AyudasScraper
+from sources.ayudas_real import get_ayudas_scraper
+from sources.ayudas_store import get_ayudas_catalog
+from sources.source_health import CircuitOpenError
+from jobs import report_step
 from multi_user_notification_system import multi_user_system
 
 class AyudasManager:
@@ -14,7 +19,8 @@ class AyudasManager:
     """
     
     def __init__(self):
-        self.scraper = AyudasScraper()
+        self.scraper = get_ayudas_scraper()
+        self.catalog = get_ayudas_catalog()
     
     def run(self, command: str, user_id: str) -> str:
         """Procesa comandos de ayudas"""
@@ -35,54 +41,127 @@ class AyudasManager:
         else:
             return self.show_help()
     
-    def search_ayudas(self, user_id: str) -> str:
-        """Busca ayudas actuales"""
-        config = multi_user_system.get_user_config(user_id)
-        region = config.get('region', 'Euskadi')
-        
-        ayudas = self.scraper.get_all_ayudas(region)
-        
-        if not ayudas:
-            return "📭 No se encontraron ayudas nuevas"
+    async def run_async(self, command: str, user_id: str) -> str:
+        """
+        Como run, pero los comandos que consultan las fuentes esperan a los
+        fetchers asíncronos en el event loop en lugar de ocupar un hilo.
+        """
+        command = command.strip().lower()
         
+        if command == "ayudas buscar":
+            return await self.search_ayudas_async(user_id)
+        elif command.startswith("ayudas filtrar"):
+            return await self.filter_ayudas_async(command, user_id)
+        elif command == "ayudas test":
+            return await self.test_scraping_async()
+        # El resto sólo lee o escribe la configuración en SQLite
+        return await asyncio.to_thread(self.run, command, user_id)
+    
+    def refresh_catalog(self, region: str):
+        """
+        Refresca el catálogo si la región lleva tiempo sin consultarse.
+        No marca las ayudas como vistas: las notificaciones siguen recibiéndolas.
+        """
+        if self.catalog.is_stale(region):
+            self.scraper.get_all_ayudas(region, mark_seen=False, progress=report_step)
+    
+    async def refresh_catalog_async(self, region: str):
+        """Variante asíncrona de refresh_catalog (las fuentes se consultan a la vez)"""
+        if await asyncio.to_thread(self.catalog.is_stale, region):
+            await self.scraper.get_all_ayudas_async(region, mark_seen=False, progress=report_step)
+    
+    def _user_region(self, user_id: str) -> str:
+        return multi_user_system.get_user_config(user_id).get('region', 'Euskadi')
+    
+    def _search_catalog(self, region: str) -> list:
+        return self.catalog.search(region=region, limit=10) or self.scraper.generate_fallback_ayudas()
+    
+    def search_ayudas(self, user_id: str) -> str:
+        """Busca ayudas actuales en el catálogo"""
+        region = self._user_region(user_id)
+        self.refresh_catalog(region)
+        return self._format_search(region, self._search_catalog(region))
+    
+    async def search_ayudas_async(self, user_id: str) -> str:
+        region = await asyncio.to_thread(self._user_region, user_id)
+        await self.refresh_catalog_async(region)
+        ayudas = await asyncio.to_thread(self._search_catalog, region)
+        return self._format_search(region, ayudas)
+    
+    def _format_search(self, region: str, ayudas: list) -> str:
         result = f"💶 **AYUDAS DISPONIBLES EN {region.upper()}**\n\n"
         
         for i, ayuda in enumerate(ayudas[:10], 1):
             result += f"**{i}. {ayuda['titulo']}**\n"
             result += f"   🏛️ {ayuda['entidad']}\n"
-            result += f"   💰 Importe: {ayuda.get('importe', 'Consultar')}\n"
-            result += f"   📅 Límite: {ayuda.get('fecha_limite', 'No especificado')}\n"
+            result += f"   💰 Importe: {ayuda.get('importe') or 'Consultar'}\n"
+            result += f"   📅 Límite: {ayuda.get('fecha_limite') or 'No especificado'}\n"
             result += f"   🔗 [Ver más]({ayuda['url']})\n"
             result += f"   🏷️ {', '.join(ayuda.get('categorias', ['General']))}\n\n"
         
         return result
     
     def filter_ayudas(self, command: str, user_id: str) -> str:
-        """Filtra ayudas por criterios"""
+        """
+        Filtra ayudas por categoría/tipo, región y plazo.
+        
+        Formato: ayudas filtrar: [categoria] [region:X] [plazo:N días]
+        """
+        filter_type, region, deadline_days = self._parse_filter(command, user_id)
+        self.refresh_catalog(region)
+        return self._format_filter(filter_type, deadline_days,
+                                   self._filter_catalog(filter_type, region, deadline_days))
+    
+    async def filter_ayudas_async(self, command: str, user_id: str) -> str:
+        filter_type, region, deadline_days = await asyncio.to_thread(self._parse_filter, command, user_id)
+        await self.refresh_catalog_async(region)
+        ayudas = await asyncio.to_thread(self._filter_catalog, filter_type, region, deadline_days)
+        return self._format_filter(filter_type, deadline_days, ayudas)
+    
+    def _parse_filter(self, command: str, user_id: str) -> tuple:
+        """(categoría, región, días de plazo) del comando; la región por defecto es la del usuario"""
         # Extraer filtro
-        if ":" in command:
-            filter_type = command.split(":")[1].strip()
-        else:
-            filter_type = "todas"
+        filter_text = command.split(":", 1)[1].strip() if ":" in command else "todas"
         
         config = multi_user_system.get_user_config(user_id)
         region = config.get('region', 'Euskadi')
         
-        ayudas = self.scraper.get_all_ayudas(region)
+        region_match = re.search(r'region:\s*(\w+)', filter_text)
+        if region_match:
+            region = region_match.group(1)
+            filter_text = filter_text.replace(region_match.group(0), '')
         
-        # Aplicar filtro
-        if filter_type != "todas":
-            ayudas = [a for a in ayudas if filter_type.lower() in a.get('tipo', '').lower() 
-                     or any(filter_type.lower() in cat.lower() for cat in a.get('categorias', []))]
+        deadline_days = None
+        plazo_match = re.search(r'plazo:\s*(\d+)', filter_text)
+        if plazo_match:
+            deadline_days = int(plazo_match.group(1))
+            filter_text = filter_text.replace(plazo_match.group(0), '')
         
+        filter_type = filter_text.strip() or "todas"
+        return filter_type, region, deadline_days
+    
+    def _filter_catalog(self, filter_type: str, region: str, deadline_days) -> list:
+        return self.catalog.search(
+            region=region,
+            category=None if filter_type == "todas" else filter_type,
+            deadline_days=deadline_days,
+            limit=5
+        )
+    
+    def _format_filter(self, filter_type: str, deadline_days, ayudas: list) -> str:
         if not ayudas:
             return f"📭 No se encontraron ayudas con filtro '{filter_type}'"
         
-        result = f"🔍 **AYUDAS FILTRADAS: {filter_type.upper()}**\n\n"
+        result = f"🔍 **AYUDAS FILTRADAS: {filter_type.upper()}**"
+        if deadline_days is not None:
+            result += f" (plazo en {deadline_days} días)"
+        result += "\n\n"
         
-        for i, ayuda in enumerate(ayudas[:5], 1):
+        for i, ayuda in enumerate(ayudas, 1):
             result += f"**{i}. {ayuda['titulo']}**\n"
             result += f"   Tipo: {ayuda['tipo']} | {ayuda['entidad']}\n"
+            if ayuda.get('fecha_limite'):
+                result += f"   📅 Límite: {ayuda['fecha_limite']}\n"
             result += f"   🔗 {ayuda['url']}\n\n"
         
         return result
@@ -132,54 +211,62 @@ class AyudasManager:
             return "❌ Error configurando categorías"
     
     def test_scraping(self) -> str:
-        """Prueba el sistema de scraping"""
+        """Prueba cada fuente del scraper y muestra su estado de salud"""
+        sources = list(self.scraper.source_pages)
+        checks = []
+        for step, source in enumerate(sources):
+            report_step(step, len(sources), f"Probando {source}")
+            try:
+                # Sin reutilizar la última descarga: se quiere saber si la fuente responde ahora
+                checks.append((source, self.scraper.get_candidates(source, force_refresh=True)))
+            except Exception as e:
+                checks.append((source, e))
+        return self._format_test(checks)
+    
+    async def test_scraping_async(self) -> str:
+        """Como test_scraping, con todas las fuentes probándose a la vez"""
+        sources = list(self.scraper.source_pages)
+        done = 0
+        
+        async def check(source: str):
+            nonlocal done
+            try:
+                return await self.scraper.get_candidates_async(source, force_refresh=True)
+            finally:
+                done += 1
+                report_step(done, len(sources), f"Probada {source}")
+        
+        results = await asyncio.gather(*(check(source) for source in sources), return_exceptions=True)
+        return self._format_test(list(zip(sources, results)))
+    
+    def _format_test(self, checks: list) -> str:
+        """checks: (fuente, items o la excepción que lanzó)"""
         result = "🧪 **TEST DEL SISTEMA DE AYUDAS**\n\n"
+        total_working = 0
         
-        sources_status = {
-            'Euskadi RSS': False,
-            'Gipuzkoa API': False,
-            'BDNS Estado': False,
-            'SPRI': False
-        }
+        for source, items in checks:
+            if isinstance(items, CircuitOpenError):
+                status = False
+                detail = "circuito abierto"
+            elif isinstance(items, Exception):
+                status = False
+                detail = str(items)[:80]
+            else:
+                status = items is not None
+                detail = f"{len(items)} items" if status else "respuesta no válida"
+            
+            health = self.scraper.health.get(source).snapshot()
+            icon = "✅" if status else ("⏸️" if health['state'] != 'closed' else "❌")
+            total_working += status
+            
+            result += f"{icon} {source}: {'Funcionando' if status else 'Error'} ({detail})\n"
+            if health['latency_p50_ms'] is not None:
+                result += f"   ⏱️ p50 {health['latency_p50_ms']} ms | errores {health['error_rate']:.0%}"
+                if health['state'] != 'closed':
+                    result += f" | reintento en {health['retry_in_s']}s"
+                result += "\n"
         
-        # Test Euskadi
-        try:
-            ayudas = self.scraper.scrape_euskadi_rss()
-            if ayudas:
-                sources_status['Euskadi RSS'] = True
-        except:
-            pass
-        
-        # Test Gipuzkoa
-        try:
-            ayudas = self.scraper.scrape_gipuzkoa_api()
-            if ayudas:
-                sources_status['Gipuzkoa API'] = True
-        except:
-            pass
-        
-        # Test Estado
-        try:
-            ayudas = self.scraper.scrape_estado_bdns()
-            if ayudas:
-                sources_status['BDNS Estado'] = True
-        except:
-            pass
-        
-        # Test SPRI
-        try:
-            ayudas = self.scraper.scrape_spri()
-            if ayudas:
-                sources_status['SPRI'] = True
-        except:
-            pass
-        
-        for source, status in sources_status.items():
-            icon = "✅" if status else "❌"
-            result += f"{icon} {source}: {'Funcionando' if status else 'Error'}\n"
-        
-        total_working = sum(sources_status.values())
-        result += f"\n📊 **Resumen:** {total_working}/{len(sources_status)} fuentes operativas"
+        result += f"\n📊 **Resumen:** {total_working}/{len(checks)} fuentes operativas"
         
         return result
     
@@ -192,6 +279,8 @@ class AyudasManager:
 
 - `ayudas buscar` - Buscar ayudas actuales
 - `ayudas filtrar: [tipo]` - Filtrar por tipo/categoría
+- `ayudas filtrar: [tipo] plazo: 30` - Sólo las que cierran en 30 días
+- `ayudas filtrar: [tipo] region: bizkaia` - Filtrar en otra región
 - `ayudas activar` - Activar notificaciones
 - `ayudas region: [region]` - Configurar región
 - `ayudas categorias: cat1, cat2` - Configurar intereses
@@ -228,4 +317,15 @@ def run(prompt: str) -> str:
     except:
         pass
     
-    return ayudas_manager.run(prompt, user_id)
\ No newline at end of file
+    return ayudas_manager.run(prompt, user_id)
+
+async def run_async(prompt: str) -> str:
+    """Como run, para llamarla desde el event loop (CommandHandler.run_tool)"""
+    user_id = "user_default"
+    try:
+        from tools.notifications import get_current_user_id
+        user_id = get_current_user_id()
+    except:
+        pass
+    
+    return await ayudas_manager.run_async(prompt, user_id)
\ No newline at end of file
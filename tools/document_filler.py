@@ -1,5 +1,7 @@
 import os
 import json
+import hashlib
+import logging
 from datetime import datetime
 from dotenv import load_dotenv
 import google.generativeai as genai
@@ -9,6 +11,10 @@ import pandas as pd
 from pathlib import Path
 import re
 import unidecode # Necesario para la normalización de nombres
+from blob_store import get_blob_store
+from tracing import span, traced
+
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
@@ -52,7 +58,7 @@ class DocumentFiller:
             with open(filepath, 'r', encoding='utf-8') as f:
                 return json.load(f)
         except Exception as e:
-            print(f"Error cargando mapeo {filename}: {e}")
+            logger.error("❌ Error cargando mapeo %s: %s", filename, e)
             return None
     
     def create_default_mapping(self) -> dict:
@@ -84,7 +90,7 @@ class DocumentFiller:
             with open(filepath, 'w', encoding='utf-8') as f:
                 json.dump(default, f, indent=2, ensure_ascii=False)
         except Exception as e:
-            print(f"Error guardando mapeo default: {e}")
+            logger.error("❌ Error guardando mapeo default: %s", e)
         
         return default
     
@@ -94,10 +100,10 @@ class DocumentFiller:
         
         # PRIORIDAD 1: Usar la elección explícita del usuario
         if doc_type == 'detailed':
-            print("✅ Usando mapeo para documentos detallados (EIC) por elección del usuario.")
+            logger.debug("✅ Usando mapeo para documentos detallados (EIC) por elección del usuario.")
             return self.load_mapping_file('mapeo_eic_detallado.json')
         if doc_type == 'summary':
-            print("✅ Usando mapeo para resúmenes (PFAS) por elección del usuario.")
+            logger.debug("✅ Usando mapeo para resúmenes (PFAS) por elección del usuario.")
             return self.load_mapping_file('mapeo_resumen_corto.json')
 
         # Buscar en cache primero
@@ -122,19 +128,19 @@ class DocumentFiller:
             pattern = mapping.get('_metadata', {}).get('template_pattern', '')
             if pattern:
                 if re.search(pattern, template_lower):
-                    print(f"✅ Usando mapeo: {mapping_file}")
+                    logger.debug("✅ Usando mapeo: %s", mapping_file)
                     self.mappings_cache[template_name] = mapping
                     return mapping
             
             # O si el nombre del mapping coincide con el nombre de la plantilla
             mapping_name = mapping_file.replace('.json', '')
             if mapping_name in template_lower or template_lower.replace('.docx', '').replace('.txt', '') in mapping_name:
-                print(f"✅ Usando mapeo: {mapping_file}")
+                logger.debug("✅ Usando mapeo: %s", mapping_file)
                 self.mappings_cache[template_name] = mapping
                 return mapping
         
         # Si no encuentra, usar default
-        print(f"⚠️ Usando mapeo por defecto")
+        logger.debug("⚠️ Usando mapeo por defecto")
         return self.default_mapping
     
     def list_mappings(self) -> str:
@@ -364,7 +370,7 @@ class DocumentFiller:
 
             return True
         except Exception as e:
-            print(f"Error guardando base de datos: {e}")
+            logger.error("❌ Error guardando base de datos: %s", e)
             return False
     
     def update_master_database(self, updates: dict) -> str:
@@ -685,6 +691,7 @@ class DocumentFiller:
         
         return field_normalized
 
+    @traced()
     def auto_fill_with_database(self, filename: str, doc_type: str = None) -> str:
         """Rellena plantilla automáticamente con base de datos maestra"""
         try:
@@ -692,6 +699,21 @@ class DocumentFiller:
             if not os.path.exists(file_path):
                 return f"❌ No se encontró la plantilla: {filename}"
 
+            # 0. Misma plantilla (por contenido), mismo mapeo, misma base de datos y
+            #    mismo día → el documento ya generado (sin volver a llamar a la IA)
+            store = get_blob_store()
+            content_hash = store.content_hash(file_path)
+            cache_params = {
+                'doc_type': doc_type,
+                'mapping': self._fingerprint(self.detect_mapping_for_template(filename, doc_type)),
+                'database': self._fingerprint(self.user_database),
+                'fecha': datetime.now().strftime("%d/%m/%Y"),
+            }
+            cached = store.get_derived('docs.auto_fill', content_hash, cache_params)
+            if cached:
+                cached['template'] = filename
+                return cached
+
             # 1. Cargar plantilla y extraer texto
             text_content = self.extract_text_from_file(file_path)
             
@@ -704,7 +726,7 @@ class DocumentFiller:
             if not campos_necesarios:
                 return "❌ No se detectaron campos en la plantilla"
             
-            # print(f"📋 Campos detectados: {campos_necesarios}")
+            logger.debug("📋 Campos detectados: %s", campos_necesarios)
             
             # 3. Normalizar y mapear campos a datos reales
             datos_mapeados = {}
@@ -719,10 +741,10 @@ class DocumentFiller:
                 if valor:
                     # Guardar con el nombre ORIGINAL del campo (para el reemplazo)
                     datos_mapeados[campo] = valor
-                    # print(f"✅ {campo} → {valor[:50]}...")
+                    logger.debug("✅ %s → %.50s...", campo, valor)
                 else:
                     campos_sin_mapear.append(campo_normalizado)
-                    # print(f"⚠️ {campo} → No encontrado en BD")
+                    logger.debug("⚠️ %s → No encontrado en BD", campo)
             
             # 4. Completar campos faltantes con IA
             # Esta sección genera el contenido para los campos que no se encontraron,
@@ -733,7 +755,7 @@ class DocumentFiller:
                 campos_a_pedir_ia = [c for c in campos_sin_mapear if c != 'texto_texto'] 
                 
                 if campos_a_pedir_ia:
-                    # print(f"🤖 Usando IA para {len(campos_a_pedir_ia)} campos...")
+                    logger.debug("🤖 Usando IA para %d campos...", len(campos_a_pedir_ia))
                     datos_ia = self._generate_realistic_data_with_ai(
                         text_content, 
                         campos_a_pedir_ia,
@@ -770,7 +792,7 @@ class DocumentFiller:
             desde_bd = total_campos - len(campos_sin_mapear)
             desde_ia = len(campos_sin_mapear)
             
-            return {
+            summary = {
                 "success": True,
                 "message": "✅ Documento generado automáticamente",
                 "output_file": output_filename, 
@@ -781,6 +803,10 @@ class DocumentFiller:
                 "campos_bd": [campo for campo in datos_mapeados.keys() if self.normalize_field_name(campo) not in campos_sin_mapear][:10],
                 "campos_ia": campos_sin_mapear[:5] if campos_sin_mapear else []
             }
+            output_path = os.path.join(OUTPUT_DIR, output_filename)
+            if os.path.exists(output_path):
+                store.put_derived('docs.auto_fill', content_hash, cache_params, summary, [output_path])
+            return summary
             
         except Exception as e:
             import traceback
@@ -791,6 +817,13 @@ class DocumentFiller:
                 "message": f"❌ Error en rellenado automático: {e}"
             }
               
+    @staticmethod
+    def _fingerprint(data) -> str:
+        """Hash estable de un dict (mapeo o base de datos) para las claves de cache"""
+        serialized = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
+
+    @traced()
     def _generate_realistic_data_with_ai(self, template_text: str, campos: list, filename: str) -> dict:
         """Usa Gemini para generar datos realistas para campos faltantes"""
         try:
@@ -813,7 +846,8 @@ Usa formato español, lenguaje técnico-profesional apropiado para proyectos de
 Para campos de texto largo, genera textos de al menos 150 palabras.
 Para campos de tabla, genera valores coherentes (ej. ID, tipo, descripción).
 """
-            response = self.model.generate_content(prompt)
+            with span('gemini.generate', purpose='document_fill', fields=len(campos)):
+                response = self.model.generate_content(prompt)
             response_text = response.text.strip()
             
             # Extraer JSON
@@ -826,11 +860,12 @@ Para campos de tabla, genera valores coherentes (ej. ID, tipo, descripción).
             return datos
             
         except Exception as e:
-            print(f"⚠️ Error con IA: {e}, usando valores genéricos")
+            logger.warning("⚠️ Error con IA: %s, usando valores genéricos", e)
             return {campo: f"[Completar {campo}]" for campo in campos}
 
     # ============= EXTRACCIÓN DE TEXTO =============
     
+    @traced()
     def extract_text_from_file(self, file_path: str) -> str:
         """Extrae texto de diferentes formatos"""
         try:
@@ -880,6 +915,7 @@ Para campos de tabla, genera valores coherentes (ej. ID, tipo, descripción).
 
     # ============= RELLENADO DE DOCUMENTOS =============
     
+    @traced()
     def fill_txt(self, template_path: str, data: dict, output_name: str) -> str:
         """Rellena documento TXT"""
         try:
@@ -930,6 +966,7 @@ Para campos de tabla, genera valores coherentes (ej. ID, tipo, descripción).
         except Exception as e:
             return f"❌ Error procesando TXT: {e}"
     
+    @traced()
     def fill_docx(self, template_path: str, data: dict, output_name: str) -> str:
         """Rellena documento DOCX"""
         try:
@@ -1382,6 +1419,7 @@ ver datos redes
         except Exception as e:
             return f"❌ Error: {e}"
     
+    @traced()
     def fill_document(self, command: str) -> str:
         """Rellena documento con archivo de datos específico"""
         try:
@@ -1445,7 +1483,7 @@ ver datos redes
 
             return {}
         except Exception as e:
-            print(f"Error cargando datos: {e}")
+            logger.error("❌ Error cargando datos: %s", e)
             return {}
     
     def copy_default_template(self, filename: str) -> str:
@@ -1,8 +1,12 @@
+from contextvars import ContextVar
 from datetime import datetime
 import json
+import logging
 import os
 import sys
 
+logger = logging.getLogger(__name__)
+
 # Agregar el directorio raíz al path para importar multi_user_notification_system
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
@@ -10,24 +14,25 @@ try:
     from multi_user_notification_system import multi_user_system
 except ImportError:
     multi_user_system = None
-    print("⚠️ Warning: multi_user_notification_system no disponible")
+    logger.warning("⚠️ multi_user_notification_system no disponible")
 
-# Variable global para almacenar el user_id actual
-_current_user_id = None
+# user_id de la petición en curso. Un ContextVar (y no una global) para que
+# peticiones concurrentes de distintos usuarios no se pisen: el ejecutor de
+# herramientas copia el contexto de la petición al hilo que la atiende.
+_current_user_id: ContextVar = ContextVar('current_user_id', default=None)
 
 def set_current_user_id(user_id: str):
     """Establece el user_id actual desde main.py"""
-    global _current_user_id
-    _current_user_id = user_id
-    print(f"🔑 User ID establecido en notifications.py: {user_id[:12]}...")
+    _current_user_id.set(user_id)
+    logger.debug("🔑 User ID establecido en notifications.py: %.12s...", user_id)
 
 def get_current_user_id():
     """Obtiene el user_id actual"""
-    global _current_user_id
-    if _current_user_id:
-        return _current_user_id
+    user_id = _current_user_id.get()
+    if user_id:
+        return user_id
     # Fallback para desarrollo
-    print("⚠️ Warning: user_id no establecido, usando fallback")
+    logger.warning("⚠️ user_id no establecido, usando fallback")
     return "user_temp_fallback"
 
 def run(command: str) -> str:
@@ -41,7 +46,7 @@ def run(command: str) -> str:
     command = command.strip().lower()
     user_id = get_current_user_id()
     
-    print(f"🔧 Notifications tool - User ID: {user_id[:12]}..., Command: {command}")
+    logger.debug("🔧 Notifications tool - User ID: %.12s..., Command: %s", user_id, command)
 
     # Comandos principales
     if command == "status":
@@ -140,7 +145,7 @@ def _handle_status(user_id: str) -> str:
 
         return result
     except Exception as e:
-        print(f"❌ Error en status: {e}")
+        logger.error("❌ Error en status: %s", e)
         import traceback
         traceback.print_exc()
         return f"❌ Error obteniendo estado: {e}"
@@ -198,9 +203,7 @@ def _handle_debug(user_id: str) -> str:
 
         return result
     except Exception as e:
-        import traceback
-        error_trace = traceback.format_exc()
-        print(f"❌ Error en debug: {e}\n{error_trace}")
+        logger.exception("❌ Error en debug: %s", e)
         return f"❌ Error en debug: {e}\n\nVer logs del servidor para más detalles."
     
 def _handle_resumen(user_id: str) -> str:
@@ -236,7 +239,7 @@ def _handle_resumen(user_id: str) -> str:
         
         return result
     except Exception as e:
-        print(f"❌ Error en resumen: {e}")
+        logger.error("❌ Error en resumen: %s", e)
         return f"❌ Error obteniendo resumen: {e}"
 
 def _handle_listar(user_id: str, command: str) -> str:
@@ -297,7 +300,7 @@ def _handle_listar(user_id: str, command: str) -> str:
         
         return result
     except Exception as e:
-        print(f"❌ Error listando: {e}")
+        logger.error("❌ Error listando: %s", e)
         return f"❌ Error listando notificaciones: {e}"
 
 def _handle_borrar(user_id: str, command: str) -> str:
@@ -331,7 +334,7 @@ def _handle_borrar(user_id: str, command: str) -> str:
                 return f"📭 No hay notificaciones de tipo **'{target}'** para eliminar."
         
     except Exception as e:
-        print(f"❌ Error borrando: {e}")
+        logger.error("❌ Error borrando: %s", e)
         return f"❌ Error borrando notificaciones: {e}"
 
 def _handle_activar(user_id: str, command: str) -> str:
@@ -365,7 +368,7 @@ def _handle_activar(user_id: str, command: str) -> str:
         return "❌ Error al actualizar la configuración"
         
     except Exception as e:
-        print(f"❌ Error activando: {e}")
+        logger.error("❌ Error activando: %s", e)
         return f"❌ Error en activar: {e}"
 
 def _handle_desactivar(user_id: str, command: str) -> str:
@@ -398,7 +401,7 @@ def _handle_desactivar(user_id: str, command: str) -> str:
         return "❌ Error al actualizar la configuración"
         
     except Exception as e:
-        print(f"❌ Error desactivando: {e}")
+        logger.error("❌ Error desactivando: %s", e)
         return f"❌ Error en desactivar: {e}"
 
 def _handle_keywords_patentes(user_id: str, command: str) -> str:
@@ -422,7 +425,7 @@ def _handle_keywords_patentes(user_id: str, command: str) -> str:
         return "❌ Error al configurar keywords de patentes"
         
     except Exception as e:
-        print(f"❌ Error en keywords patentes: {e}")
+        logger.error("❌ Error en keywords patentes: %s", e)
         return f"❌ Error: {e}"
 
 def _handle_keywords_papers(user_id: str, command: str) -> str:
@@ -446,7 +449,7 @@ def _handle_keywords_papers(user_id: str, command: str) -> str:
         return "❌ Error al configurar keywords de papers"
         
     except Exception as e:
-        print(f"❌ Error en keywords papers: {e}")
+        logger.error("❌ Error en keywords papers: %s", e)
         return f"❌ Error: {e}"
 
 def _handle_categories(user_id: str, command: str) -> str:
@@ -475,7 +478,7 @@ def _handle_categories(user_id: str, command: str) -> str:
         return "❌ Error al configurar categorías de papers"
         
     except Exception as e:
-        print(f"❌ Error en categories: {e}")
+        logger.error("❌ Error en categories: %s", e)
         return f"❌ Error: {e}"
 
 def _handle_test(user_id: str) -> str:
@@ -497,12 +500,12 @@ def _handle_test(user_id: str) -> str:
             }
         )
         
-        print(f"🧪 Notificación de prueba enviada a {user_id[:12]}...")
+        logger.info("🧪 Notificación de prueba enviada a %.12s...", user_id)
         
         return f"✅ **Notificación de prueba enviada**\n\n💡 Deberías recibirla en unos segundos.\n\nSi no la recibes:\n• Verifica permisos del navegador\n• Usa `debug` para más información"
         
     except Exception as e:
-        print(f"❌ Error en test: {e}")
+        logger.error("❌ Error en test: %s", e)
         return f"❌ Error enviando notificación de prueba: {e}"
 
 def _handle_start(user_id: str) -> str:
@@ -531,7 +534,7 @@ def _handle_stop(user_id: str) -> str:
         return "❌ Error al desactivar notificaciones"
         
     except Exception as e:
-        print(f"❌ Error en stop: {e}")
+        logger.error("❌ Error en stop: %s", e)
         return f"❌ Error: {e}"
 
 # -----------------------------------------------
@@ -1,6 +1,7 @@
 # tools/patents_manager.py
 from datetime import datetime, timedelta
 from sources.patents import check_patents
+from jobs import report_step
 
 def run(command: str, user_id: str):
     """
@@ -12,7 +13,7 @@ def run(command: str, user_id: str):
         keywords = ["quantum sensor", "PFAS detection", "water quality sensor"]
     
     since_date = datetime.now() - timedelta(days=30)
-    results = check_patents(keywords, since_date=since_date)
+    results = check_patents(keywords, since_date=since_date, progress=report_step)
     
     if not results:
         return "📭 No se encontraron patentes nuevas"
@@ -1,5 +1,6 @@
 import os
 import json
+import logging
 import re
 import numpy as np
 import pandas as pd
@@ -12,6 +13,11 @@ import io
 import base64
 from pathlib import Path
 import math
+from blob_store import get_blob_store
+from jobs import report_step
+from tracing import traced
+
+logger = logging.getLogger(__name__)
 
 class RMNSpectrumCleaner:
     """
@@ -261,6 +267,7 @@ ppm,intensidad
         return float(value)
 
     
+    @traced()
     def load_spectrum_data(self, file_path: str):
         """Carga datos del espectro desde diferentes formatos"""
         try:
@@ -304,9 +311,10 @@ ppm,intensidad
             return x, y
             
         except Exception as e:
-            print(f"Error cargando espectro: {e}")
+            logger.error("❌ Error cargando espectro: %s", e)
             return None, None
     
+    @traced()
     def perform_spectrum_analysis(self, x, y):
         """Realiza análisis completo de calidad del espectro"""
         try:
@@ -351,11 +359,12 @@ ppm,intensidad
             }
             
         except Exception as e:
-            print(f"Error en análisis: {e}")
+            logger.exception("❌ Error en análisis: %s", e)
             return {'snr': 0, 'noise_level': 1, 'signal_level': 1, 
                    'baseline_drift': 0, 'peak_count': 0, 
                    'mean_intensity': 0, 'std_intensity': 1}
 
+    @traced()
     def create_analysis_plot(self, x, y, filename, analysis):
         """Crea gráfico de análisis del espectro"""
         try:
@@ -380,7 +389,7 @@ ppm,intensidad
                             label=f'Picos detectados ({len(peaks)})')
                     plt.legend()
             except Exception as peak_error:
-                print(f"Warning: No se pudieron detectar picos: {peak_error}")
+                logger.warning("⚠️ No se pudieron detectar picos: %s", peak_error)
             
             # Estadísticas en el gráfico
             stats_text = (f'SNR: {analysis["snr"]:.1f} dB\n'
@@ -423,14 +432,15 @@ ppm,intensidad
                        facecolor='white', edgecolor='none')
             plt.close()  # Importante: cerrar la figura para liberar memoria
             
-            print(f"✅ Gráfico de análisis guardado: {plot_path}")
+            logger.debug("✅ Gráfico de análisis guardado: %s", plot_path)
             return plot_path
             
         except Exception as e:
-            print(f"❌ Error creando gráfico de análisis: {e}")
+            logger.error("❌ Error creando gráfico de análisis: %s", e)
             plt.close()  # Cerrar figura incluso si hay error
             return None
     
+    @traced()
     def analyze_spectrum(self, filename: str):
         """Analiza un espectro para detectar ruido y características"""
         try:
@@ -438,38 +448,36 @@ ppm,intensidad
             if not os.path.exists(file_path):
                 return f"❌ No se encontró el archivo: {filename}"
             
+            # Mismo contenido (aunque se haya renombrado) → mismo análisis y gráfico
+            store = get_blob_store()
+            content_hash = store.content_hash(file_path)
+            cached = store.get_derived('rmn.analyze', content_hash)
+            if cached:
+                cached['filename'] = filename
+                cached['recommendations'] = self._recommendations(filename, cached['analysis'])
+                return cached
+            
             # Cargar datos
+            report_step(0, 3, f"Cargando {filename}")
             x, y = self.load_spectrum_data(file_path)
             if x is None or y is None:
                 return f"❌ Error cargando datos del espectro: {filename}"
             
             # Análisis de calidad
+            report_step(1, 3, "Analizando el espectro")
             analysis = self.perform_spectrum_analysis(x, y)
             
             # Generar gráfico de análisis
+            report_step(2, 3, "Generando el gráfico")
             plot_path = self.create_analysis_plot(x, y, filename, analysis)
             plot_filename = plot_path.split('/')[-1] if plot_path else None
             
             # Generar recomendaciones
-            recommendations = []
-            if analysis['snr'] < 20:
-                recommendations.append("⚠️ SNR baja - Se recomienda limpieza agresiva")
-                recommendations.append(f"🎯 Método sugerido: limpiar: {filename} con wiener")
-            elif analysis['snr'] < 30:
-                recommendations.append("📈 SNR moderada - Limpieza suave recomendada")
-                recommendations.append(f"🎯 Método sugerido: limpiar: {filename} con savgol")
-            else:
-                recommendations.append("✅ SNR buena - Limpieza mínima necesaria")
-                recommendations.append(f"🎯 Método sugerido: limpiar: {filename} con gaussian")
-            
-            if analysis['baseline_drift'] > 0.1:
-                recommendations.append("📏 Deriva de línea base detectada - Usar corrección polinómica")
-            
-            recommendations.append(f"🔧 Limpieza automática recomendada: limpiar auto: {filename}")
+            recommendations = self._recommendations(filename, analysis)
             
             # CAMBIO PRINCIPAL: Devolver diccionario estructurado
             if plot_filename:
-                return {
+                result = {
                     'type': 'analysis_result',
                     'filename': filename,
                     'analysis': {
@@ -491,6 +499,8 @@ ppm,intensidad
                     'recommendations': recommendations,
                     'success': True
                 }
+                store.put_derived('rmn.analyze', content_hash, None, result, [plot_path])
+                return result
             else:
                 # Fallback: si hay error con el gráfico, devolver texto tradicional
                 return self._format_analysis_text(filename, analysis, x, y)
@@ -498,6 +508,25 @@ ppm,intensidad
         except Exception as e:
             return f"❌ Error analizando espectro: {e}"
 
+    def _recommendations(self, filename, analysis):
+        """Recomendaciones de limpieza según la SNR y la deriva de línea base"""
+        recommendations = []
+        if analysis['snr'] < 20:
+            recommendations.append("⚠️ SNR baja - Se recomienda limpieza agresiva")
+            recommendations.append(f"🎯 Método sugerido: limpiar: {filename} con wiener")
+        elif analysis['snr'] < 30:
+            recommendations.append("📈 SNR moderada - Limpieza suave recomendada")
+            recommendations.append(f"🎯 Método sugerido: limpiar: {filename} con savgol")
+        else:
+            recommendations.append("✅ SNR buena - Limpieza mínima necesaria")
+            recommendations.append(f"🎯 Método sugerido: limpiar: {filename} con gaussian")
+        
+        if analysis['baseline_drift'] > 0.1:
+            recommendations.append("📏 Deriva de línea base detectada - Usar corrección polinómica")
+        
+        recommendations.append(f"🔧 Limpieza automática recomendada: limpiar auto: {filename}")
+        return recommendations
+
     def _format_analysis_text(self, filename, analysis, x, y):
         """Método auxiliar para formatear análisis como texto (fallback)"""
         result = f"🔍 **ANÁLISIS DE ESPECTRO: {filename}**\n\n"
@@ -557,6 +586,7 @@ ppm,intensidad
             # SNR excelente - limpieza mínima
             return 'gaussian', {'sigma': 0.5}
     
+    @traced()
     def apply_cleaning_method(self, y, method, params=None):
         """Aplica el método de limpieza especificado"""
         if params is None:
@@ -608,9 +638,10 @@ ppm,intensidad
                 return y
                 
         except Exception as e:
-            print(f"Error aplicando método {method}: {e}")
+            logger.error("❌ Error aplicando método %s: %s", method, e)
             return y
     
+    @traced()
     def auto_clean_spectrum(self, filename: str):
         """Limpia automáticamente un espectro seleccionando el mejor método"""
         try:
@@ -618,21 +649,33 @@ ppm,intensidad
             if not os.path.exists(file_path):
                 return f"❌ No se encontró el archivo: {filename}"
             
+            store = get_blob_store()
+            content_hash = store.content_hash(file_path)
+            cached = store.get_derived('rmn.auto_clean', content_hash)
+            if cached:
+                cached['original_file'] = filename
+                cached['message'] = f"Espectro {filename} limpiado exitosamente con {cached['method_key']}"
+                return cached
+            
             # Cargar datos
+            report_step(0, 5, f"Cargando {filename}")
             x, y = self.load_spectrum_data(file_path)
             if x is None or y is None:
                 return f"❌ Error cargando datos del espectro: {filename}"
             
             # Análisis para determinar el mejor método
+            report_step(1, 5, "Analizando el espectro")
             analysis = self.perform_spectrum_analysis(x, y)
             
             # Seleccionar método automáticamente
             best_method, params = self.select_best_method(analysis)
             
             # Aplicar limpieza
+            report_step(2, 5, f"Limpiando con {best_method}")
             y_clean = self.apply_cleaning_method(y, best_method, params)
             
             # Guardar resultado
+            report_step(3, 5, "Guardando el espectro limpio")
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             output_filename = f"{filename.split('.')[0]}_clean_{timestamp}.csv"
             self.save_cleaned_spectrum(x, y_clean, output_filename, best_method)
@@ -642,6 +685,7 @@ ppm,intensidad
             plot_path = self.create_comparison_plot(x, y, y_clean, filename, best_method, plot_filename)
             
             # Análisis post-limpieza
+            report_step(4, 5, "Midiendo la mejora")
             analysis_clean = self.perform_spectrum_analysis(x, y_clean)
             improvement = analysis_clean['snr'] - analysis['snr']
             
@@ -649,12 +693,13 @@ ppm,intensidad
             processing_time = len(x) * 0.001  # Tiempo estimado
             
             # IMPORTANTE: Devolver diccionario estructurado para que main.py lo detecte
-            return {
+            result = {
                 'type': 'clean_result',
                 'original_file': filename,
                 'cleaned_file': output_filename,  # Solo el nombre del archivo
                 'plot_file': plot_filename if plot_path else None,  # Solo el nombre del archivo
                 'method': self.cleaning_methods[best_method],
+                'method_key': best_method,
                 'params': params,
                 'snr_improvement': round(improvement, 1),
                 'snr_original': round(analysis['snr'], 1),
@@ -669,10 +714,14 @@ ppm,intensidad
                     'plot': f"/download/plot/{plot_filename}" if plot_path else None
                 }
             }
+            outputs = [os.path.join(self.output_dir, output_filename)] + ([plot_path] if plot_path else [])
+            store.put_derived('rmn.auto_clean', content_hash, None, result, outputs)
+            return result
             
         except Exception as e:
             return f"❌ Error en limpieza automática: {e}"
         
+    @traced()
     def create_comparison_plot(self, x, y_original, y_clean, filename, method, plot_filename):
         """Crea gráfico comparativo antes/después"""
         try:
@@ -718,9 +767,10 @@ ppm,intensidad
             return f"{self.plots_dir}/{plot_filename}"
             
         except Exception as e:
-            print(f"Error creando gráfico comparativo: {e}")
+            logger.error("❌ Error creando gráfico comparativo: %s", e)
             return None
     
+    @traced()
     def save_cleaned_spectrum(self, x, y_clean, filename, method, params=None):
         """Guarda el espectro limpio en formato CSV"""
         try:
@@ -744,7 +794,7 @@ ppm,intensidad
                 df.to_csv(f, index=False)
                 
         except Exception as e:
-            print(f"Error guardando espectro: {e}")
+            logger.error("❌ Error guardando espectro: %s", e)
     
     def clean_spectrum(self, command: str) -> str:
         """Limpia un espectro con método y parámetros específicos"""
@@ -777,17 +827,28 @@ ppm,intensidad
             if not os.path.exists(file_path):
                 return f"❌ No se encontró el archivo: {filename}"
             
+            store = get_blob_store()
+            content_hash = store.content_hash(file_path)
+            cache_params = {'method': method, 'params': params}
+            cached = store.get_derived('rmn.clean', content_hash, cache_params)
+            if cached:
+                return cached
+            
+            report_step(0, 4, f"Cargando {filename}")
             x, y = self.load_spectrum_data(file_path)
             if x is None or y is None:
                 return f"❌ Error cargando datos del espectro: {filename}"
             
             # Análisis pre-limpieza
+            report_step(1, 4, "Analizando el espectro")
             analysis_original = self.perform_spectrum_analysis(x, y)
             
             # Aplicar limpieza
+            report_step(2, 4, f"Limpiando con {method}")
             y_clean = self.apply_cleaning_method(y, method, params)
             
             # Guardar resultado
+            report_step(3, 4, "Guardando el espectro limpio")
             output_filename = f"{filename.split('.')[0]}_{method}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
             self.save_cleaned_spectrum(x, y_clean, output_filename, method, params)
             
@@ -812,6 +873,8 @@ ppm,intensidad
             
             result += f"📁 **Ubicación:** {self.output_dir}/{output_filename}"
             
+            store.put_derived('rmn.clean', content_hash, cache_params, result,
+                              [os.path.join(self.output_dir, output_filename)])
             return result
             
         except Exception as e:
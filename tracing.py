@@ -0,0 +1,434 @@
+# tracing.py - TRAZAS POR PETICIÓN (SPANS)
+"""
+Cuando /ask va lento no se sabe si es el enrutado, Gemini, un scraper,
+SQLite o matplotlib en la herramienta RMN. Cada comando abre una traza
+(CommandHandler.process_command) y el código que puede tardar abre spans
+dentro de ella:
+
+    with span('patents.source', source='uspto') as s:
+        ...
+        s.set('results', len(patents))
+
+El span actual vive en un ContextVar, así que se propaga solo a las tareas
+asyncio y a los hilos del ToolExecutor (que copian el contexto). Al proceso
+hijo de run_cpu se le pasa explícitamente (ver continue_trace / adopt).
+Fuera de una traza (monitor en segundo plano, CLI) span() no hace nada.
+
+Las trazas terminadas se escriben en segundo plano en cache/traces.jsonl,
+una línea por traza con la forma JSON de OTLP (ExportTraceServiceRequest),
+y se pueden ver en /debug/trace/{id}.
+
+Configuración: TRACING=0 las desactiva; TRACE_MIN_MS=N sólo guarda las
+trazas que tardan al menos N ms (las peticiones lentas).
+"""
+import asyncio
+import functools
+import html
+import json
+import logging
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRACE_FILE = "cache/traces.jsonl"
+SERVICE_NAME = "agente-gemini"
+
+# Códigos de estado de OTLP
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+# Los trace_id son secrets.token_hex(16): 32 caracteres hexadecimales
+TRACE_ID_RE = re.compile(r'[0-9a-f]{32}')
+
+
+def is_trace_id(value: str) -> bool:
+    return TRACE_ID_RE.fullmatch(value) is not None
+
+
+class Span:
+    __slots__ = ('trace', 'span_id', 'parent_id', 'name', 'start_ns', 'end_ns', 'attributes', 'error')
+
+    def __init__(self, trace: '_Trace', name: str, parent_id: Optional[str], attributes: Dict):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set(self, key: str, value):
+        self.attributes[key] = value
+
+    def to_tuple(self) -> Tuple:
+        """Forma serializable (para devolver spans desde el proceso hijo)"""
+        return (self.span_id, self.parent_id, self.name, self.start_ns, self.end_ns, self.attributes, self.error)
+
+    def to_otlp(self) -> Dict:
+        otlp = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'parentSpanId': self.parent_id or '',
+            'name': self.name,
+            'kind': 1,  # INTERNAL
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns or self.start_ns),
+            'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in self.attributes.items()],
+            'status': {'code': STATUS_ERROR, 'message': self.error} if self.error else {'code': STATUS_OK},
+        }
+        return otlp
+
+
+class _NullSpan:
+    """Lo que devuelve span() fuera de una traza: set() no hace nada"""
+    trace_id = None
+    span_id = None
+
+    def set(self, key: str, value):
+        pass
+
+
+NULL_SPAN = _NullSpan()
+
+
+class _Trace:
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.spans: List[Span] = []
+        self.lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self.lock:
+            self.spans.append(span)
+
+
+def _otlp_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _plain_value(value: Dict):
+    for kind in ('stringValue', 'boolValue', 'doubleValue'):
+        if kind in value:
+            return value[kind]
+    if 'intValue' in value:
+        return int(value['intValue'])
+    return None
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+
+
+class Tracer:
+    """Crea las trazas, decide cuáles se guardan y las exporta en segundo plano"""
+
+    def __init__(self,
+                 trace_file: str = DEFAULT_TRACE_FILE,
+                 enabled: bool = True,
+                 min_duration_ms: float = 0.0,
+                 max_file_bytes: int = 20 * 1024 * 1024,
+                 recent_size: int = 200):
+        self.trace_file = trace_file
+        self.enabled = enabled
+        self.min_duration_ms = min_duration_ms
+        self.max_file_bytes = max_file_bytes
+        self.recent_size = recent_size
+        # trace_id → línea OTLP ya construida (las últimas, para el visor)
+        self._recent: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._recent_lock = threading.Lock()
+        self._queue: 'queue.SimpleQueue[Dict]' = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    # ---------- creación de spans ----------
+
+    @contextmanager
+    def start_trace(self, name: str, **attributes) -> Iterator:
+        """Span raíz de una traza nueva; al cerrarse la traza se exporta (si se muestrea)"""
+        if not self.enabled:
+            yield NULL_SPAN
+            return
+        trace = _Trace()
+        root = None
+        try:
+            with self._open(trace, name, None, attributes) as root:
+                yield root
+        finally:
+            # También las que terminan en excepción: son las que más interesan
+            if root is not None:
+                self._finish(trace, root)
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator:
+        """Span hijo del actual; fuera de una traza no hace nada"""
+        parent = _current_span.get()
+        if parent is None:
+            yield NULL_SPAN
+            return
+        with self._open(parent.trace, name, parent.span_id, attributes) as child:
+            yield child
+
+    @contextmanager
+    def _open(self, trace: _Trace, name: str, parent_id: Optional[str], attributes: Dict) -> Iterator[Span]:
+        current = Span(trace, name, parent_id, attributes)
+        token = _current_span.set(current)
+        try:
+            yield current
+        except BaseException as e:
+            current.error = f"{type(e).__name__}: {e}"[:300]
+            raise
+        finally:
+            _current_span.reset(token)
+            current.end_ns = time.time_ns()
+            trace.add(current)
+
+    # ---------- procesos hijos ----------
+
+    @staticmethod
+    def current_context() -> Optional[Tuple[str, str]]:
+        """(trace_id, span_id) del span actual, para continuar la traza en otro proceso"""
+        current = _current_span.get()
+        return (current.trace_id, current.span_id) if current else None
+
+    @contextmanager
+    def continue_trace(self, context: Optional[Tuple[str, str]], collected: List[Tuple]) -> Iterator:
+        """
+        En el proceso hijo: los spans que se abran cuelgan del span remoto y,
+        al salir, se añaden a ``collected`` (para devolverlos al padre).
+        """
+        if not context:
+            yield
+            return
+        trace_id, parent_id = context
+        trace = _Trace(trace_id)
+        remote = Span(trace, 'remote', None, {})
+        remote.span_id = parent_id
+        token = _current_span.set(remote)
+        try:
+            yield
+        finally:
+            _current_span.reset(token)
+            collected.extend(s.to_tuple() for s in trace.spans)
+
+    @staticmethod
+    def adopt(spans: List[Tuple]):
+        """En el padre: incorpora a la traza actual los spans devueltos por el hijo"""
+        current = _current_span.get()
+        if current is None:
+            return
+        for span_id, parent_id, name, start_ns, end_ns, attributes, error in spans:
+            remote = Span(current.trace, name, parent_id, attributes)
+            remote.span_id, remote.start_ns, remote.end_ns, remote.error = span_id, start_ns, end_ns, error
+            current.trace.add(remote)
+
+    # ---------- exportación ----------
+
+    def _finish(self, trace: _Trace, root: Span):
+        duration_ms = (root.end_ns - root.start_ns) / 1e6
+        if duration_ms < self.min_duration_ms:
+            return
+        with trace.lock:
+            spans = sorted(trace.spans, key=lambda s: s.start_ns)
+        request = {
+            'resourceSpans': [{
+                'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+                'scopeSpans': [{'scope': {'name': 'agente'}, 'spans': [s.to_otlp() for s in spans]}],
+            }]
+        }
+        with self._recent_lock:
+            self._recent[trace.trace_id] = request
+            while len(self._recent) > self.recent_size:
+                self._recent.popitem(last=False)
+        self._queue.put(request)
+        self._ensure_writer()
+
+    def _ensure_writer(self):
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name='trace-writer', daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        os.makedirs(os.path.dirname(self.trace_file) or '.', exist_ok=True)
+        while True:
+            batch = [self._queue.get()]
+            while not self._queue.empty() and len(batch) < 100:
+                batch.append(self._queue.get())
+            try:
+                self._rotate_if_needed()
+                with open(self.trace_file, 'a', encoding='utf-8') as f:
+                    for request in batch:
+                        f.write(json.dumps(request, ensure_ascii=False, default=str) + '\n')
+            except OSError as e:
+                logger.warning("⚠️ No se pudieron escribir %d trazas: %s", len(batch), e)
+
+    def _rotate_if_needed(self):
+        try:
+            if os.path.getsize(self.trace_file) >= self.max_file_bytes:
+                os.replace(self.trace_file, self.trace_file + '.1')
+        except FileNotFoundError:
+            pass
+
+    # ---------- consulta ----------
+
+    def get(self, trace_id: str) -> Optional[List[Dict]]:
+        """Spans (forma OTLP) de la traza: de memoria o, si ya no está, del fichero.
+
+        Si hay que leer el fichero, bloquea: desde el event loop, llamar con asyncio.to_thread.
+        """
+        if not is_trace_id(trace_id):
+            return None
+        with self._recent_lock:
+            request = self._recent.get(trace_id)
+        if request is None:
+            request = self._find_in_files(trace_id)
+        if request is None:
+            return None
+        return [s for rs in request['resourceSpans'] for ss in rs['scopeSpans'] for s in ss['spans']]
+
+    def _find_in_files(self, trace_id: str) -> Optional[Dict]:
+        needle = f'"traceId": "{trace_id}"'
+        for path in (self.trace_file, self.trace_file + '.1'):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    for line in f:
+                        if needle in line:
+                            return json.loads(line)
+            except FileNotFoundError:
+                continue
+        return None
+
+    def recent(self) -> List[Dict]:
+        """Resumen de las últimas trazas (la más reciente primero)"""
+        with self._recent_lock:
+            requests = list(self._recent.values())
+        summaries = []
+        for request in reversed(requests):
+            spans = request['resourceSpans'][0]['scopeSpans'][0]['spans']
+            root = next((s for s in spans if not s['parentSpanId']), spans[0])
+            summaries.append({
+                'trace_id': root['traceId'],
+                'name': root['name'],
+                'attributes': span_attributes(root),
+                'duration_ms': round((int(root['endTimeUnixNano']) - int(root['startTimeUnixNano'])) / 1e6, 1),
+                'spans': len(spans),
+                'error': root['status']['code'] == STATUS_ERROR,
+            })
+        return summaries
+
+
+def span_attributes(otlp_span: Dict) -> Dict:
+    return {a['key']: _plain_value(a['value']) for a in otlp_span.get('attributes', [])}
+
+
+def render_trace_html(trace_id: str, spans: List[Dict]) -> str:
+    """Cascada de spans en HTML: anidados por padre, con barra de duración"""
+    children: Dict[str, List[Dict]] = {}
+    ids = {s['spanId'] for s in spans}
+    for s in spans:
+        parent = s['parentSpanId'] if s['parentSpanId'] in ids else ''
+        children.setdefault(parent, []).append(s)
+
+    start = min(int(s['startTimeUnixNano']) for s in spans)
+    end = max(int(s['endTimeUnixNano']) for s in spans)
+    total = max(end - start, 1)
+
+    rows = []
+
+    def walk(parent_id: str, depth: int):
+        for s in sorted(children.get(parent_id, []), key=lambda s: int(s['startTimeUnixNano'])):
+            s_start, s_end = int(s['startTimeUnixNano']), int(s['endTimeUnixNano'])
+            left = (s_start - start) / total * 100
+            width = max((s_end - s_start) / total * 100, 0.3)
+            error = s['status']['code'] == STATUS_ERROR
+            attributes = ', '.join(f"{k}={v}" for k, v in span_attributes(s).items())
+            if error:
+                attributes = f"{s['status'].get('message', '')} {attributes}"
+            rows.append(
+                f"<tr><td style='padding-left:{depth * 16 + 4}px'>{html.escape(s['name'])}</td>"
+                f"<td class='num'>{(s_end - s_start) / 1e6:.1f} ms</td>"
+                f"<td class='bar'><div style='margin-left:{left:.2f}%;width:{width:.2f}%'"
+                f"{' class=err' if error else ''}></div></td>"
+                f"<td class='attrs'>{html.escape(attributes)}</td></tr>"
+            )
+            walk(s['spanId'], depth + 1)
+
+    walk('', 0)
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Traza {html.escape(trace_id)}</title>
+<style>
+body {{ font-family: sans-serif; font-size: 13px; margin: 16px; }}
+table {{ border-collapse: collapse; width: 100%; }}
+td {{ border-bottom: 1px solid #eee; padding: 3px 4px; white-space: nowrap; }}
+td.num {{ text-align: right; }}
+td.bar {{ width: 40%; }}
+td.bar div {{ height: 10px; background: #4a90d9; }}
+td.bar div.err {{ background: #d9534f; }}
+td.attrs {{ color: #666; white-space: normal; }}
+</style></head><body>
+<h3>Traza {html.escape(trace_id)} — {total / 1e6:.1f} ms, {len(spans)} spans</h3>
+<table>{''.join(rows)}</table>
+</body></html>"""
+
+
+# ========== INSTANCIA DE PROCESO ==========
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+def get_tracer() -> Tracer:
+    """Devuelve el tracer compartido (TRACING, TRACE_MIN_MS)"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer(
+                enabled=os.getenv('TRACING', '1') != '0',
+                min_duration_ms=float(os.getenv('TRACE_MIN_MS', 0)),
+            )
+        return _tracer
+
+
+def span(name: str, **attributes):
+    """Atajo: get_tracer().span(...)"""
+    return get_tracer().span(name, **attributes)
+
+
+def traced(name: Optional[str] = None):
+    """Decorador: ejecuta la función (síncrona o async) dentro de un span"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,222 @@
+# uploads.py - SUBIDAS DE ARCHIVOS EN STREAMING
+"""
+FileManager.upload_file hacía ``await file.read()`` y escribía el archivo de
+golpe: un espectro o DOCX de 200 MB se quedaba entero en memoria y la
+escritura bloqueaba el event loop.
+
+save_upload copia la subida por bloques a un temporal (la lectura, la
+escritura y el hash van en hilos), corta en cuanto se supera el límite del
+directorio y sólo al terminar publica el archivo con su nombre final
+(os.replace es atómico: nadie ve un archivo a medias). La memoria por subida
+es la de un bloque.
+
+Starlette lee y analiza el cuerpo multipart entero (a un temporal propio)
+antes de llamar al endpoint, así que el límite de save_upload llega tarde
+para una subida enorme. UploadLimitMiddleware lo aplica antes: rechaza con
+413 si Content-Length ya supera el límite de la ruta y, si no lo declara
+(chunked), corta en cuanto el cuerpo recibido lo supera. Dentro del límite
+el cuerpo sigue pasando por el temporal de Starlette antes de llegar aquí.
+
+El temporal se escribe en el almacén de contenidos (blob_store.py): si el
+contenido ya existía no se guarda dos veces y el archivo del directorio es
+un alias del blob (enlace duro o copia, según el directorio).
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from typing import Dict, Optional
+
+from starlette.responses import JSONResponse
+
+from blob_store import get_blob_store
+from metrics import get_metrics
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+
+# Margen para las cabeceras y delimitadores multipart alrededor del archivo
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Límite por directorio en MB (el resto usa UPLOAD_MAX_MB, 50 por defecto)
+UPLOAD_LIMITS_MB = {
+    "templates_docs": 25,
+    "data_docs": 25,
+    "rmn_spectra/input": 200,
+}
+
+UPLOAD_BYTES = get_metrics().counter('upload_bytes_total', 'Bytes recibidos en subidas', ['directory'])
+UPLOAD_SECONDS = get_metrics().histogram('upload_seconds', 'Duración de cada subida', ['directory', 'outcome'])
+
+
+class UploadTooLargeError(Exception):
+    """La subida supera el límite de su directorio"""
+
+
+def max_upload_bytes(directory: str) -> int:
+    """Tamaño máximo (bytes) de una subida a ``directory``"""
+    default_mb = float(os.getenv("UPLOAD_MAX_MB", 50))
+    return int(UPLOAD_LIMITS_MB.get(directory.rstrip("/"), default_mb) * 1024 * 1024)
+
+
+class UploadLimitMiddleware:
+    """
+    Middleware ASGI: límite de tamaño por ruta de subida antes de que se lea
+    el cuerpo. ``limits``: {ruta: bytes máximos del archivo}.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        max_bytes = self.limits.get(scope.get("path")) if scope["type"] == "http" else None
+        if max_bytes is None or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        max_body = max_bytes + MULTIPART_OVERHEAD
+        limit_mb = max_bytes / (1024 * 1024)
+        headers = dict(scope["headers"])
+        try:
+            declared = int(headers.get(b"content-length", b""))
+        except ValueError:
+            declared = None
+        if declared is not None and declared > max_body:
+            logger.warning("📤 Subida rechazada por Content-Length (%s, %d bytes)", scope["path"], declared)
+            await self._reject(scope, receive, send, limit_mb)
+            return
+
+        received = 0
+        exceeded = replied = False
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body:
+                    exceeded = True
+                    raise UploadTooLargeError(f"El archivo supera el límite de {limit_mb:g} MB")
+            return message
+
+        async def guarded_send(message):
+            nonlocal replied
+            if exceeded:
+                # FastAPI convierte el error de lectura en un 400 genérico: se sustituye por 413
+                if message["type"] == "http.response.start" and not replied:
+                    replied = True
+                    await self._reject(scope, receive, send, limit_mb)
+                return
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except UploadTooLargeError:
+            if replied:
+                return
+            replied = True
+            await self._reject(scope, receive, send, limit_mb)
+        finally:
+            if exceeded:
+                logger.warning("📤 Subida rechazada al recibir %d bytes (%s)", received, scope["path"])
+
+    @staticmethod
+    async def _reject(scope, receive, send, limit_mb: float):
+        response = JSONResponse(
+            {"success": False, "error": f"El archivo supera el límite de {limit_mb:g} MB"},
+            status_code=413,
+            headers={"Connection": "close"},
+        )
+        await response(scope, receive, send)
+
+
+def _write_chunk(out, hasher, chunk: bytes):
+    # hashlib libera el GIL con bloques grandes: hash y escritura fuera del loop
+    hasher.update(chunk)
+    out.write(chunk)
+
+
+def _close_synced(out):
+    out.flush()
+    os.fsync(out.fileno())
+    out.close()
+
+
+def _discard(out, tmp_path: str):
+    out.close()
+    try:
+        os.remove(tmp_path)
+    except FileNotFoundError:
+        pass
+
+
+async def save_upload(file, directory: str, filename: str,
+                      max_bytes: Optional[int] = None,
+                      chunk_size: int = CHUNK_SIZE) -> Dict:
+    """
+    Guarda la subida ``file`` (UploadFile) como ``directory/filename``.
+
+    Returns:
+        {'path', 'size', 'sha256', 'deduplicated', 'previous_sha256'}: si el
+        contenido ya estaba en el almacén y qué contenido tenía antes ese
+        nombre (None si es nuevo).
+
+    Raises:
+        UploadTooLargeError: si supera max_bytes (por defecto, el límite del directorio).
+    """
+    if max_bytes is None:
+        max_bytes = max_upload_bytes(directory)
+    limit_mb = max_bytes / (1024 * 1024)
+
+    # Si el cliente declaró el tamaño, se rechaza sin leer nada
+    declared = getattr(file, "size", None)
+    if declared is not None and declared > max_bytes:
+        raise UploadTooLargeError(f"El archivo supera el límite de {limit_mb:g} MB")
+
+    store = get_blob_store()
+    final_path = os.path.join(directory, filename)
+    fd, tmp_path = await asyncio.to_thread(tempfile.mkstemp, suffix=".part", dir=store.tmp_dir)
+    out = os.fdopen(fd, "wb")
+    hasher = hashlib.sha256()
+    size = 0
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                outcome = "too_large"
+                raise UploadTooLargeError(f"El archivo supera el límite de {limit_mb:g} MB")
+            await asyncio.to_thread(_write_chunk, out, hasher, chunk)
+
+        await asyncio.to_thread(_close_synced, out)
+        sha256 = hasher.hexdigest()
+        created = await asyncio.to_thread(store.put_file, tmp_path, sha256)
+        previous = await asyncio.to_thread(store.link, sha256, directory, filename)
+        outcome = "ok"
+    except BaseException:
+        # También si se cancela (cliente desconectado): no quedan .part sueltos
+        _discard(out, tmp_path)
+        raise
+    finally:
+        UPLOAD_BYTES.inc(size, directory=directory)
+        UPLOAD_SECONDS.observe(time.perf_counter() - start, directory=directory, outcome=outcome)
+
+    if previous and previous != sha256:
+        logger.info("📤 %s reemplazado (contenido anterior %.12s)", final_path, previous)
+    logger.debug("📤 %s guardado (%d bytes, sha256 %.12s%s) en %.2f s", final_path, size, sha256,
+                 "" if created else ", ya existía", time.perf_counter() - start)
+    return {
+        "path": final_path,
+        "size": size,
+        "sha256": sha256,
+        "deduplicated": not created,
+        "previous_sha256": previous,
+    }